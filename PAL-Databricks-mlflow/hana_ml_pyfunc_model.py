@@ -4,7 +4,17 @@ from mlflow.models import set_model
 import hana_ml
 from hana_ml import dataframe
 from hana_ml.model_storage import ModelStorage
+import asyncio
+import bisect
+import collections
+import concurrent.futures
+import contextlib
 import os
+import queue
+import threading
+import time
+import uuid
+import pandas as pd
 
 class CustomException(Exception):
     """Exception raised to get messages
@@ -15,11 +25,526 @@ class CustomException(Exception):
         self.message = message
         super().__init__(self.message)
 
+class MetricsCollector:
+    """In-process latency histograms of the serving spans and counters, exported in the Prometheus text format or
+    as MLflow metrics
+    Attributes:
+        buckets -- upper bounds of the latency histogram buckets in seconds
+        prefix -- prefix of the exported metric names
+    """
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, buckets=BUCKETS, prefix="hana_ml_pyfunc"):
+        self.buckets = tuple(buckets)
+        self.prefix = prefix
+        self.histograms = collections.OrderedDict()
+        self.counters = collections.OrderedDict()
+        self.gauges = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def observe(self, span, seconds, error=False):
+        with self._lock:
+            histogram = self.histograms.get(span)
+            if histogram is None:
+                histogram = self.histograms[span] = {"buckets": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            histogram["buckets"][bisect.bisect_left(self.buckets, seconds)] += 1
+            histogram["sum"] += seconds
+            histogram["count"] += 1
+        if error:
+            self.increment("span_errors", span=span)
+
+    def increment(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def register_gauge(self, name, callback):
+        """Registers a callable whose value is read on export, ie the queue depth"""
+        self.gauges[name] = callback
+
+    def quantile(self, span, quantile):
+        """Estimates a latency quantile by linear interpolation within the histogram buckets"""
+        with self._lock:
+            histogram = self.histograms.get(span)
+            if not histogram or not histogram["count"]:
+                return None
+            counts = list(histogram["buckets"])
+            total = histogram["count"]
+        rank = quantile * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if count and cumulative + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                # Observations beyond the last bucket are reported at its upper bound
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def to_prometheus(self):
+        lines = []
+        name = f"{self.prefix}_span_seconds"
+        lines += [f"# HELP {name} Latency of the serving spans", f"# TYPE {name} histogram"]
+        with self._lock:
+            histograms = [(span, dict(histogram, buckets=list(histogram["buckets"])))
+                          for span, histogram in self.histograms.items()]
+            counters = list(self.counters.items())
+        for span, histogram in histograms:
+            cumulative = 0
+            for bound, count in zip([str(bound) for bound in self.buckets] + ["+Inf"], histogram["buckets"]):
+                cumulative += count
+                lines.append(f'{name}_bucket{{span="{span}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{span="{span}"}} {histogram["sum"]}')
+            lines.append(f'{name}_count{{span="{span}"}} {histogram["count"]}')
+        typed = set()
+        for (counter, labels), value in counters:
+            metric = f"{self.prefix}_{counter}_total"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            label_text = ",".join(f'{label}="{label_value}"' for label, label_value in labels)
+            lines.append(f"{metric}{{{label_text}}} {value}" if label_text else f"{metric} {value}")
+        for gauge, callback in list(self.gauges.items()):
+            metric = f"{self.prefix}_{gauge}"
+            lines += [f"# TYPE {metric} gauge", f"{metric} {callback()}"]
+        return "\n".join(lines) + "\n"
+
+    def to_mlflow_metrics(self):
+        metrics = {}
+        with self._lock:
+            spans = [(span, histogram["count"], histogram["sum"]) for span, histogram in self.histograms.items()]
+            counters = list(self.counters.items())
+        for span, count, total in spans:
+            metrics[f"{span}_count"] = count
+            metrics[f"{span}_mean_seconds"] = total / count if count else 0.0
+            for label, quantile in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+                metrics[f"{span}_{label}_seconds"] = self.quantile(span, quantile)
+        for (counter, labels), value in counters:
+            metrics["_".join([counter] + [str(label_value) for _, label_value in labels])] = value
+        for gauge, callback in list(self.gauges.items()):
+            metrics[gauge] = callback()
+        return metrics
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+# Metrics of all models of the serving process
+metrics = MetricsCollector()
+
+@contextlib.contextmanager
+def timed_span(name):
+    """mlflow span whose latency is recorded in the metrics collector"""
+    start = time.monotonic()
+    error = False
+    try:
+        with mlflow.start_span(name) as span:
+            yield span
+    except Exception:
+        error = True
+        raise
+    finally:
+        # Closing a streaming generator early is not an error
+        metrics.observe(name, time.monotonic() - start, error=error)
+
+class MetricsExporter:
+    """Exports the collected metrics at an interval to a Prometheus text file, ie for the node exporter textfile
+    collector, or to the metrics of an MLflow run
+    Attributes:
+        collector -- the metrics collector
+        sink -- prometheus or mlflow
+        interval -- seconds between exports
+        file_location -- location of the Prometheus text file
+        run_id -- MLflow run the metrics are logged to
+    """
+    SINK_PROMETHEUS = "prometheus"
+    SINK_MLFLOW = "mlflow"
+
+    def __init__(self, collector, sink, interval=60.0, file_location=None, run_id=None):
+        if sink not in (self.SINK_PROMETHEUS, self.SINK_MLFLOW):
+            raise CustomException(f"Unknown metrics sink {sink}. Supported are: prometheus, mlflow")
+        if sink == self.SINK_PROMETHEUS and not file_location:
+            raise CustomException("The prometheus metrics sink requires a file location")
+        if sink == self.SINK_MLFLOW and not run_id:
+            raise CustomException("The mlflow metrics sink requires a run id")
+        self.collector = collector
+        self.sink = sink
+        self.interval = interval
+        self.file_location = file_location
+        self.run_id = run_id
+        self.step = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="hana_ml_metrics_exporter", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.export()
+
+    def export(self):
+        if self.sink == self.SINK_PROMETHEUS:
+            # Written to a temporary file first so the scraper never reads a partial file
+            temp_location = self.file_location + ".tmp"
+            with open(temp_location, "w") as metrics_file:
+                metrics_file.write(self.collector.to_prometheus())
+            os.replace(temp_location, self.file_location)
+        else:
+            from mlflow.entities import Metric
+            from mlflow.tracking import MlflowClient
+            timestamp = int(time.time() * 1000)
+            MlflowClient().log_batch(self.run_id, metrics=[
+                Metric(key, float(value), timestamp, self.step)
+                for key, value in self.collector.to_mlflow_metrics().items() if value is not None])
+        self.step += 1
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.export()
+            except Exception as e:
+                print(f"Exporting the metrics failed: {e}")
+
+class HANAConnectionPool:
+    """Pool of HANA connections which are health checked before they are handed out
+    Attributes:
+        connect -- callable opening a new ConnectionContext
+        size -- maximum number of open connections
+        ping_interval -- seconds a connection may be idle before it is pinged
+    """
+    def __init__(self, connect, size=4, ping_interval=30.0):
+        self.connect = connect
+        self.size = size
+        self.ping_interval = ping_interval
+        self.reconnects = 0
+        self._idle = []
+        self._open = 0
+        # Connections in use by thread, so a running statement can be cancelled
+        self._active = {}
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                while self._idle:
+                    connection_context, last_used = self._idle.pop()
+                    if self._is_healthy(connection_context, time.monotonic() - last_used):
+                        self._active[threading.get_ident()] = connection_context
+                        return connection_context
+                    self._open -= 1
+                    self.reconnects += 1
+                    metrics.increment("reconnects")
+                    self._close(connection_context)
+                if self._open < self.size:
+                    self._open += 1
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise CustomException("No HANA connection available in the pool")
+                self._condition.wait(remaining)
+        try:
+            with timed_span("connect_to_HANA"):
+                connection_context = self.connect()
+                metrics.increment("connections_opened")
+                if not connection_context.connection.isconnected():
+                    raise CustomException("HANA Connection Failed")
+                print("HANA Connection Successful")
+            with self._condition:
+                self._active[threading.get_ident()] = connection_context
+            return connection_context
+        except Exception:
+            with self._condition:
+                self._open -= 1
+                self._condition.notify()
+            raise
+
+    def release(self, connection_context, broken=False):
+        with self._condition:
+            for thread_id in [thread_id for thread_id, active in self._active.items() if active is connection_context]:
+                del self._active[thread_id]
+            if broken:
+                self._open -= 1
+                self._close(connection_context)
+            else:
+                # Most recently used connections are handed out first as they are least likely to be stale
+                self._idle.append((connection_context, time.monotonic()))
+            self._condition.notify()
+
+    @contextlib.contextmanager
+    def connection(self, timeout=None):
+        connection_context = self.acquire(timeout)
+        try:
+            yield connection_context
+        except Exception:
+            self.release(connection_context, broken=not self._is_healthy(connection_context, 0))
+            raise
+        self.release(connection_context)
+
+    def cancel(self, thread_id):
+        """Cancels the statement running on the connection in use by a thread"""
+        with self._condition:
+            connection_context = self._active.get(thread_id)
+        return self.cancel_connection(connection_context)
+
+    @staticmethod
+    def cancel_connection(connection_context):
+        """Cancels the statement running on a connection"""
+        if connection_context is None:
+            return False
+        try:
+            return bool(connection_context.connection.cancel())
+        except Exception:
+            return False
+
+    def close(self):
+        with self._condition:
+            for connection_context, _ in self._idle:
+                self._open -= 1
+                self._close(connection_context)
+            self._idle = []
+
+    def _is_healthy(self, connection_context, idle):
+        try:
+            if not connection_context.connection.isconnected():
+                return False
+            if idle > self.ping_interval:
+                with connection_context.connection.cursor() as cursor:
+                    cursor.execute("SELECT 1 FROM DUMMY")
+                    cursor.fetchall()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close(connection_context):
+        try:
+            connection_context.close()
+        except Exception:
+            pass
+
+class LRUCache:
+    """Thread-safe least recently used cache, values are created once per key
+    Attributes:
+        max_size -- maximum number of cached values
+        ttl -- seconds a value is valid, None to keep it until evicted
+    """
+    def __init__(self, max_size=4, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._values = collections.OrderedDict()
+        # Values being created by key, concurrent requests of the same key wait for them
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, create):
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is not None and (self.ttl is None or time.monotonic() - entry[1] < self.ttl):
+                self._values.move_to_end(key)
+                return entry[0]
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = concurrent.futures.Future()
+                creating = True
+            else:
+                creating = False
+        if not creating:
+            return future.result()
+        # Created outside of the lock so a slow creation only blocks requests of the same key
+        try:
+            value = create()
+        except Exception as e:
+            with self._lock:
+                if self._pending.get(key) is future:
+                    del self._pending[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            # A value invalidated while it was created is handed to the waiting requests only
+            if self._pending.get(key) is future:
+                del self._pending[key]
+                self._values[key] = (value, time.monotonic())
+                self._values.move_to_end(key)
+                while len(self._values) > self.max_size:
+                    self._values.popitem(last=False)
+        future.set_result(value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._values.pop(key, None)
+            self._pending.pop(key, None)
+
+class InferenceRequest:
+    """Scoring request with its parts, which are inference table names or inline feature rows
+    Attributes:
+        parts -- list of ("table", table_name) or ("rows", pandas DataFrame)
+        future -- completed with the prediction of the request
+    """
+    def __init__(self, parts):
+        self.parts = parts
+        self.future = concurrent.futures.Future()
+
+class MicroBatcher:
+    """Coalesces requests arriving within a short window into a single scoring call, batches are scored concurrently
+    Attributes:
+        score -- callable scoring a list of requests and returning one prediction per request
+        window -- seconds to wait for further requests after the first one
+        max_requests -- maximum number of requests scored together
+        workers -- maximum number of batches scored at the same time, ie the size of the connection pool
+    """
+    def __init__(self, score, window=0.005, max_requests=32, workers=1):
+        self.score = score
+        self.window = window
+        self.max_requests = max_requests
+        self.workers = workers
+        self._queue = queue.Queue()
+        self._collector = None
+        self._executor = None
+        # The next batch is only collected once a worker is free, so requests queue up into larger batches under load
+        self._free_workers = threading.Semaphore(workers)
+        self._lock = threading.Lock()
+
+    def submit(self, request):
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers,
+                                                                       thread_name_prefix="hana_ml_micro_batch")
+            if self._collector is None or not self._collector.is_alive():
+                self._collector = threading.Thread(target=self._run, name="hana_ml_micro_batcher", daemon=True)
+                self._collector.start()
+        self._queue.put(request)
+        return request.future.result()
+
+    def _run(self):
+        while True:
+            self._free_workers.acquire()
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_requests:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._executor.submit(self._score_batch, batch)
+
+    def _score_batch(self, batch):
+        try:
+            try:
+                results = self.score(batch)
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                return
+            for request, result in zip(batch, results):
+                if isinstance(result, Exception):
+                    request.future.set_exception(result)
+                else:
+                    request.future.set_result(result)
+        finally:
+            self._free_workers.release()
+
+class AsyncInferenceMetrics:
+    """Queue depth, outcome counts and latency of the asynchronous predictions
+    Attributes:
+        window -- number of most recent latencies the percentiles are computed from
+    """
+    def __init__(self, window=1024):
+        self.queued = 0
+        self.in_flight = 0
+        self.counts = collections.Counter()
+        self.latencies = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, outcome, latency):
+        with self._lock:
+            self.counts[outcome] += 1
+            self.latencies.append(latency)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            snapshot = {"queue_depth": self.queued, "in_flight": self.in_flight}
+            snapshot.update(self.counts)
+        for name, quantile in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            snapshot[f"latency_{name}"] = latencies[min(len(latencies) - 1, int(quantile * len(latencies)))] if latencies else None
+        snapshot["latency_max"] = latencies[-1] if latencies else None
+        return snapshot
+
+class ScoringJob:
+    """Blocking part of an asynchronous prediction, which can be cancelled before or while it runs
+    Attributes:
+        thread_id -- thread the job runs on, None before it started and after it finished
+        connection_context -- connection the chunks of a streamed prediction are fetched from while it is open
+        cancelled -- whether the job has been cancelled
+    """
+    def __init__(self):
+        self.thread_id = None
+        self.connection_context = None
+        self.cancelled = False
+        # Held while cancelling, so a late cancel never hits the next statement of the thread or connection
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self.cancelled:
+                raise CustomException("Prediction cancelled")
+            self.thread_id = threading.get_ident()
+
+    def finish(self):
+        with self._lock:
+            self.thread_id = None
+
+    def attach(self, connection_context):
+        with self._lock:
+            self.connection_context = connection_context
+
+    def detach(self):
+        with self._lock:
+            self.connection_context = None
+
+    def cancel(self, pool):
+        with self._lock:
+            self.cancelled = True
+            if self.connection_context is not None:
+                pool.cancel_connection(self.connection_context)
+            elif self.thread_id is not None:
+                pool.cancel(self.thread_id)
+
 class hana_ml_pyfunc_model(pyfunc.PythonModel):
 
+    KEY = "ID"
+    # Result modes: collect the predictions, fetch them in chunks or Arrow record batches or write them to a table
+    RESULT_COLLECT = "collect"
+    RESULT_CHUNKS = "chunks"
+    RESULT_ARROW = "arrow"
+    RESULT_TABLE = "table"
+    RESULT_MODES = [RESULT_COLLECT, RESULT_CHUNKS, RESULT_ARROW, RESULT_TABLE]
+    TABLE_COLUMN = "INFERENCE_TABLE_NAME"
+    BATCH_TABLE = "#HANA_ML_PYFUNC_BATCH"
+    PART_COLUMN = "PYFUNC_PART_INDEX"
+    SOURCE_KEY_COLUMN = "PYFUNC_SOURCE_ID"
+
+    # Loaded models by model uri and version, shared by all model instances of the serving process
+    model_cache = LRUCache(max_size=int(os.getenv('hana_model_cache_size', 4)))
+    # One exporter per serving process, started by the first loaded model
+    metrics_exporter = None
+    _exporter_lock = threading.Lock()
+
     def connectToHANA(self, context):
         try:
-            url =  os.getenv('hana_url') 
+            url =  os.getenv('hana_url')
             port = os.getenv('hana_port')
             user = os.getenv('hana_user')
             passwd = os.getenv('hana_password')
@@ -31,48 +556,600 @@ class hana_ml_pyfunc_model(pyfunc.PythonModel):
             return "Exception:{e}", e
     @mlflow.trace
     def load_context(self, context):
-        try: 
-            with mlflow.start_span("load_context"):
+        try:
+            with timed_span("load_context"):
                 self.model = context.artifacts["model"]
-                self.connection_context = self.connectToHANA(context)
+                self.pool = HANAConnectionPool(lambda: self.connectToHANA(context),
+                                               size=int(os.getenv('hana_pool_size', 4)))
+                # The row count of an inference table is probed once and reused for a short time
+                self.row_counts = LRUCache(max_size=256, ttl=float(os.getenv('hana_row_count_ttl', 30)))
+                # Inference tables above this row count are scored on their own instead of being copied into
+                # the batch table of a micro-batch
+                self.max_staged_rows = int(os.getenv('hana_batch_max_table_rows', 10000))
+                # Each batch is scored on its own pooled connection
+                self.batcher = MicroBatcher(self._score_batch,
+                                            window=float(os.getenv('hana_batch_window_ms', 5)) / 1000,
+                                            max_requests=int(os.getenv('hana_batch_max_requests', 32)),
+                                            workers=self.pool.size)
+                # Blocking HANA calls of the asynchronous predictions run on their own threads
+                self.max_concurrency = int(os.getenv('hana_async_max_concurrency', self.pool.size))
+                timeout = os.getenv('hana_async_timeout')
+                self.async_timeout = float(timeout) if timeout else None
+                self.async_metrics = AsyncInferenceMetrics()
+                self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                                                      thread_name_prefix="hana_ml_async")
+                self._semaphore = None
+                # Feature order by feature names, so data with the same features is always scored in one order
+                self._feature_orders = {}
+                self._feature_lock = threading.Lock()
+                metrics.register_gauge("async_queue_depth", lambda: self.async_metrics.queued)
+                metrics.register_gauge("async_in_flight", lambda: self.async_metrics.in_flight)
+                metrics.register_gauge("open_connections", lambda: self.pool._open)
+                self._start_metrics_exporter()
+                with self.pool.connection() as connection_context:
+                    self.hana_model = self._load_model(connection_context)
                 print("HANA_ML_MODEL loaded in load_context")
         except Exception as e:
             print(f"Exception occurred: {e}")
             raise Exception(f"Loading the context failed due to {e}")
+
+    @classmethod
+    def _start_metrics_exporter(cls):
+        with cls._exporter_lock:
+            if cls.metrics_exporter is None and os.getenv('hana_metrics_sink'):
+                cls.metrics_exporter = MetricsExporter(metrics, os.getenv('hana_metrics_sink'),
+                                                       interval=float(os.getenv('hana_metrics_interval', 60)),
+                                                       file_location=os.getenv('hana_metrics_prometheus_file'),
+                                                       run_id=os.getenv('hana_metrics_mlflow_run_id'))
+                cls.metrics_exporter.start()
+
+    def _load_model(self, connection_context):
+        # The model tables are persisted, so the loaded model can be used on all pooled connections
+        def load():
+            with timed_span("load_model"):
+                return ModelStorage.load_mlflow_model(connection_context=connection_context, model_uri=self.model,
+                                                      use_temporary_table=False, force=True)
+        return self.model_cache.get((self.model, self._model_version(self.model)), load)
+
+    @staticmethod
+    def _model_version(model_uri):
+        # The model uuid of the MLmodel file identifies the version, the modification time is the fallback
+        mlmodel = os.path.join(model_uri, "MLmodel")
+        if os.path.isfile(mlmodel):
+            with open(mlmodel) as mlmodel_file:
+                for line in mlmodel_file:
+                    if line.startswith("model_uuid:"):
+                        return line.split(":", 1)[1].strip()
+        if os.path.exists(model_uri):
+            return str(os.path.getmtime(mlmodel if os.path.isfile(mlmodel) else model_uri))
+        return None
+
     @mlflow.trace
-    def predict(self, context, model_input):
-        table_name = None
-        try: 
-            if self.connection_context.connection.isconnected() == False:
-                with mlflow.start_span("connect_to_HANA"):
-                    self.connection_context = self.connectToHANA(context)
-                    if self.connection_context.connection.isconnected():
-                        print("HANA Connection Successful")
-                    else:
-                        raise Exception("HANA Connection Failed")
-       
-            with mlflow.start_span("load_model"):
-                hana_model = ModelStorage.load_mlflow_model(connection_context=self.connection_context, model_uri=self.model,use_temporary_table=False, force=True)
-           
-                print("HANA_ML_MODEL loaded in predict")
-                print("model_input", model_input)
-                table_name = str(model_input["INFERENCE_TABLE_NAME"][0]) 
-                print("Table Name:", table_name)
-            with mlflow.start_span("hana_ml_predict"):
-                df = self.connection_context.table(table_name)
-                if df.count() > 0:
-                  
-                    print(f"Running HANA ML inference on {table_name} with {df.count()} records")
-                    prediction = hana_model.predict(df, key = "ID").collect()
-                    print("Prediction completed")
-                    return  prediction
-                else:
-                    raise Exception(f"HANA Inference Table {table_name} is empty")
-        
-            
+    def predict(self, context, model_input, params=None):
+        """Returns the predictions according to the result_mode param, which needs to be part of the signature
+        params:
+            result_mode -- collect (default), chunks, arrow or table
+            result_chunk_size -- number of rows per chunk or record batch
+            result_table -- name of the result table, generated if not given
+            result_table_overwrite -- whether an existing result table is replaced
+        """
+        try:
+            params = params or {}
+            request = InferenceRequest(self._parse_input(model_input))
+            print("model_input", model_input)
+            mode = params.get("result_mode", os.getenv('hana_result_mode', self.RESULT_COLLECT))
+            if mode not in self.RESULT_MODES:
+                raise CustomException(f"Unknown result mode {mode}. Supported are: {', '.join(self.RESULT_MODES)}")
+            if mode != self.RESULT_COLLECT:
+                # Large results are not coalesced so only one request at a time holds its predictions
+                return self._predict_result(request, mode, params)
+            if self.batcher.window > 0 and not self._is_large(request):
+                return self.batcher.submit(request)
+            result = self._score_batch([request])[0]
+            if isinstance(result, Exception):
+                raise result
+            return result
         except Exception as e:
-        
+
             print(f"Exception occurred: {e}")
-            raise f"Exception:{e}"
-        
-set_model(hana_ml_pyfunc_model())
\ No newline at end of file
+            metrics.increment("errors", error=type(e).__name__)
+            raise CustomException(f"Exception:{e}")
+
+    def predict_stream(self, context, model_input, params=None):
+        # Chunks are streamed as lists of records so they can be serialized by the serving endpoint
+        params = dict(params or {})
+        params["result_mode"] = self.RESULT_CHUNKS
+        for chunk in self.predict(context, model_input, params):
+            yield chunk.to_dict(orient="records")
+
+    async def predict_async(self, context, model_input, params=None, timeout=None):
+        """Asynchronous predict, at most max_concurrency predictions run at the same time. The statement running
+        in HANA is cancelled when the call is cancelled or exceeds the timeout in seconds. Streamed results are
+        provided by predict_stream_async."""
+        timeout = self.async_timeout if timeout is None else timeout
+        job = ScoringJob()
+        start = time.monotonic()
+        try:
+            result = await asyncio.wait_for(self._run_async(job, self._predict_job, job, model_input, params), timeout)
+        except asyncio.TimeoutError:
+            self.async_metrics.record("timed_out", time.monotonic() - start)
+            raise CustomException(f"Prediction timed out after {timeout} seconds")
+        except asyncio.CancelledError:
+            self.async_metrics.record("cancelled", time.monotonic() - start)
+            raise
+        except Exception:
+            self.async_metrics.record("failed", time.monotonic() - start)
+            raise
+        self.async_metrics.record("completed", time.monotonic() - start)
+        return result
+
+    async def predict_stream_async(self, context, model_input, params=None, timeout=None):
+        """Asynchronous generator of the predictions in chunks, the timeout applies to each chunk. The statement
+        running in HANA is cancelled when the generator is cancelled or a chunk exceeds the timeout."""
+        timeout = self.async_timeout if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        params = dict(params or {})
+        params["result_mode"] = self.RESULT_CHUNKS
+        job = ScoringJob()
+        start = time.monotonic()
+        outcome = "failed"
+        self.async_metrics.queued += 1
+        queued = True
+        try:
+            async with self._get_semaphore():
+                self.async_metrics.queued -= 1
+                queued = False
+                self.async_metrics.in_flight += 1
+                try:
+                    chunks = await asyncio.wait_for(self._run_job(job, self._predict_stream_job, job, model_input,
+                                                                  params), timeout)
+                    try:
+                        while True:
+                            chunk = await asyncio.wait_for(self._run_job(job, next, chunks, None), timeout)
+                            if chunk is None:
+                                break
+                            yield chunk
+                    finally:
+                        await loop.run_in_executor(self.executor, self._close_chunks, chunks)
+                    outcome = "completed"
+                finally:
+                    self.async_metrics.in_flight -= 1
+        except asyncio.TimeoutError:
+            outcome = "timed_out"
+            raise CustomException(f"Prediction timed out after {timeout} seconds")
+        except (asyncio.CancelledError, GeneratorExit):
+            outcome = "cancelled"
+            job.cancel(self.pool)
+            raise
+        finally:
+            if queued:
+                self.async_metrics.queued -= 1
+            self.async_metrics.record(outcome, time.monotonic() - start)
+
+    @staticmethod
+    def _close_chunks(chunks):
+        # Releases the connection of the generator, unless a fetch is still running, then it is released once
+        # the generator is garbage collected
+        try:
+            chunks.close()
+        except ValueError:
+            pass
+
+    async def _run_async(self, job, function, *args):
+        loop = asyncio.get_running_loop()
+        self.async_metrics.queued += 1
+        queued = True
+        try:
+            async with self._get_semaphore():
+                self.async_metrics.queued -= 1
+                queued = False
+                self.async_metrics.in_flight += 1
+                try:
+                    return await self._run_job(job, function, *args)
+                finally:
+                    self.async_metrics.in_flight -= 1
+        finally:
+            if queued:
+                self.async_metrics.queued -= 1
+
+    async def _run_job(self, job, function, *args):
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.executor, function, *args)
+        except asyncio.CancelledError:
+            # The executor keeps running the job, its statement is cancelled in HANA
+            job.cancel(self.pool)
+            raise
+
+    def _get_semaphore(self):
+        # Semaphores are bound to the event loop they are first used in
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore[0] is not loop:
+            self._semaphore = (loop, asyncio.Semaphore(self.max_concurrency))
+        return self._semaphore[1]
+
+    def _predict_job(self, job, model_input, params):
+        job.start()
+        try:
+            params = params or {}
+            mode = params.get("result_mode", os.getenv('hana_result_mode', self.RESULT_COLLECT))
+            if mode in (self.RESULT_CHUNKS, self.RESULT_ARROW):
+                raise CustomException("Streamed results are provided by predict_stream_async")
+            if mode not in self.RESULT_MODES:
+                raise CustomException(f"Unknown result mode {mode}. Supported are: {', '.join(self.RESULT_MODES)}")
+            request = InferenceRequest(self._parse_input(model_input))
+            if mode == self.RESULT_TABLE:
+                return self._predict_result(request, mode, params)
+            # Not coalesced by the micro-batcher so a cancellation only affects its own statement
+            result = self._score_batch([request])[0]
+            if isinstance(result, Exception):
+                raise result
+            return result
+        finally:
+            job.finish()
+
+    def _predict_stream_job(self, job, model_input, params):
+        job.start()
+        try:
+            chunks = self._predict_result(InferenceRequest(self._parse_input(model_input)), self.RESULT_CHUNKS,
+                                          params, job)
+        finally:
+            job.finish()
+        if job.cancelled:
+            self._close_chunks(chunks)
+            raise CustomException("Prediction cancelled")
+        return chunks
+
+    def _predict_result(self, request, mode, params, job=None):
+        connection_context = self.pool.acquire()
+        try:
+            with timed_span("hana_ml_predict"):
+                statement, parts = self._prepare_statement(connection_context, request, output=mode == self.RESULT_TABLE)
+            if mode == self.RESULT_TABLE:
+                with timed_span("hana_ml_write_result"):
+                    result = self._write_result_table(connection_context, statement, params)
+                self._drop_batch_table(connection_context)
+                self.pool.release(connection_context)
+                return result
+            chunk_size = int(params.get("result_chunk_size", os.getenv('hana_result_chunk_size', 10000)))
+        except Exception:
+            self._drop_batch_table(connection_context)
+            self.pool.release(connection_context, broken=not self.pool._is_healthy(connection_context, 0))
+            raise
+        # Start the generator, from now on it releases the connection when it fails, is closed or garbage collected
+        chunks = self._fetch_chunks(connection_context, statement, parts, request, chunk_size, job)
+        next(chunks)
+        if job is not None:
+            # The chunks are fetched on other threads, the job cancels the statement of the connection
+            job.attach(connection_context)
+        if mode == self.RESULT_ARROW:
+            return self._to_arrow(chunks)
+        return chunks
+
+    def _prepare_statement(self, connection_context, request, output=False):
+        """Runs the prediction of a single request and returns the statement selecting it together with the parts
+        to demultiplex the selected rows, which are None if the rows are already in the output form"""
+        if len(request.parts) == 1 and request.parts[0][0] == "table":
+            table_name = request.parts[0][1]
+            count = self._row_count(connection_context, table_name)
+            if count == 0:
+                self.row_counts.invalidate(table_name)
+                raise CustomException(f"HANA Inference Table {table_name} is empty")
+            print(f"Running HANA ML inference on {table_name} with {count} records")
+            return self.hana_model.predict(self._table(connection_context, table_name), key=self.KEY).select_statement, None
+        parts = [(0, part) for part in request.parts]
+        results = [None]
+        self._drop_batch_table(connection_context)
+        features = self._stage_parts(connection_context, parts, results)
+        if results[0] is not None:
+            raise results[0]
+        if output:
+            return self._predict_statement(connection_context, features, request), None
+        return self._predict_statement(connection_context, features), parts
+
+    def _fetch_chunks(self, connection_context, statement, parts, request, chunk_size, job=None):
+        broken = False
+        try:
+            with connection_context.connection.cursor() as cursor:
+                cursor.execute(statement)
+                columns = [description[0] for description in cursor.description]
+                yield None
+                fetched = 0
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows and fetched:
+                        break
+                    chunk = pd.DataFrame.from_records(rows, columns=columns)
+                    if parts is not None:
+                        chunk = self._demultiplex(chunk, parts, 0, request)
+                    fetched += 1
+                    metrics.increment("rows", len(chunk), mode=self.RESULT_CHUNKS)
+                    yield chunk
+                    if not rows:
+                        break
+        except GeneratorExit:
+            raise
+        except Exception:
+            broken = not self.pool._is_healthy(connection_context, 0)
+            raise
+        finally:
+            if job is not None:
+                job.detach()
+            self._drop_batch_table(connection_context)
+            self.pool.release(connection_context, broken=broken)
+
+    @staticmethod
+    def _to_arrow(chunks):
+        try:
+            import pyarrow as pa
+        except ImportError:
+            chunks.close()
+            raise CustomException("The arrow result mode requires pyarrow")
+        first = pa.RecordBatch.from_pandas(next(chunks), preserve_index=False)
+        def batches():
+            yield first
+            for chunk in chunks:
+                yield pa.RecordBatch.from_pandas(chunk, schema=first.schema, preserve_index=False)
+        return pa.RecordBatchReader.from_batches(first.schema, batches())
+
+    def _write_result_table(self, connection_context, statement, params):
+        table_name = params.get("result_table") or f"HANA_ML_PREDICTION_{uuid.uuid4().hex[:12].upper()}"
+        with connection_context.connection.cursor() as cursor:
+            if str(params.get("result_table_overwrite", "false")).lower() == "true":
+                try:
+                    cursor.execute(f'DROP TABLE {self._quote(table_name)}')
+                except Exception:
+                    pass
+            cursor.execute(f'CREATE COLUMN TABLE {self._quote(table_name)} AS ({statement})')
+            cursor.execute(f'SELECT COUNT(*) FROM {self._quote(table_name)}')
+            row_count = cursor.fetchall()[0][0]
+        metrics.increment("rows", row_count, mode=self.RESULT_TABLE)
+        print(f"Predictions written to {table_name} with {row_count} records")
+        return pd.DataFrame({"RESULT_TABLE_NAME": [table_name], "ROW_COUNT": [row_count]})
+
+    def _parse_input(self, model_input):
+        if isinstance(model_input, dict):
+            model_input = pd.DataFrame(model_input if any(isinstance(value, (list, tuple)) for value in model_input.values())
+                                       else [model_input])
+        if self.TABLE_COLUMN in model_input.columns:
+            table_names = [str(table_name) for table_name in model_input[self.TABLE_COLUMN]]
+            if not table_names:
+                raise CustomException("No inference table name given")
+            return [("table", table_name) for table_name in table_names]
+        if len(model_input) == 0:
+            raise CustomException("No inference rows given")
+        return [("rows", model_input.reset_index(drop=True))]
+
+    def _score_batch(self, requests):
+        """Scores requests on one pooled connection, returns the prediction or the exception per request"""
+        with self.pool.connection() as connection_context:
+            if len(requests) == 1 and len(requests[0].parts) == 1 and requests[0].parts[0][0] == "table":
+                return [self._score_table(connection_context, requests[0].parts[0][1])]
+            with timed_span("hana_ml_predict"):
+                return self._score_coalesced(connection_context, requests)
+
+    def _is_large(self, request):
+        """Whether a request is a single inference table too large to be coalesced with other requests"""
+        if len(request.parts) != 1 or request.parts[0][0] != "table":
+            return False
+        with self.pool.connection() as connection_context:
+            return self._row_count(connection_context, request.parts[0][1]) > self.max_staged_rows
+
+    def _score_table(self, connection_context, table_name):
+        with timed_span("hana_ml_predict"):
+            print("Table Name:", table_name)
+            return self._predict_table(connection_context, table_name)
+
+    def _predict_table(self, connection_context, table_name):
+        count = self._row_count(connection_context, table_name)
+        if count > 0:
+            print(f"Running HANA ML inference on {table_name} with {count} records")
+            prediction = self.hana_model.predict(self._table(connection_context, table_name), key=self.KEY).collect()
+            metrics.increment("rows", len(prediction), mode=self.RESULT_COLLECT)
+            print("Prediction completed")
+            return prediction
+        self.row_counts.invalidate(table_name)
+        raise CustomException(f"HANA Inference Table {table_name} is empty")
+
+    def _score_coalesced(self, connection_context, requests):
+        # Inline rows and small tables are copied into one session temp table under new keys and scored in a single
+        # PAL call per set of features, large tables are scored on their own
+        parts = [(request_index, part) for request_index, request in enumerate(requests) for part in request.parts]
+        results = [None] * len(requests)
+        frames = {}
+        groups = collections.OrderedDict()
+        for part_index, (request_index, (kind, value)) in enumerate(parts):
+            try:
+                if kind == "table" and self._row_count(connection_context, value) > self.max_staged_rows:
+                    frames[part_index] = self._predict_table(connection_context, value)
+                else:
+                    features = frozenset(self._get_features(connection_context, kind, value))
+                    groups.setdefault(features, []).append(part_index)
+            except Exception as e:
+                results[request_index] = e
+        for part_indexes in groups.values():
+            self._drop_batch_table(connection_context)
+            try:
+                features = self._stage_parts(connection_context, parts, results, part_indexes)
+                if features is None:
+                    continue
+                prediction = connection_context.sql(self._predict_statement(connection_context, features)).collect()
+                metrics.increment("rows", len(prediction), mode=self.RESULT_COLLECT)
+                print("Prediction completed")
+                for part_index in part_indexes:
+                    frames[part_index] = self._split_part(prediction, part_index, *parts[part_index][1])
+            finally:
+                self._drop_batch_table(connection_context)
+        for request_index, request in enumerate(requests):
+            if results[request_index] is None:
+                results[request_index] = self._combine(frames, parts, request_index, request)
+        return results
+
+    def _stage_parts(self, connection_context, parts, results, part_indexes=None):
+        """Copies the parts, or only those of the given indexes, into the batch table. The error of a part is set
+        as result of its request."""
+        features = None
+        rows = 0
+        valid_parts = 0
+        for part_index, (request_index, (kind, value)) in enumerate(parts):
+            if results[request_index] is not None or (part_indexes is not None and part_index not in part_indexes):
+                continue
+            try:
+                part_features = self._get_features(connection_context, kind, value)
+                if features is None:
+                    features = self._feature_order(part_features)
+                    self._create_batch_table(connection_context, kind, value, features)
+                elif set(part_features) != set(features):
+                    raise CustomException(f"Inference data {self._describe(kind, value)} does not have the "
+                                          f"features {features}")
+                inserted = self._insert_part(connection_context, part_index, kind, value, features, rows)
+                if inserted == 0:
+                    raise CustomException(f"HANA Inference Table {value} is empty")
+                rows += inserted
+                valid_parts += 1
+            except Exception as e:
+                results[request_index] = e
+        if not rows:
+            return None
+        print(f"Running HANA ML inference on {valid_parts} inference parts with {rows} records")
+        return features
+
+    def _row_count(self, connection_context, table_name):
+        return self.row_counts.get(table_name, connection_context.table(table_name).count)
+
+    def _feature_order(self, features):
+        # The first order seen for a set of feature names is used for all data with these features
+        with self._feature_lock:
+            return self._feature_orders.setdefault(frozenset(features), list(features))
+
+    def _table(self, connection_context, table_name):
+        """Returns the inference table with its features selected in the order of the feature names"""
+        df = connection_context.table(table_name)
+        features = [column for column in df.columns if column != self.KEY]
+        order = self._feature_order(features)
+        if order == features:
+            return df
+        return connection_context.sql(f'SELECT {", ".join(self._quote(column) for column in [self.KEY] + order)} '
+                                      f'FROM {self._quote(table_name)}')
+
+    def _get_features(self, connection_context, kind, value):
+        columns = list(connection_context.table(value).columns) if kind == "table" else list(value.columns)
+        return [column for column in columns if column != self.KEY]
+
+    def _create_batch_table(self, connection_context, kind, value, features):
+        columns = ", ".join(self._quote(feature) for feature in features)
+        if kind == "table":
+            sql = (f'CREATE LOCAL TEMPORARY COLUMN TABLE {self._quote(self.BATCH_TABLE)} AS ('
+                   f'SELECT CAST(0 AS BIGINT) AS {self._quote(self.KEY)}, CAST(0 AS INTEGER) AS '
+                   f'{self._quote(self.PART_COLUMN)}, CAST({self._quote(self.KEY)} AS NVARCHAR(256)) AS '
+                   f'{self._quote(self.SOURCE_KEY_COLUMN)}, {columns} FROM {self._quote(value)}) WITH NO DATA')
+        else:
+            definitions = [f'{self._quote(feature)} {self._sql_type(value[feature].dtype)}' for feature in features]
+            sql = (f'CREATE LOCAL TEMPORARY COLUMN TABLE {self._quote(self.BATCH_TABLE)} ('
+                   f'{self._quote(self.KEY)} BIGINT, {self._quote(self.PART_COLUMN)} INTEGER, '
+                   f'{self._quote(self.SOURCE_KEY_COLUMN)} NVARCHAR(256), {", ".join(definitions)})')
+        with connection_context.connection.cursor() as cursor:
+            cursor.execute(sql)
+
+    def _insert_part(self, connection_context, part_index, kind, value, features, offset):
+        columns = [self.KEY, self.PART_COLUMN, self.SOURCE_KEY_COLUMN] + features
+        insert = f'INSERT INTO {self._quote(self.BATCH_TABLE)} ({", ".join(self._quote(column) for column in columns)})'
+        with connection_context.connection.cursor() as cursor:
+            if kind == "table":
+                cursor.execute(f'{insert} SELECT ROW_NUMBER() OVER (ORDER BY {self._quote(self.KEY)}) + {offset}, '
+                               f'{part_index}, {self._quote(self.KEY)}, '
+                               f'{", ".join(self._quote(feature) for feature in features)} FROM {self._quote(value)}')
+                return cursor.rowcount
+            source_keys = value[self.KEY] if self.KEY in value.columns else pd.Series(range(len(value)))
+            data = value[features].astype(object).where(value[features].notna(), None).values.tolist()
+            cursor.executemany(f'{insert} VALUES ({", ".join(["?"] * len(columns))})',
+                               [[offset + index + 1, part_index, str(source_key)] + row
+                                for index, (source_key, row) in enumerate(zip(source_keys, data))])
+            return len(data)
+
+    def _predict_statement(self, connection_context, features, request=None):
+        """Runs the prediction of the batch table and returns the statement selecting it. Without a request the
+        part and the original key of each row are selected for demultiplexing, with a request the rows are selected
+        in the output form of the request."""
+        batch = connection_context.sql(f'SELECT {self._quote(self.KEY)}, '
+                                       f'{", ".join(self._quote(feature) for feature in features)} '
+                                       f'FROM {self._quote(self.BATCH_TABLE)}')
+        result = self.hana_model.predict(batch, key=self.KEY)
+        result_columns = ", ".join("R." + self._quote(column) for column in result.columns if column != self.KEY)
+        if request is None:
+            columns = f'B.{self._quote(self.PART_COLUMN)}, B.{self._quote(self.SOURCE_KEY_COLUMN)}'
+        else:
+            columns = f'B.{self._quote(self.SOURCE_KEY_COLUMN)} AS {self._quote(self.KEY)}'
+            if len(request.parts) > 1:
+                cases = " ".join(f"WHEN {part_index} THEN '{value.replace(chr(39), chr(39) * 2)}'"
+                                 for part_index, (kind, value) in enumerate(request.parts) if kind == "table")
+                columns = f'CASE B.{self._quote(self.PART_COLUMN)} {cases} END AS {self._quote(self.TABLE_COLUMN)}, ' + columns
+        # The new keys are mapped back to the part and the original key of each row on the server
+        return (f'SELECT {columns}, {result_columns} '
+                f'FROM ({result.select_statement}) R INNER JOIN {self._quote(self.BATCH_TABLE)} B '
+                f'ON R.{self._quote(self.KEY)} = B.{self._quote(self.KEY)} ORDER BY B.{self._quote(self.KEY)}')
+
+    def _demultiplex(self, prediction, parts, request_index, request):
+        frames = {part_index: self._split_part(prediction, part_index, kind, value)
+                  for part_index, (part_request_index, (kind, value)) in enumerate(parts)
+                  if part_request_index == request_index}
+        return self._combine(frames, parts, request_index, request)
+
+    def _split_part(self, prediction, part_index, kind, value):
+        frame = prediction[prediction[self.PART_COLUMN] == part_index].drop(columns=[self.PART_COLUMN])
+        frame = frame.rename(columns={self.SOURCE_KEY_COLUMN: self.KEY}).reset_index(drop=True)
+        frame[self.KEY] = self._restore_keys(frame[self.KEY], kind, value)
+        return frame
+
+    def _combine(self, frames, parts, request_index, request):
+        """Concatenates the predictions of the parts of a request in the order of its parts"""
+        combined = []
+        for part_index, (part_request_index, (kind, value)) in enumerate(parts):
+            if part_request_index != request_index:
+                continue
+            frame = frames[part_index]
+            if len(request.parts) > 1 and kind == "table":
+                frame = frame.copy()
+                frame.insert(0, self.TABLE_COLUMN, value)
+            combined.append(frame)
+        return combined[0] if len(combined) == 1 else pd.concat(combined, ignore_index=True)
+
+    def _restore_keys(self, keys, kind, value):
+        # The keys were staged as strings, they are converted back to the type of the inline rows
+        if kind == "rows" and self.KEY in value.columns:
+            return keys.astype(value[self.KEY].dtype)
+        if kind == "rows":
+            return keys.astype("int64")
+        try:
+            return pd.to_numeric(keys)
+        except (ValueError, TypeError):
+            return keys
+
+    def _drop_batch_table(self, connection_context):
+        try:
+            with connection_context.connection.cursor() as cursor:
+                cursor.execute(f'DROP TABLE {self._quote(self.BATCH_TABLE)}')
+        except Exception:
+            pass
+
+    @staticmethod
+    def _describe(kind, value):
+        return value if kind == "table" else "inline rows"
+
+    @staticmethod
+    def _quote(name):
+        return '"{}"'.format(str(name).replace('"', '""'))
+
+    @staticmethod
+    def _sql_type(dtype):
+        if pd.api.types.is_bool_dtype(dtype):
+            return "TINYINT"
+        if pd.api.types.is_integer_dtype(dtype):
+            return "BIGINT"
+        if pd.api.types.is_float_dtype(dtype):
+            return "DOUBLE"
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            return "TIMESTAMP"
+        return "NVARCHAR(5000)"
+
+set_model(hana_ml_pyfunc_model())
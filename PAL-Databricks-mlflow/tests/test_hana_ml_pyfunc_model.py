@@ -0,0 +1,126 @@
+"""
+Tests of the hana_ml pyfunc model with fake HANA connections.
+"""
+import importlib.util
+import os
+import unittest
+
+try:
+    import hana_ml  # noqa: F401
+    import mlflow  # noqa: F401
+except ImportError:
+    raise unittest.SkipTest('The pyfunc model requires mlflow and hana_ml')
+
+MODEL_LOCATION = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'hana_ml_pyfunc_model.py')
+_spec = importlib.util.spec_from_file_location('hana_ml_pyfunc_model', MODEL_LOCATION)
+pyfunc_model = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(pyfunc_model)
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, statement):
+        if statement.startswith('SELECT'):
+            if self.connection.fail_execute:
+                self.connection.connected = not self.connection.break_on_failure
+                raise RuntimeError('execute failed')
+            self.description = [('ID',), ('SCORE',)]
+
+    def fetchmany(self, size):
+        return []
+
+
+class FakeConnection:
+    def __init__(self, fail_execute, break_on_failure):
+        self.fail_execute = fail_execute
+        self.break_on_failure = break_on_failure
+        self.connected = True
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def isconnected(self):
+        return self.connected
+
+
+class FakeDataFrame:
+    def __init__(self, select_statement):
+        self.select_statement = select_statement
+        self.columns = ['ID', 'A', 'B']
+
+    def count(self):
+        return 3
+
+
+class FakeConnectionContext:
+    def __init__(self, fail_execute=True, break_on_failure=False):
+        self.connection = FakeConnection(fail_execute, break_on_failure)
+
+    def table(self, table_name):
+        return FakeDataFrame('SELECT * FROM "{}"'.format(table_name))
+
+    def close(self):
+        self.connection.connected = False
+
+
+class FakeModel:
+    def predict(self, df, key):
+        return FakeDataFrame('SELECT "{}", 1 AS "SCORE" FROM ({})'.format(key, df.select_statement))
+
+
+class TestPredictResult(unittest.TestCase):
+    """
+    Tests that streamed results release their connection exactly once.
+    """
+    def _create_model(self, **connection_args):
+        model = pyfunc_model.hana_ml_pyfunc_model()
+        model.pool = pyfunc_model.HANAConnectionPool(lambda: FakeConnectionContext(**connection_args), size=1)
+        model.row_counts = pyfunc_model.LRUCache()
+        model.hana_model = FakeModel()
+        model._feature_orders = {}
+        model._feature_lock = pyfunc_model.threading.Lock()
+        return model
+
+    def _predict(self, model, mode):
+        request = pyfunc_model.InferenceRequest([('table', 'T1')])
+        return model._predict_result(request, mode, {})
+
+    def test_failing_execute_releases_connection_once(self):
+        for mode in ('chunks', 'arrow'):
+            with self.subTest(mode=mode):
+                model = self._create_model()
+                with self.assertRaises(RuntimeError):
+                    self._predict(model, mode)
+                self.assertEqual(len(model.pool._idle), 1)
+                self.assertEqual(model.pool._open, 1)
+                self.assertEqual(model.pool._active, {})
+
+    def test_failing_execute_closes_broken_connection_once(self):
+        for mode in ('chunks', 'arrow'):
+            with self.subTest(mode=mode):
+                model = self._create_model(break_on_failure=True)
+                with self.assertRaises(RuntimeError):
+                    self._predict(model, mode)
+                self.assertEqual(model.pool._idle, [])
+                self.assertEqual(model.pool._open, 0)
+
+    def test_connection_released_after_chunks(self):
+        model = self._create_model(fail_execute=False)
+        chunks = list(self._predict(model, 'chunks'))
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(list(chunks[0].columns), ['ID', 'SCORE'])
+        self.assertEqual(len(model.pool._idle), 1)
+        self.assertEqual(model.pool._open, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
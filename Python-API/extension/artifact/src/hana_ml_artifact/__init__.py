@@ -1,4 +1,10 @@
 from .generator import Generator
+from .trace_source import TraceSource
+from .trace_source import ConnectionTraceSource
+from .trace_source import FileTraceSource
 __all__ = [
-    'Generator'
+    'Generator',
+    'TraceSource',
+    'ConnectionTraceSource',
+    'FileTraceSource'
 ]
\ No newline at end of file
@@ -0,0 +1,4 @@
+"""
+This package provides benchmarks for the artifact generation. The benchmarks run on synthetic
+data and do not require a HANA connection.
+"""
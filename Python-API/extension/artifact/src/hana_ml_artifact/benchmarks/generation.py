@@ -0,0 +1,211 @@
+"""
+This module benchmarks the complete artifact generation on synthetic sql traces. For each
+scenario and target the generation stages are timed with the profiler and the results are
+written to a json file which can be compared between runs to track regressions. No HANA
+connection is required.
+
+Run as: python -m hana_ml_artifact.benchmarks.generation --output results.json
+"""
+import argparse
+import collections
+import datetime
+import json
+import logging
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from ..generator import Generator
+from ..hana_ml_utils import FileSystemBackend
+from ..hana_ml_utils import MemoryBackend
+from ..hana_ml_utils import Profiler
+from .synthetic_trace import SyntheticTraceSource
+from .synthetic_trace import TRACE_TYPES
+from .synthetic_trace import build_sql_trace
+
+RESULTS_FORMAT_VERSION = 1
+
+TARGETS = collections.OrderedDict([
+    ('hana', 'generate_hana'),
+    ('sda', 'generate_hana_sda'),
+    ('datahub', 'generate_datahub'),
+    ('amdp', 'generate_amdp')
+])
+
+BACKEND_MEMORY = 'memory'
+BACKEND_FILESYSTEM = 'filesystem'
+BACKENDS = [BACKEND_MEMORY, BACKEND_FILESYSTEM]
+
+# Sizes as algo count, function count, table count and statement length
+SIZES = [(2, 2, 2, 10), (10, 3, 3, 50), (50, 4, 3, 200)]
+
+
+def build_scenarios(trace_types=None, sizes=None):
+    """
+    Build the benchmark scenarios.
+
+    Parameters
+    ----------
+    trace_types : list
+        The trace types, classic and / or auto. Defaults to both.
+    sizes : list
+        Tuples of algo count, function count, table count and statement length
+
+    Returns
+    -------
+    scenarios : list
+        The scenarios as keyword arguments of build_sql_trace
+    """
+    return [{
+        'trace_type': trace_type,
+        'algo_count': algo_count,
+        'function_count': function_count,
+        'table_count': table_count,
+        'statement_length': statement_length
+    } for trace_type in trace_types or TRACE_TYPES
+            for algo_count, function_count, table_count, statement_length in sizes or SIZES]
+
+
+def run_target(scenario, target, outputdir, backend=BACKEND_MEMORY, repeat=3):
+    """
+    Time the generation of one target for a scenario. Each run synthesizes a new trace and
+    creates a new generator as the processing amends the trace.
+
+    Parameters
+    ----------
+    scenario : dict
+        Keyword arguments of build_sql_trace
+    target : str
+        The target, one of hana, sda, datahub or amdp
+    outputdir : str
+        The output dir of the generator
+    backend : str
+        Whether the artifacts are kept in memory or written to the file system
+    repeat : int
+        Number of timing runs of which the fastest is reported
+
+    Returns
+    -------
+    result : dict
+        Total wall time, the stages and the counters of the fastest run in seconds
+    """
+    best = None
+    for __ in range(repeat):
+        source = SyntheticTraceSource(build_sql_trace(**scenario))
+        output_backend = MemoryBackend() if backend == BACKEND_MEMORY else FileSystemBackend()
+        profiler = Profiler()
+        start = time.perf_counter()
+        generator = Generator('benchmark', '1.0', 'benchmark_grant_service', source, outputdir,
+                              sda_grant_service='benchmark_sda_grant_service',
+                              remote_source='BENCHMARK_REMOTE_SOURCE',
+                              output_backend=output_backend, profiler=profiler)
+        getattr(generator, TARGETS[target])()
+        total = time.perf_counter() - start
+        output_backend.close()
+        if best is None or total < best['total']:
+            best = {
+                'total': total,
+                'stages': profiler.get_summary(),
+                'counters': dict(profiler.counters)
+            }
+    return best
+
+
+def run(scenarios=None, targets=None, backend=BACKEND_MEMORY, repeat=3):
+    """
+    Run the benchmark.
+
+    Parameters
+    ----------
+    scenarios : list
+        The scenarios as keyword arguments of build_sql_trace. Defaults to all trace types
+        in all default sizes.
+    targets : list
+        The targets to generate. Defaults to all targets.
+    backend : str
+        Whether the artifacts are kept in memory or written to the file system
+    repeat : int
+        Number of timing runs of which the fastest is reported
+
+    Returns
+    -------
+    results : dict
+        Metadata of the run and the timing results per scenario and target
+    """
+    if backend not in BACKENDS:
+        raise ValueError('Unknown backend {}. Supported are: {}'.format(
+            backend, ', '.join(BACKENDS)))
+    outputdir = tempfile.mkdtemp(prefix='hana_ml_artifact_benchmark_')
+    results = []
+    try:
+        for scenario in scenarios or build_scenarios():
+            for target in targets or list(TARGETS):
+                result = collections.OrderedDict(scenario)
+                result['target'] = target
+                result.update(run_target(scenario, target, outputdir, backend, repeat))
+                results.append(result)
+    finally:
+        shutil.rmtree(outputdir, ignore_errors=True)
+    return {
+        'format_version': RESULTS_FORMAT_VERSION,
+        'metadata': {
+            'timestamp': datetime.datetime.utcnow().isoformat() + 'Z',
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': backend,
+            'repeat': repeat
+        },
+        'results': results
+    }
+
+
+def write_results(results, file_location):
+    """
+    Write the benchmark results as json.
+
+    Parameters
+    ----------
+    results : dict
+        The benchmark results
+    file_location : str
+        Location of the json file
+    """
+    with open(file_location, 'w') as results_file:
+        json.dump(results, results_file, indent=1)
+
+
+def _parse_args(args):
+    """
+    Parse the command line arguments.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the artifact generation on '
+                                                 'synthetic sql traces.')
+    parser.add_argument('--output', default='benchmark_results.json',
+                        help='location of the json results file')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of timing runs of which the fastest is reported')
+    parser.add_argument('--backend', choices=BACKENDS, default=BACKEND_MEMORY)
+    parser.add_argument('--targets', nargs='+', choices=list(TARGETS))
+    parser.add_argument('--trace-types', nargs='+', choices=TRACE_TYPES)
+    parser.add_argument('--size', type=int, nargs=4, action='append',
+                        metavar=('ALGOS', 'FUNCTIONS', 'TABLES', 'STATEMENT_LENGTH'),
+                        help='scenario size, can be repeated. Defaults to a small, medium '
+                             'and large scenario.')
+    return parser.parse_args(args)
+
+
+if __name__ == '__main__':
+    ARGS = _parse_args(sys.argv[1:])
+    # The generation logs each artifact which would dominate the timings
+    logging.disable(logging.INFO)
+    RESULTS = run(build_scenarios(ARGS.trace_types, [tuple(size) for size in ARGS.size or []]),
+                  ARGS.targets, ARGS.backend, ARGS.repeat)
+    write_results(RESULTS, ARGS.output)
+    print('{:>8} {:>6} {:>9} {:>6} {:>10} {:>8} {:>12}'.format(
+        'trace', 'algos', 'functions', 'tables', 'stmt len', 'target', 'total (s)'))
+    for RESULT in RESULTS['results']:
+        print('{trace_type:>8} {algo_count:>6} {function_count:>9} {table_count:>6} '
+              '{statement_length:>10} {target:>8} {total:>12.5f}'.format(**RESULT))
+    print('Results written to {}'.format(ARGS.output))
@@ -0,0 +1,86 @@
+"""
+This module benchmarks the import time of the package. Each import is timed in a fresh
+interpreter and checked against a time budget. It also checks that the heavy dependencies
+which are only required on use are not imported.
+
+Run as: python -m hana_ml_artifact.benchmarks.import_time
+"""
+import json
+import os
+import subprocess
+import sys
+
+IMPORT_BUDGET = 0.5  # seconds
+LAZY_MODULES = ['hana_ml', 'pandas', 'hdbcli']
+
+IMPORT_SCRIPT = '''
+import json
+import sys
+import time
+start = time.perf_counter()
+import hana_ml_artifact
+duration = time.perf_counter() - start
+print(json.dumps({'duration': duration,
+                  'imported': [module for module in %r if module in sys.modules]}))
+'''
+
+
+def time_import():
+    """
+    Time the import of the package in a fresh interpreter.
+
+    Returns
+    -------
+    duration : float
+        Import time in seconds
+    imported : list
+        The lazy modules which were imported nevertheless
+    """
+    package_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([package_root] + ([env['PYTHONPATH']]
+                                                          if env.get('PYTHONPATH') else []))
+    output = subprocess.check_output([sys.executable, '-c', IMPORT_SCRIPT % LAZY_MODULES],
+                                     env=env, stderr=subprocess.DEVNULL)
+    result = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+    return result['duration'], result['imported']
+
+
+def run(budget=IMPORT_BUDGET, repeat=5):
+    """
+    Run the benchmark.
+
+    Parameters
+    ----------
+    budget : float
+        Maximum import time in seconds
+    repeat : int
+        Number of timing runs of which the best is reported
+
+    Returns
+    -------
+    results : dict
+        Best import time in seconds, the imported lazy modules and whether the budget is met
+    """
+    durations = []
+    imported = set()
+    for __ in range(repeat):
+        duration, modules = time_import()
+        durations.append(duration)
+        imported.update(modules)
+    best = min(durations)
+    return {
+        'import': best,
+        'budget': budget,
+        'imported': sorted(imported),
+        'passed': best <= budget and not imported
+    }
+
+
+if __name__ == '__main__':
+    RESULT = run()
+    print('import hana_ml_artifact: {:.5f} s (budget {:.5f} s)'.format(RESULT['import'],
+                                                                     RESULT['budget']))
+    if RESULT['imported']:
+        print('imported on package import: {}'.format(', '.join(RESULT['imported'])))
+    sys.exit(0 if RESULT['passed'] else 1)
@@ -0,0 +1,95 @@
+"""
+This module benchmarks the multi replacement of strings. The cached replacer is compared against
+compiling the pattern on every call as was done originally.
+
+Run as: python -m hana_ml_artifact.benchmarks.multi_replace
+"""
+import re
+import timeit
+
+from ..hana_ml_utils import MultiReplacer
+from ..hana_ml_utils import StringUtils
+
+
+def uncached_multi_replace(string, replacements):
+    """
+    The original implementation compiling the pattern on every call kept as reference for the
+    benchmark.
+    """
+    rep_sorted = sorted(replacements, key=lambda s: (len(s), s), reverse=True)
+    rep_escaped = [re.escape(replacement) for replacement in rep_sorted]
+    pattern = re.compile("|".join(rep_escaped))
+    return pattern.sub(lambda match: replacements[match.group(0)], string)
+
+
+def build_statements(statement_count, synonym_count):
+    """
+    Build synthetic sql statements and synonym replacements.
+
+    Parameters
+    ----------
+    statement_count : int
+        Number of sql statements
+    synonym_count : int
+        Number of synonyms
+
+    Returns
+    -------
+    statements : list
+        Synthetic sql statements
+    replacements : dict
+        Synonym replacements
+    """
+    replacements = {'#': ':', '"': '', ' WITH OVERVIEW': ''}
+    for idx in range(synonym_count):
+        replacements['_SYS_AFL."PAL_FUNCTION_{}"'.format(idx)] = '"SYSAFL::PALFUNCTION{}"'.format(idx)
+        replacements['"ML"."DATA_{}"'.format(idx)] = '"ML::DATA{}"'.format(idx)
+    statements = []
+    for idx in range(statement_count):
+        statements.append('CALL _SYS_AFL."PAL_FUNCTION_{0}"("#PAL_DATA_TBL_{0}", "#PAL_PARAM_TBL_{0}",'
+                          ' "#PAL_MODEL_TBL_{0}") WITH OVERVIEW'.format(idx % synonym_count))
+    return statements, replacements
+
+
+def run(statement_count=2000, synonym_count=20, repeat=3):
+    """
+    Run the benchmark.
+
+    Parameters
+    ----------
+    statement_count : int
+        Number of sql statements to replace in
+    synonym_count : int
+        Number of synonyms in the replacements
+    repeat : int
+        Number of timing runs of which the best is reported
+
+    Returns
+    -------
+    results : dict
+        Timing results in seconds
+    """
+    statements, replacements = build_statements(statement_count, synonym_count)
+    for statement in statements:
+        if StringUtils.multi_replace(statement, replacements) != \
+                uncached_multi_replace(statement, replacements):
+            raise AssertionError('Replacement differs for: {}'.format(statement))
+    replacer = MultiReplacer(replacements)
+    return {
+        'statements': statement_count,
+        'uncached': min(timeit.repeat(
+            lambda: [uncached_multi_replace(stmt, replacements) for stmt in statements],
+            number=1, repeat=repeat)),
+        'multi_replace': min(timeit.repeat(
+            lambda: [StringUtils.multi_replace(stmt, replacements) for stmt in statements],
+            number=1, repeat=repeat)),
+        'replacer': min(timeit.repeat(
+            lambda: [replacer.replace(stmt) for stmt in statements], number=1, repeat=repeat))
+    }
+
+
+if __name__ == '__main__':
+    RESULT = run()
+    print('{} statements'.format(RESULT['statements']))
+    for key in ['uncached', 'multi_replace', 'replacer']:
+        print('{:>14}: {:.5f} s'.format(key, RESULT[key]))
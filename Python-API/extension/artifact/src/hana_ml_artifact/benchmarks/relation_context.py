@@ -0,0 +1,134 @@
+"""
+This module benchmarks the relation context building of the consumption layer. The indexed
+implementation is compared against the original nested scan on synthetic base layers.
+
+Run as: python -m hana_ml_artifact.benchmarks.relation_context
+"""
+import timeit
+
+from ..sql_processor import SqlProcessorBase
+from ..sql_processor import SqlProcessorConsumptionLayer
+
+FUNCTION_COUNTS = [10, 100, 1000]
+
+
+def build_base_layer(function_count):
+    """
+    Build a synthetic processed sql structure with a base layer of fit / predict pairs where
+    each predict consumes the model of its fit.
+
+    Parameters
+    ----------
+    function_count : int
+        Number of algo/function combinations in the base layer
+
+    Returns
+    -------
+    sql_processed : dict
+        Synthetic processed sql structure
+    """
+    base_layer = {}
+    for idx in range(function_count):
+        algo = 'RandomForestClassifier{}'.format(idx // 2)
+        model_select = 'SELECT * FROM "#PAL_RANDOM_FOREST_MODEL_TBL_{}"'.format(idx // 2)
+        if idx % 2 == 0:
+            function = 'Fit'
+            input_tables = [_table('SELECT * FROM "ML"."DATA_{}"'.format(idx // 2), 'data')]
+            output_tables = [_table(model_select, 'model'),
+                             _table('SELECT * FROM "#PAL_RANDOM_FOREST_STATS_TBL_{}"'.format(
+                                 idx // 2), 'stats')]
+        else:
+            function = 'Predict'
+            input_tables = [_table('SELECT * FROM "ML"."TEST_{}"'.format(idx // 2), 'data'),
+                            _table(model_select, 'model')]
+            output_tables = [_table('SELECT * FROM "#PAL_RANDOM_FOREST_RESULT_TBL_{}"'.format(
+                idx // 2), 'result')]
+        base_layer.setdefault(algo, {})[function] = {
+            SqlProcessorBase.TRACE_KEY_TABLES_INPUT_PROCESSED: input_tables,
+            SqlProcessorBase.TRACE_KEY_TABLES_OUTPUT_PROCESSED: output_tables,
+            SqlProcessorBase.TRACE_KEY_METADATA_PROCESSED: {
+                SqlProcessorBase.TRACE_KEY_METADATA_ATTRIB_PROC_NAME:
+                    'base_' + algo.lower() + '_' + function.lower()
+            }
+        }
+    return {SqlProcessorBase.TRACE_KEY_BASE_LAYER: base_layer}
+
+
+def _table(select, name):
+    """
+    Build a synthetic processed table.
+    """
+    return {
+        SqlProcessorBase.TRACE_KEY_TABLES_ATTRIB_SELECT: select,
+        SqlProcessorBase.TRACE_KEY_TABLES_ATTRIB_INT_NAME: 'lt_' + name,
+        SqlProcessorBase.TRACE_KEY_TABLES_ATTRIB_DBOBJECT_NAME: '"output.' + name + '"'
+    }
+
+
+def legacy_build_relation_context(sql_processed):
+    """
+    The original nested scan implementation of the relation context kept as reference for the
+    benchmark.
+    """
+    relations = []
+    base_layer = sql_processed[SqlProcessorBase.TRACE_KEY_BASE_LAYER]
+    for algo in base_layer:
+        for function in base_layer[algo]:
+            for table in base_layer[algo][function].get(
+                    SqlProcessorBase.TRACE_KEY_TABLES_OUTPUT_PROCESSED, []):
+                select = table[SqlProcessorBase.TRACE_KEY_TABLES_ATTRIB_SELECT]
+                for check_algo in base_layer:
+                    for check_function in base_layer[check_algo]:
+                        for check_table in base_layer[check_algo][check_function].get(
+                                SqlProcessorBase.TRACE_KEY_TABLES_INPUT_PROCESSED, []):
+                            if select in check_table[SqlProcessorBase.TRACE_KEY_TABLES_ATTRIB_SELECT]:
+                                relations.append({
+                                    'from_path': 'base_layer/' + algo + '/' + function,
+                                    'from_object': table,
+                                    'to_path': 'base_layer/' + check_algo + '/' + check_function,
+                                    'to_object': check_table
+                                })
+    return relations
+
+
+def run(function_counts=None, repeat=3):
+    """
+    Run the benchmark.
+
+    Parameters
+    ----------
+    function_counts : list
+        The number of functions of the synthetic base layers
+    repeat : int
+        Number of timing runs of which the best is reported
+
+    Returns
+    -------
+    results : list
+        Timing results per function count in seconds
+    """
+    consumption_layer = SqlProcessorConsumptionLayer(None)
+    results = []
+    for function_count in function_counts or FUNCTION_COUNTS:
+        sql_processed = build_base_layer(function_count)
+        indexed = consumption_layer._build_relation_context(sql_processed)  # pylint: disable=protected-access
+        legacy = legacy_build_relation_context(sql_processed)
+        if [(rel['from_path'], rel['to_path']) for rel in indexed] != \
+                [(rel['from_path'], rel['to_path']) for rel in legacy]:
+            raise AssertionError('Relations differ for {} functions'.format(function_count))
+        results.append({
+            'functions': function_count,
+            'relations': len(indexed),
+            'indexed': min(timeit.repeat(
+                lambda: consumption_layer._build_relation_context(sql_processed),  # pylint: disable=protected-access
+                number=1, repeat=repeat)),
+            'legacy': min(timeit.repeat(
+                lambda: legacy_build_relation_context(sql_processed), number=1, repeat=repeat))
+        })
+    return results
+
+
+if __name__ == '__main__':
+    print('{:>10} {:>10} {:>12} {:>12}'.format('functions', 'relations', 'indexed (s)', 'legacy (s)'))
+    for result in run():
+        print('{functions:>10} {relations:>10} {indexed:>12.5f} {legacy:>12.5f}'.format(**result))
@@ -0,0 +1,226 @@
+"""
+This module synthesizes sql traces shaped like the ones recorded by the hana_ml package. Both
+the classic form with individual sql statements and the autonomous form with DO BEGIN / END
+blocks are supported, so the generation can be benchmarked without a HANA connection.
+"""
+from ..trace_source import TraceSource
+
+TRACE_TYPE_CLASSIC = 'classic'
+TRACE_TYPE_AUTO = 'auto'
+TRACE_TYPES = [TRACE_TYPE_CLASSIC, TRACE_TYPE_AUTO]
+
+PAL_SCHEMA = '_SYS_AFL'
+PAL_FIT = 'PAL_RANDOM_DECISION_TREES'
+PAL_PREDICT = 'PAL_RANDOM_DECISION_TREES_PREDICT'
+
+MODEL_TABLE_TYPE = 'table ("ROW_INDEX" INTEGER,"TREE_INDEX" INTEGER,' \
+                   '"MODEL_CONTENT" NVARCHAR(5000))'
+STATS_TABLE_TYPE = 'table ("STAT_NAME" NVARCHAR(256),"STAT_VALUE" NVARCHAR(1000))'
+RESULT_TABLE_TYPE = 'table ("ID" INTEGER,"SCORE" NVARCHAR(100),"CONFIDENCE" DOUBLE)'
+
+
+class SyntheticTraceSource(TraceSource):
+    """
+    Provides a synthesized sql trace. The trace is amended during processing, so a new
+    source needs to be created for each generator.
+    """
+    def __init__(self, sql_trace):
+        """
+        Provides a synthesized sql trace.
+
+        Parameters
+        ----------
+        sql_trace : dict
+            The synthesized sql trace
+        """
+        self.sql_trace = sql_trace
+
+    def get_sql_trace(self):
+        """
+        Get the synthesized sql trace.
+
+        Returns
+        -------
+        sql_trace : dict
+            raw sql trace structure as generated in the hana ml package
+        """
+        return self.sql_trace
+
+
+def build_sql_trace(trace_type=TRACE_TYPE_CLASSIC, algo_count=2, function_count=2,
+                    table_count=2, statement_length=3):
+    """
+    Synthesize a sql trace. Each algorithm has a fit function and function_count - 1 predict
+    functions consuming the model of the fit.
+
+    Parameters
+    ----------
+    trace_type : str
+        classic for individual sql statements or auto for autonomous blocks
+    algo_count : int
+        Number of algorithms
+    function_count : int
+        Number of functions per algorithm including the fit
+    table_count : int
+        Number of output tables per function. The fit always outputs the model and the
+        predict the result, additional tables are statistics tables.
+    statement_length : int
+        Number of data columns selected by the input statements
+
+    Returns
+    -------
+    sql_trace : dict
+        The synthesized sql trace
+    """
+    if trace_type not in TRACE_TYPES:
+        raise ValueError('Unknown trace type {}. Supported are: {}'.format(
+            trace_type, ', '.join(TRACE_TYPES)))
+    if function_count < 1 or table_count < 1:
+        raise ValueError('At least one function and one table per function are required')
+    sql_trace = {}
+    for algo_idx in range(algo_count):
+        algo = 'RandomForestClassifier{}'.format(algo_idx if algo_idx else '')
+        suffix = '{}_{}'.format(algo_idx, trace_type.upper())
+        columns = ['"ID"'] + ['"F{}"'.format(idx) for idx in range(statement_length)] \
+            + ['"CLASS"']
+        column_types = ['"ID" INTEGER'] + ['"F{}" DOUBLE'.format(idx)
+                                           for idx in range(statement_length)] \
+            + ['"CLASS" NVARCHAR(10)']
+        model = '#PAL_RANDOM_FOREST_MODEL_TBL_' + suffix
+        functions = {}
+        for function_idx in range(function_count):
+            if function_idx == 0:
+                function = 'Fit'
+                select = 'SELECT {} FROM "ML"."TRAIN_{}"'.format(', '.join(columns), algo_idx)
+                data_table_type = 'table ({})'.format(','.join(column_types))
+            else:
+                # The label column is not part of the data to predict
+                function = 'Predict' if function_idx == 1 else 'Predict{}'.format(function_idx)
+                select = 'SELECT {} FROM "ML"."TEST_{}_{}"'.format(
+                    ', '.join(columns[:-1]), algo_idx, function_idx)
+                data_table_type = 'table ({})'.format(','.join(column_types[:-1]))
+            if trace_type == TRACE_TYPE_AUTO:
+                functions[function] = _build_auto_function(
+                    function_idx, suffix, select, data_table_type, model, table_count)
+            else:
+                functions[function] = _build_classic_function(
+                    function_idx, suffix, select, data_table_type, model, table_count)
+        sql_trace[algo] = functions
+    return sql_trace
+
+
+def _build_output_tables(function_idx, suffix, model, table_count):
+    """
+    Build the output tables of a function.
+
+    Returns
+    -------
+    output_tables : list
+        Output tables with name, table type and select
+    """
+    if function_idx == 0:
+        tables = [(model, MODEL_TABLE_TYPE)]
+    else:
+        tables = [('#PAL_RANDOM_FOREST_RESULT_TBL_{}_{}'.format(suffix, function_idx),
+                   RESULT_TABLE_TYPE)]
+    for table_idx in range(1, table_count):
+        tables.append(('#PAL_RANDOM_FOREST_STATS{}_TBL_{}_{}'.format(table_idx, suffix,
+                                                                     function_idx),
+                       STATS_TABLE_TYPE))
+    return [{'name': name, 'table_type': table_type, 'select': 'SELECT * FROM "{}"'.format(name)}
+            for name, table_type in tables]
+
+
+def _build_classic_function(function_idx, suffix, select, data_table_type, model, table_count):
+    """
+    Build a traced function with individual sql statements.
+
+    Returns
+    -------
+    trace_object : dict
+        One traced object of the sql trace
+    """
+    data = '#PAL_RANDOM_FOREST_DATA_TBL_{}_{}'.format(suffix, function_idx)
+    output_tables = _build_output_tables(function_idx, suffix, model, table_count)
+    sql = ['CREATE LOCAL TEMPORARY COLUMN TABLE "{}" AS ({})'.format(data, select)]
+    input_tables = [{'name': data, 'table_type': data_table_type, 'select': select}]
+    output_vars = []
+    if function_idx == 0:
+        param = '#PAL_RANDOM_FOREST_PARAM_TBL_' + suffix
+        sql = ['CREATE LOCAL TEMPORARY COLUMN TABLE "{}" ("PARAM_NAME" VARCHAR(5000), '
+               '"INT_VALUE" INTEGER, "DOUBLE_VALUE" DOUBLE, "STRING_VALUE" VARCHAR(5000))'.format(
+                   param),
+               'INSERT INTO "{}" VALUES (\'SEED\', 2, NULL, NULL)'.format(param)] + sql
+        call_tables = [data, param]
+        pal_function = PAL_FIT
+        if table_count > 1:
+            output_vars.append({
+                'name': 'OOB_ERROR', 'type': 'METRIC', 'data_type': 'DOUBLE',
+                'select': 'SELECT "STAT_VALUE" FROM "{}" WHERE "STAT_NAME"=\'OOB\''.format(
+                    output_tables[1]['name'])})
+    else:
+        input_tables.append({'name': model, 'table_type': MODEL_TABLE_TYPE,
+                             'select': 'SELECT * FROM "{}"'.format(model)})
+        call_tables = [data, model]
+        pal_function = PAL_PREDICT
+    for table in output_tables:
+        sql.append('CREATE LOCAL TEMPORARY COLUMN TABLE "{}" {}'.format(
+            table['name'], table['table_type'][len('table '):]))
+    sql.append('CALL {}."{}"({}) WITH OVERVIEW'.format(
+        PAL_SCHEMA, pal_function,
+        ', '.join('"{}"'.format(name) for name in
+                  call_tables + [table['name'] for table in output_tables])))
+    if function_idx == 0:
+        sql.append('DROP TABLE "{}"'.format(call_tables[1]))
+    return {
+        'sql': sql,
+        'function': [{'name': pal_function, 'schema': PAL_SCHEMA, 'type': 'pal'}],
+        'input_tables': input_tables,
+        'output_tables': output_tables,
+        'output_vars': output_vars
+    }
+
+
+def _build_auto_function(function_idx, suffix, select, data_table_type, model, table_count):
+    """
+    Build a traced function with an autonomous DO BEGIN / END block.
+
+    Returns
+    -------
+    trace_object : dict
+        One traced object of the sql trace
+    """
+    output_tables = _build_output_tables(function_idx, suffix, model, table_count)
+    auto = [{'auto_name': 'in_0', 'name': 'in_0', 'table_type': data_table_type,
+             'select': select}]
+    block = ['DO BEGIN',
+             'DECLARE param_name VARCHAR(5000) ARRAY;',
+             'in_0 = {};'.format(select)]
+    call_args = [':in_0']
+    if function_idx == 0:
+        block += ["param_name[1] := N'SEED';", 'params = UNNEST(:param_name);']
+        call_args.append(':params')
+        pal_function = PAL_FIT
+    else:
+        model_select = 'SELECT * FROM "{}"'.format(model)
+        auto.append({'auto_name': 'in_1', 'name': 'in_1', 'table_type': MODEL_TABLE_TYPE,
+                     'select': model_select})
+        block.append('in_1 = {};'.format(model_select))
+        call_args.append(':in_1')
+        pal_function = PAL_PREDICT
+    out_names = ['out_{}'.format(idx) for idx in range(len(output_tables))]
+    block.append('CALL {}.{}({});'.format(PAL_SCHEMA, pal_function,
+                                          ', '.join(call_args + out_names)))
+    for out_name, table in zip(out_names, output_tables):
+        auto.append({'auto_name': out_name, 'name': table['name']})
+        block.append('CREATE LOCAL TEMPORARY COLUMN TABLE "{}" AS (SELECT * FROM :{});'.format(
+            table['name'], out_name))
+    block.append('END')
+    return {
+        'sql': ['\n'.join(block)],
+        'function': [{'name': pal_function, 'schema': PAL_SCHEMA, 'type': 'pal'}],
+        'auto': auto,
+        'input_tables': [],
+        'output_tables': output_tables,
+        'output_vars': []
+    }
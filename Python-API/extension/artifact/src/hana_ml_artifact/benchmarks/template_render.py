@@ -0,0 +1,92 @@
+"""
+This module benchmarks the rendering of file templates. The compiled template registry is
+compared against reading the template and replacing the placeholders on every call as was
+done originally.
+
+Run as: python -m hana_ml_artifact.benchmarks.template_render
+"""
+import os
+import timeit
+
+from ..config import ConfigConstants
+from ..generators.filewriter.template_registry import TemplateRegistry
+from ..hana_ml_utils import StringUtils
+
+TEMPLATE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'generators', 'filewriter', ConfigConstants.TEMPLATE_DIR,
+                             ConfigConstants.PROCEDURE_TEMPLATE_FILE)
+
+
+def legacy_render(template_file, replacements):
+    """
+    The original implementation reading the template on every call kept as reference for the
+    benchmark.
+    """
+    with open(template_file, 'r') as file:
+        content = file.read()
+    return StringUtils.multi_replace(content, replacements)
+
+
+def build_replacements(procedure_count, statement_count=50):
+    """
+    Build synthetic procedure replacements.
+
+    Parameters
+    ----------
+    procedure_count : int
+        Number of procedures
+    statement_count : int
+        Number of sql statements per procedure
+
+    Returns
+    -------
+    replacements : list
+        Replacements per procedure
+    """
+    sql_str = '\n'.join('lt_{0} = SELECT * FROM "ML"."DATA_{0}";'.format(idx)
+                        for idx in range(statement_count))
+    return [{
+        ConfigConstants.PROCEDURE_TEMPLATE_SQL_PLACEHOLDER: sql_str,
+        ConfigConstants.PROCEDURE_TEMPLATE_PROC_NAME: 'base_procedure_{}'.format(idx),
+        ConfigConstants.PROCEDURE_TEMPLATE_PROC_INTERFACE: 'out lt_result TABLE ("ID" INTEGER)'
+    } for idx in range(procedure_count)]
+
+
+def run(procedure_count=1000, repeat=3):
+    """
+    Run the benchmark.
+
+    Parameters
+    ----------
+    procedure_count : int
+        Number of procedures to render
+    repeat : int
+        Number of timing runs of which the best is reported
+
+    Returns
+    -------
+    results : dict
+        Timing results in seconds
+    """
+    procedures = build_replacements(procedure_count)
+    for replacements in procedures:
+        if TemplateRegistry.get(TEMPLATE_FILE).render(replacements) != \
+                legacy_render(TEMPLATE_FILE, replacements):
+            raise AssertionError('Rendering differs for: {}'.format(
+                replacements[ConfigConstants.PROCEDURE_TEMPLATE_PROC_NAME]))
+    return {
+        'procedures': procedure_count,
+        'legacy': min(timeit.repeat(
+            lambda: [legacy_render(TEMPLATE_FILE, rep) for rep in procedures],
+            number=1, repeat=repeat)),
+        'compiled': min(timeit.repeat(
+            lambda: [TemplateRegistry.get(TEMPLATE_FILE).render(rep) for rep in procedures],
+            number=1, repeat=repeat))
+    }
+
+
+if __name__ == '__main__':
+    RESULT = run()
+    print('{} procedures'.format(RESULT['procedures']))
+    for key in ['legacy', 'compiled']:
+        print('{:>10}: {:.5f} s'.format(key, RESULT[key]))
@@ -6,6 +6,7 @@ It consists of two parts.
 and retrieving of configurations.
 2. Config Constants for easy access to config values. 
 """
+import copy
 import os
 import json
 from ..hana_ml_utils import StringUtils
@@ -67,6 +68,25 @@ class ConfigHandler(object):
             Object that will be stored under the provided key
         """
         return self.config[key]
+
+    def copy(self, exclude_keys=None):
+        """
+        Get a copy of the config. The entries are shared with this config.
+
+        Parameters
+        ----------
+        exclude_keys: list
+            Keys of the entries which are not copied
+
+        Returns
+        -------
+        config: ConfigHandler
+            The copied config
+        """
+        config = copy.copy(self)
+        config.config = {key: value for key, value in self.config.items()
+                         if key not in (exclude_keys or [])}
+        return config
     
     def data_source_mapping(self, replace_str):
         """
@@ -204,6 +224,9 @@ class ConfigConstants(object):
     CONFIG_KEY_VERSION = 'version' 
     CONFIG_KEY_MERGE_STRATEGY = 'merge_type'
     CONFIG_KEY_GROUP_STRATEGY = 'group_type'
+    CONFIG_KEY_ARTIFACT_MANIFEST = 'artifact_manifest'
+    CONFIG_KEY_OUTPUT_BACKEND = 'output_backend'
+    CONFIG_KEY_PROFILER = 'profiler'
 
     # Config Data
     DATA_CONVERSION_HDBTABLE_HDBDD_FILE = 'hdbtable_to_hdbdd_datatype_mapping.json'
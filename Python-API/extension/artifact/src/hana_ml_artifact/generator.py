@@ -5,7 +5,6 @@ This module is the entrypoint for artifact generation.
 # TODO: Improve temp tale generation with more human readable names
 import logging
 import os
-import pandas as pd
 
 from .generators import HanaGenerator
 from .generators import HanaSDAGenerator
@@ -14,8 +13,14 @@ from .generators import CloudFoundryGenerator
 from .generators import AMDPGenerator
 from .config import ConfigHandler
 from .config import ConfigConstants
+from .processed_cache import ProcessedCache
 from .sql_processor import SqlProcessor
+from .trace_source import TraceSource
+from .hana_ml_utils import ArtifactManifest
 from .hana_ml_utils import DirectoryHandler
+from .hana_ml_utils import FileSystemBackend
+from .hana_ml_utils import Profiler
+from .hana_ml_utils import ZipBackend
 from .hana_ml_utils import StringUtils
 
 logging.basicConfig(level=logging.DEBUG)
@@ -66,7 +71,9 @@ class Generator(object):
     def __init__(self, project_name, version, grant_service, connection_context, outputdir, #pylint: disable=too-many-arguments
                  generation_merge_type=ConfigConstants.GENERATION_MERGE_NONE,
                  generation_group_type=ConfigConstants.GENERATION_GROUP_FUNCTIONAL,
-                 sda_grant_service=None, remote_source=''):
+                 sda_grant_service=None, remote_source='', max_workers=None,
+                 use_processes=False, incremental=False, processed_cache=None,
+                 output_backend=None, profiler=None):
         """
         Entry class for artifact generation.
 
@@ -82,7 +89,9 @@ class Generator(object):
             proper access during the deployment
         connection_context: object
             The HANA ML connection context object used. This holds the sql trace object required
-            to generate the artifacts
+            to generate the artifacts. Alternatively a TraceSource or the location of a trace
+            file recorded with FileTraceSource, as str or os.PathLike, can be provided to
+            generate without a connection to HANA.
         outputdir: str
             The location where the artifacts need to placed after generation.
         generation_merge_type: int
@@ -104,9 +113,43 @@ class Generator(object):
             grants.
         remote_source: str
             When generating sda artifacts what is the name of the remote source to be used.
+        max_workers: int
+            Number of workers used to process the algo/function combinations of the sql trace
+            in parallel. None or 1 processes them sequentially.
+        use_processes: boolean
+            Whether the parallel workers are processes rather than threads.
+        incremental: boolean
+            Keep the artifacts of a previous run in the output dir and only re-render and
+            rewrite the files of which the inputs changed. A manifest with the digest of the
+            inputs of each file is stored in the project folder of the output dir.
+        processed_cache: str
+            Location of a processed sql trace file. If the file was stored for the same sql
+            trace and settings the processing is skipped and the stored result is used.
+            Otherwise the sql trace is processed and the result is stored in the file.
+        output_backend: OutputBackend
+            Where the artifacts are written to. Defaults to the file system. A MemoryBackend
+            keeps the artifacts in memory and a ZipBackend writes them into a zip archive
+            once it is closed after generation. Locations in the backends are below the
+            output dir.
+        profiler: Profiler
+            Records the timing of the generation stages as spans together with counters of
+            the processed statements, tables, synonyms and written files. The recorded data
+            can be exported with export_json or export_chrome_trace. By default nothing is
+            recorded.
         """
         self.directory_handler = DirectoryHandler()
         self.config = ConfigHandler()
+        self._settings = {
+            'project_name': project_name,
+            'version': version,
+            'grant_service': grant_service,
+            'outputdir': outputdir,
+            'generation_merge_type': generation_merge_type,
+            'generation_group_type': generation_group_type,
+            'sda_grant_service': sda_grant_service,
+            'remote_source': remote_source
+        }
+        self._cache_key = None
         self._init_config(project_name,
                           version,
                           grant_service,
@@ -114,16 +157,85 @@ class Generator(object):
                           generation_merge_type,
                           generation_group_type,
                           sda_grant_service,
-                          remote_source)
-        sql_processor = SqlProcessor(self.config)
-        sql_processor.parse_sql_trace(connection_context)
+                          remote_source,
+                          incremental,
+                          output_backend,
+                          profiler)
+        sql_processor = SqlProcessor(self.config, max_workers=max_workers,
+                                     use_processes=use_processes)
+        with self.profiler.span('generator_init'):
+            if processed_cache:
+                self._process_cached(sql_processor, connection_context, processed_cache)
+            else:
+                sql_processor.parse_sql_trace(connection_context)
+
+    @classmethod
+    def from_processed(cls, path, outputdir=None, incremental=False, output_backend=None,
+                       profiler=None):
+        """
+        Create a generator from a processed sql trace file as stored by save_processed or
+        the processed_cache option. No connection to HANA is required.
+
+        Parameters
+        ----------
+        path : str
+            Location of the processed sql trace file
+        outputdir: str
+            The location where the artifacts need to placed after generation. Defaults to
+            the output dir of the generator which stored the file.
+        incremental: boolean
+            Only re-render and rewrite the files of which the inputs changed.
+        output_backend: OutputBackend
+            Where the artifacts are written to. Defaults to the file system.
+        profiler: Profiler
+            Records the timing of the generation stages. By default nothing is recorded.
+
+        Returns
+        -------
+        generator : Generator
+            The generator ready for artifact generation
+        """
+        content = ProcessedCache(path).load()
+        generator = cls.__new__(cls)
+        generator.directory_handler = DirectoryHandler()
+        generator.config = ConfigHandler()
+        generator._settings = content[ProcessedCache.KEY_SETTINGS]
+        generator._cache_key = content[ProcessedCache.KEY_CACHE_KEY]
+        settings = dict(generator._settings)
+        if outputdir:
+            settings['outputdir'] = outputdir
+        settings['incremental'] = incremental
+        settings['output_backend'] = output_backend
+        settings['profiler'] = profiler
+        generator._init_config(**settings)
+        generator.config.add_entry(ConfigConstants.CONFIG_KEY_DATA_SOURCE_MAPPING,
+                                   content[ProcessedCache.KEY_DATA_SOURCE_MAPPING])
+        generator.config.add_entry(ConfigConstants.CONFIG_KEY_SQL_PROCESSED,
+                                   content[ProcessedCache.KEY_SQL_PROCESSED])
+        return generator
+
+    def save_processed(self, path):
+        """
+        Store the processed sql trace together with the settings and data source mapping
+        so the artifacts can be generated later on using from_processed.
+
+        Parameters
+        ----------
+        path : str
+            Location of the processed sql trace file
+        """
+        ProcessedCache(path).save(self._cache_key,
+                                  self._settings,
+                                  self.get_hana_data_source_mapping(),
+                                  self.config.get_entry(ConfigConstants.CONFIG_KEY_SQL_PROCESSED))
 
     def generate_amdp(self):
         """
         (Experimental) Generate ABAP ADMP classses.
         """
-        amdp_generator = AMDPGenerator(self.config)
-        amdp_generator.generate()
+        with self.profiler.span('generate_amdp'):
+            amdp_generator = AMDPGenerator(self.config)
+            amdp_generator.generate()
 
     def generate_hana(self, base_layer=True,
                       consumption_layer=True,
@@ -141,10 +253,11 @@ class Generator(object):
             In case data source mapping is provided you can forrce to only do this for the
             sda hdi container
         """
-        hana_generator = HanaGenerator(self.config)
-        hana_generator.generate_artifacts(base_layer,
-                                                 consumption_layer,
-                                                 sda_data_source_mapping_only)
+        with self.profiler.span('generate_hana'):
+            hana_generator = HanaGenerator(self.config)
+            hana_generator.generate_artifacts(base_layer,
+                                              consumption_layer,
+                                              sda_data_source_mapping_only)
 
     def generate_hana_sda(self, model_only=True, sda_data_source_mapping_only=False):
         """
@@ -162,12 +275,13 @@ class Generator(object):
             In case data source mapping is provided you can forrce to only do this for the
             sda hdi container
         """
-        hana_sda_generator = HanaSDAGenerator(self.config)
-        # Create hana objects. We will re-use consumption layer when doing the remote calls
-        self.generate_hana(base_layer=True,
-                           consumption_layer=True,
-                           sda_data_source_mapping_only=sda_data_source_mapping_only)
-        hana_sda_generator.generate_artifacts(model_only)
+        with self.profiler.span('generate_hana_sda'):
+            hana_sda_generator = HanaSDAGenerator(self.config)
+            # Create hana objects. We will re-use consumption layer when doing the remote calls
+            self.generate_hana(base_layer=True,
+                               consumption_layer=True,
+                               sda_data_source_mapping_only=sda_data_source_mapping_only)
+            hana_sda_generator.generate_artifacts(model_only)
 
     def generate_sapdi(self, generate_hana_artifacts=True, include_rest_endpoint=False):
         """
@@ -219,9 +333,7 @@ class Generator(object):
         Clean the output dir where artifacts will be generated.
         """
         path = self.config.get_entry(ConfigConstants.CONFIG_KEY_OUTPUT_DIR)
-        if os.path.exists(path):
-            self.directory_handler.delete_directory_content(path)
-            os.rmdir(path)
+        self.config.get_entry(ConfigConstants.CONFIG_KEY_OUTPUT_BACKEND).delete_directory(path)
 
     def get_output_path_hana(self):
         """
@@ -288,6 +400,7 @@ class Generator(object):
             Returns the datasource mapping as a pandas dataframe for formatted display
             Mainly usefull in jupyter notebook scenario.
         """
+        import pandas as pd  # Only required for display so imported on use
         data = self.get_hana_data_source_mapping()
         return pd.DataFrame.from_dict(data, orient='index', columns=["Data Source Map To:"])
 
@@ -314,6 +427,38 @@ class Generator(object):
         self.config.add_entry(ConfigConstants.CONFIG_KEY_DATA_SOURCE_MAPPING,
                               data_source_mapping)
 
+    def _process_cached(self, sql_processor, connection_context, path):
+        """
+        Use the processed sql trace file if it was stored for the same sql trace and
+        settings. Otherwise process the sql trace and store the result.
+
+        Parameters
+        ----------
+        sql_processor: SqlProcessor
+            The sql processor
+        connection_context: object
+            The HANA ML connection context object which holds the sql trace object or any
+            other source accepted by TraceSource.create
+        path : str
+            Location of the processed sql trace file
+        """
+        processed_cache = ProcessedCache(path)
+        with self.profiler.span('parse_trace'):
+            sql_trace = TraceSource.create(connection_context).get_sql_trace()
+        # The key is built before processing as the processing amends the trace objects
+        self._cache_key = processed_cache.build_key(sql_trace, self._settings)
+        content = None
+        if processed_cache.exists():
+            with self.profiler.span('processed_cache'):
+                content = processed_cache.load(self._cache_key)
+        if content:
+            logger.info('Using processed sql trace %s', path)
+            self.config.add_entry(ConfigConstants.CONFIG_KEY_SQL_PROCESSED,
+                                  content[ProcessedCache.KEY_SQL_PROCESSED])
+        else:
+            sql_processor.process_sql_trace(sql_trace)
+            self.save_processed(path)
+
     def _generate_datahub(self,
                           generate_hana_artifacts=True,
                           include_rest_endpoint=False,
@@ -330,12 +475,13 @@ class Generator(object):
         include_ml_operators: boolean
             Include ML operators for the SAP DI scenario
         """
-        datahub_generator = DataHubGenerator(self.config)
-        # Create base hana objects. No need for a hana consumption layer as sapdi will act
-        # as the consumption layer
-        if generate_hana_artifacts:
-            self.generate_hana(base_layer=True, consumption_layer=False)
-        datahub_generator.generate_artifacts(include_rest_endpoint, include_ml_operators)
+        with self.profiler.span('generate_datahub'):
+            datahub_generator = DataHubGenerator(self.config)
+            # Create base hana objects. No need for a hana consumption layer as sapdi will act
+            # as the consumption layer
+            if generate_hana_artifacts:
+                self.generate_hana(base_layer=True, consumption_layer=False)
+            datahub_generator.generate_artifacts(include_rest_endpoint, include_ml_operators)
 
     def _init_config(self, #pylint: disable=too-many-arguments
                      project_name,
@@ -345,7 +491,10 @@ class Generator(object):
                      generation_merge_type,
                      generation_group_type,
                      sda_grant_service,
-                     remote_source):
+                     remote_source,
+                     incremental=False,
+                     output_backend=None,
+                     profiler=None):
         """
         Method to initiate the configuration.
 
@@ -380,6 +529,12 @@ class Generator(object):
             grants.
         remote_source : str
             When generating sda artifacts what is the name of the remote source to be used.
+        incremental : boolean
+            Only re-render and rewrite the files of which the inputs changed.
+        output_backend : OutputBackend
+            Where the artifacts are written to. Defaults to the file system.
+        profiler : Profiler
+            Records the timing of the generation stages. Defaults to a disabled profiler.
         """
         # Remove improper characters
         project_name = StringUtils.remove_special_characters(project_name)
@@ -399,6 +554,17 @@ class Generator(object):
         self.config.add_entry(ConfigConstants.CONFIG_KEY_MERGE_STRATEGY, generation_merge_type)
         self.config.add_entry(ConfigConstants.CONFIG_KEY_GROUP_STRATEGY, generation_group_type)
         self.config.add_entry(ConfigConstants.CONFIG_KEY_OUTPUT_DIR, outputdir)
+        if output_backend is None:
+            output_backend = FileSystemBackend()
+        elif incremental and not isinstance(output_backend, FileSystemBackend):
+            raise ValueError('Incremental generation requires the file system output backend')
+        if isinstance(output_backend, ZipBackend) and output_backend.root is None:
+            output_backend.root = output_path
+        self.config.add_entry(ConfigConstants.CONFIG_KEY_OUTPUT_BACKEND, output_backend)
+        self.config.add_entry(ConfigConstants.CONFIG_KEY_ARTIFACT_MANIFEST,
+                              ArtifactManifest(output_path) if incremental else None)
+        self.profiler = profiler if profiler is not None else Profiler(enabled=False)
+        self.config.add_entry(ConfigConstants.CONFIG_KEY_PROFILER, self.profiler)
 
 
         self.config.add_entry(ConfigConstants.CONFIG_KEY_MODULE_NAME, module_name)
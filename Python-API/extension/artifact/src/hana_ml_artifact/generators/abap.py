@@ -39,18 +39,20 @@ class AMDPGenerator(object):
         Build up the folder structure. It is currenlty not a deep structure but just a subbfolder abap
         under the root output path.
         """
-        self._clean_folder_structurre()
+        path = self.config.get_entry( ConfigConstants.CONFIG_KEY_OUTPUT_PATH_ABAP )
+        output_backend = self.config.get_entry(ConfigConstants.CONFIG_KEY_OUTPUT_BACKEND)
+        if not self.config.get_entry(ConfigConstants.CONFIG_KEY_ARTIFACT_MANIFEST):
+            # Incremental generation keeps the previous output so only clean otherwise
+            self._clean_folder_structurre()
         # Create base directories
-        self.directory_handler.create_directory( self.config.get_entry( ConfigConstants.CONFIG_KEY_OUTPUT_PATH_ABAP ))
+        output_backend.create_directory( path )
         
     def _clean_folder_structurre(self):
         """
         Clean up physical folder structure. 
         """
         path = self.config.get_entry( ConfigConstants.CONFIG_KEY_OUTPUT_PATH_ABAP )
-        if os.path.exists( path ):
-            self.directory_handler.delete_directory_content( path )
-            os.rmdir( path )
+        self.config.get_entry(ConfigConstants.CONFIG_KEY_OUTPUT_BACKEND).delete_directory( path )
 
     def _extend_config(self):
         """
@@ -108,3 +110,5 @@ class AMDPGenerator(object):
 
                         signature_str = self.hana_helper._build_procedure_signature(None, summary_tables) # only model debrief tables
                         amdp_writer.generate(self.config.get_entry(ConfigConstants.CONFIG_KEY_OUTPUT_PATH_ABAP), input, model_interface_name, output, signature_str, algo, body)
+
+        self.hana_helper._finalize_artifacts(self.config.get_entry(ConfigConstants.CONFIG_KEY_OUTPUT_PATH_ABAP))
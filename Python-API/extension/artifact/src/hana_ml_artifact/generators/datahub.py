@@ -9,6 +9,7 @@ from ..config import ConfigConstants
 from ..hana_ml_utils import DirectoryHandler
 from ..hana_ml_utils import StringUtils
 from .filewriter.datahub import GraphWriter 
+from .hana import HanaGeneratorHelper
 
 from ..sql_processor import SqlProcessor
 
@@ -51,6 +52,7 @@ class DataHubGenerator(object):
         self._build_folder_structure()
         consumption_processor = DataHubConsumptionProcessor(self.config)
         consumption_processor.generate(self.config.get_entry(ConfigConstants.CONFIG_KEY_OUTPUT_PATH_DATAHUB), include_rest_endpoint, include_ml_operators)
+        HanaGeneratorHelper(self.config)._finalize_artifacts(self.config.get_entry(ConfigConstants.CONFIG_KEY_OUTPUT_PATH_DATAHUB))
         return self.config.get_entry( ConfigConstants.CONFIG_KEY_OUTPUT_PATH_DATAHUB )
 
     def _build_folder_structure(self):
@@ -58,18 +60,20 @@ class DataHubGenerator(object):
         Build up the folder structure. It is currenlty not a deep structure but just a subbfolder datahub
         under the root output path.
         """
-        self._clean_folder_structurre()
+        path = self.config.get_entry( ConfigConstants.CONFIG_KEY_OUTPUT_PATH_DATAHUB )
+        output_backend = self.config.get_entry(ConfigConstants.CONFIG_KEY_OUTPUT_BACKEND)
+        if not self.config.get_entry(ConfigConstants.CONFIG_KEY_ARTIFACT_MANIFEST):
+            # Incremental generation keeps the previous output so only clean otherwise
+            self._clean_folder_structurre()
         # Create base directories
-        self.directory_handler.create_directory( self.config.get_entry( ConfigConstants.CONFIG_KEY_OUTPUT_PATH_DATAHUB ))
+        output_backend.create_directory( path )
         
     def _clean_folder_structurre(self):
         """
         Clean up physical folder structure. 
         """
         path = self.config.get_entry( ConfigConstants.CONFIG_KEY_OUTPUT_PATH_DATAHUB )
-        if os.path.exists( path ):
-            self.directory_handler.delete_directory_content( path )
-            os.rmdir( path )
+        self.config.get_entry(ConfigConstants.CONFIG_KEY_OUTPUT_BACKEND).delete_directory( path )
 
     def _extend_config(self):
         """
@@ -2,14 +2,18 @@
 This module provides convenience methods for writing of the files that represent the
 artifacts.
 """
+import os
+
+from ...config import ConfigConstants
 from ...hana_ml_utils import FileHandler
-from ...hana_ml_utils import StringUtils
+
+from .template_registry import TemplateRegistry
 
 class FileWriterBase(object):
     """
     This class provides helper function for file writing
     """
-    def __init__(self, config):
+    def __init__(self, config, batch_writer=None):
         """
         This is main entry point.
 
@@ -17,13 +21,18 @@ class FileWriterBase(object):
         ----------
         config : dict
             Central config object
+        batch_writer : BatchFileWriter
+            When provided the files are collected by the batch writer and only written on
+            its flush
         """
         self.file_handler = FileHandler()
         self.config = config
+        self.batch_writer = batch_writer
 
     def write_content(self, path, filename, content=''):
         """
-        Write the content to a file
+        Write the content to a file. When generating incrementally the file is only
+        written if its content changed since the previous run.
 
         Parameters
         ----------
@@ -34,7 +43,17 @@ class FileWriterBase(object):
         content : str
             Content of the file
         """
-        self.file_handler.write_text_file(path, filename, content)
+        manifest = self.get_config_entry(ConfigConstants.CONFIG_KEY_ARTIFACT_MANIFEST)
+        if manifest:
+            file_location = os.path.join(path, filename)
+            digest = manifest.digest(content)
+            if manifest.is_current(file_location, digest):
+                self._get_profiler().increment(self._get_profiler().COUNTER_FILES_SKIPPED)
+                return
+            self._write_text_file(path, filename, content)
+            manifest.update(file_location, digest)
+        else:
+            self._write_text_file(path, filename, content)
     
     def write_template(self, path, filename, template_file, replacements={}):
         """
@@ -52,11 +71,71 @@ class FileWriterBase(object):
         replacements : dict
             Replacements for the template placeholders
         """
-        template_file = open(template_file, 'r')
-        file_content = template_file.read()
-        if replacements:
-            file_content = StringUtils.multi_replace(file_content, replacements)
-        self.write_content(path, filename, file_content)
+        manifest = self.get_config_entry(ConfigConstants.CONFIG_KEY_ARTIFACT_MANIFEST)
+        if manifest:
+            # The digest of the inputs allows to skip rendering for unchanged files
+            file_location = os.path.join(path, filename)
+            digest = manifest.digest(template_file, TemplateRegistry.get(template_file).mtime,
+                                     replacements)
+            if manifest.is_current(file_location, digest):
+                self._get_profiler().increment(self._get_profiler().COUNTER_FILES_SKIPPED)
+                return
+            self._render_template(path, filename, template_file, replacements)
+            manifest.update(file_location, digest)
+        else:
+            self._render_template(path, filename, template_file, replacements)
+
+    def _render_template(self, path, filename, template_file, replacements):
+        """
+        Render the compiled template and write the result to a file.
+
+        Parameters
+        ----------
+        path : str
+            Physical location
+        filename : str
+            Filename to write
+        template_file : str
+            Location of the template file
+        replacements : dict
+            Replacements for the template placeholders
+        """
+        with self._get_profiler().span('render'):
+            file_content = TemplateRegistry.get(template_file).render(replacements)
+        self._write_text_file(path, filename, file_content)
+
+    def _write_text_file(self, path, filename, content):
+        """
+        Write the file directly or hand it over to the batch writer.
+
+        Parameters
+        ----------
+        path : str
+            Physical location
+        filename : str
+            Filename to write
+        content : str
+            Content of the file
+        """
+        if self.batch_writer is not None:
+            self.batch_writer.add(path, filename, content)
+        else:
+            profiler = self._get_profiler()
+            with profiler.span('file_io', files=1):
+                self.get_config_entry(ConfigConstants.CONFIG_KEY_OUTPUT_BACKEND).write_text_file(
+                    path, filename, content)
+            profiler.increment(profiler.COUNTER_FILES_WRITTEN)
+
+    def _get_profiler(self):
+        """
+        Get the profiler recording the generation.
+
+        Returns
+        -------
+        profiler : Profiler
+            The profiler
+        """
+        return self.get_config_entry(ConfigConstants.CONFIG_KEY_PROFILER)
 
     def add_config_entry(self, key, value):
         """
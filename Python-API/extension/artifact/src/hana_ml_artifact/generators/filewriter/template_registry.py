@@ -0,0 +1,104 @@
+"""
+This module provides a process wide registry of compiled file templates. Each template is
+loaded once and split on its placeholders so rendering only needs to join the parts.
+"""
+import os
+import re
+import threading
+
+from ...hana_ml_utils import StringUtils
+
+
+class CompiledTemplate(object):
+    """
+    A template split on its <<PLACEHOLDER>> markers.
+    """
+    MARKER_PATTERN = re.compile(r'(<<[A-Z0-9_]+>>)')
+
+    def __init__(self, content, mtime=None):
+        """
+        Compile the template content.
+
+        Parameters
+        ----------
+        content : str
+            The template content
+        mtime : float
+            Modification time of the template file the content was loaded from
+        """
+        self.content = content
+        self.mtime = mtime
+        # Odd indices hold the markers, even indices the literal text in between
+        self.parts = self.MARKER_PATTERN.split(content)
+
+    def render(self, replacements=None):
+        """
+        Render the template by replacing the placeholders.
+
+        Parameters
+        ----------
+        replacements : dict
+            Replacements for the template placeholders
+
+        Returns
+        -------
+        content : str
+            The rendered content
+        """
+        if not replacements:
+            return self.content
+        if not all(self.MARKER_PATTERN.fullmatch(key) for key in replacements):
+            # Keys other than plain markers need the generic replacement
+            return StringUtils.multi_replace(self.content, replacements)
+        parts = list(self.parts)
+        for idx in range(1, len(parts), 2):
+            value = replacements.get(parts[idx], parts[idx])
+            # Like the generic replacement a None value renders as an empty string
+            parts[idx] = '' if value is None else value
+        return ''.join(parts)
+
+
+class TemplateRegistry(object):
+    """
+    Process wide registry of compiled templates. A template is reloaded when the
+    modification time of its file changes, so edited templates are picked up during
+    development.
+    """
+    CHECK_MODIFIED = True
+    _templates = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, template_file):
+        """
+        Get the compiled template of a template file.
+
+        Parameters
+        ----------
+        template_file : str
+            Location of the template file
+
+        Returns
+        -------
+        template : CompiledTemplate
+            The compiled template
+        """
+        template = cls._templates.get(template_file)
+        if template is not None and not cls.CHECK_MODIFIED:
+            return template
+        mtime = os.path.getmtime(template_file)
+        if template is not None and template.mtime == mtime:
+            return template
+        with open(template_file, 'r') as file:
+            template = CompiledTemplate(file.read(), mtime)
+        with cls._lock:
+            cls._templates[template_file] = template
+        return template
+
+    @classmethod
+    def clear(cls):
+        """
+        Remove all compiled templates from the registry.
+        """
+        with cls._lock:
+            cls._templates.clear()
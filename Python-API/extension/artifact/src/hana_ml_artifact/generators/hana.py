@@ -13,6 +13,7 @@ from .filewriter.hana import HDBVirtualTableWriter
 from .filewriter.hana import HDBCDSWriter
 
 from ..config import ConfigConstants
+from ..hana_ml_utils import BatchFileWriter
 from ..hana_ml_utils import DirectoryHandler
 from ..hana_ml_utils import StringUtils
 
@@ -88,6 +89,7 @@ class HanaGenerator(object):
         # Generate Consumption Artifacts
         consumption_processor.generate( base_layer, consumption_layer, sda_data_source_mapping_only)
 
+        self.hana_helper._finalize_artifacts(output_path)
         return output_path
 
     def _extend_config(self):
@@ -153,7 +155,8 @@ class HanaConsumptionProcessor(object):
             In case data source mapping is provided you can forrce to only do this for the
             sda hdi container
         """
-        procedure_writer = HDBProcedureWriter(self.config)
+        batch_writer = BatchFileWriter(file_handler=self.config.get_entry(ConfigConstants.CONFIG_KEY_OUTPUT_BACKEND), profiler=self.config.get_entry(ConfigConstants.CONFIG_KEY_PROFILER))
+        procedure_writer = HDBProcedureWriter(self.config, batch_writer)
         cds_writer = HDBCDSWriter(self.config)
         sql_key_sql = SqlProcessor.TRACE_KEY_SQL_PROCESSED
         if base_layer:
@@ -206,6 +209,7 @@ class HanaConsumptionProcessor(object):
                     if not sda_data_source_mapping_only:
                         sql_str = self.config.data_source_mapping(sql_str)
                     procedure_writer.generate(self.config.get_entry(ConfigConstants.CONFIG_KEY_PROCEDURES_PATH), proc_name, sql_str, signature_str)
+            batch_writer.flush()
 
         # --CDS Generation
         # We always create CDS views as these are common components that can be used by solution specific implementation of the consumption layer
@@ -296,6 +300,8 @@ class HanaSDAGenerator(object):
 
         # Generate Consumption Artifacts
         consumption_processor.generate(model_only)
+
+        self.hana_helper._finalize_artifacts(output_path)
         return output_path
 
 
@@ -363,7 +369,8 @@ class HanaSDAConsumptionProcessor(object):
             This forces the HANA artifact generation to cater only for this scenario.
         """
         cds_writer = HDBCDSWriter(self.config)
-        procedure_writer = HDBProcedureWriter(self.config)
+        batch_writer = BatchFileWriter(file_handler=self.config.get_entry(ConfigConstants.CONFIG_KEY_OUTPUT_BACKEND), profiler=self.config.get_entry(ConfigConstants.CONFIG_KEY_PROFILER))
+        procedure_writer = HDBProcedureWriter(self.config, batch_writer)
         sql_key_sql = SqlProcessor.TRACE_KEY_SQL_PROCESSED
         procedure_gen_filter = None
         if model_only:
@@ -441,6 +448,7 @@ class HanaSDAConsumptionProcessor(object):
                 sql_str = StringUtils.flatten_string_array(sql)
                 sql_str = self.config.data_source_mapping(sql_str)
                 procedure_writer.generate(self.config.get_entry(ConfigConstants.CONFIG_KEY_SDA_PROCEDURES_PATH), proc_name, sql_str, signature_str)
+        batch_writer.flush()
                     
         cds_sda_content = StringUtils.flatten_string_array(cds_sda_entries)
         cds_writer.generate(self.config.get_entry(ConfigConstants.CONFIG_KEY_SDA_CDS_PATH), self.config.get_entry(ConfigConstants.CONFIG_KEY_CDS_CONTEXT), cds_sda_content)
@@ -589,7 +597,8 @@ class HanaGeneratorHelper(object):
         sql : str
             The sql that needs to be written as part of the procedure file
         """
-        procedure_writer = HDBProcedureWriter(self.config)
+        batch_writer = BatchFileWriter(file_handler=self.config.get_entry(ConfigConstants.CONFIG_KEY_OUTPUT_BACKEND), profiler=self.config.get_entry(ConfigConstants.CONFIG_KEY_PROFILER))
+        procedure_writer = HDBProcedureWriter(self.config, batch_writer)
         sql_key_input = SqlProcessor.TRACE_KEY_TABLES_INPUT_PROCESSED
         sql_key_tables_output = SqlProcessor.TRACE_KEY_TABLES_OUTPUT_PROCESSED
         sql_key_vars_output = SqlProcessor.TRACE_KEY_VARS_OUTPUT_PROCESSED
@@ -609,7 +618,8 @@ class HanaGeneratorHelper(object):
                     if sql_key_input in sql_processed_base_layer[algo][function]:
                         input = sql_processed_base_layer[algo][function][sql_key_input]
                     if sql_key_tables_output in sql_processed_base_layer[algo][function]:
-                        output = sql_processed_base_layer[algo][function][sql_key_tables_output]
+                        # Copy as the output vars are added below and the processed element is reused across generation runs
+                        output = list(sql_processed_base_layer[algo][function][sql_key_tables_output])
                     if sql_key_vars_output in sql_processed_base_layer[algo][function]:
                         output.extend(sql_processed_base_layer[algo][function][sql_key_vars_output])
                     
@@ -618,6 +628,7 @@ class HanaGeneratorHelper(object):
                     if data_source_mapping:
                         sql_str = self.config.data_source_mapping(sql_str)
                     procedure_writer.generate(path, proc_name, sql_str, signature_str)
+        batch_writer.flush()
 
 
     def _build_cds_entity_entry(self, entity_name, cds_type, cds_type_extension=None):
@@ -665,12 +676,34 @@ class HanaGeneratorHelper(object):
             Physical location of where the module (HDI container) needs to be populated with the
             respective required artifacts. 
         """
-        self._clean_folder_structure(output_path)
-        
         # Parse and copy template base project structure
         module_template_path = self.config.get_entry(ConfigConstants.CONFIG_KEY_MODULE_TEMPLATE_PATH)
         base_structure_template_path = os.path.join(module_template_path, ConfigConstants.PROJECT_TEMPLATE_BASE_DIR, base_structure)
-        self.directory_handler.copy_directory(base_structure_template_path, module_output_path)
+        output_backend = self.config.get_entry(ConfigConstants.CONFIG_KEY_OUTPUT_BACKEND)
+        manifest_path = self.config.get_entry(ConfigConstants.CONFIG_KEY_OUTPUT_PATH)
+        with self.config.get_entry(ConfigConstants.CONFIG_KEY_PROFILER).span('folder_structure'):
+            if self.config.get_entry(ConfigConstants.CONFIG_KEY_ARTIFACT_MANIFEST):
+                # Incremental generation keeps the previous output and only updates what changed
+                output_backend.materialize_template(base_structure_template_path, module_output_path,
+                                                    manifest_path=manifest_path)
+                return
+            output_backend.materialize_template(base_structure_template_path, module_output_path,
+                                                clean_path=output_path, manifest_path=manifest_path)
+
+    def _finalize_artifacts(self, output_path):
+        """
+        When generating incrementally remove the files of elements which no longer exist
+        and store the manifest.
+
+        Parameters
+        ----------
+        output_path : str
+            Physical root target location of the generated artifacts
+        """
+        manifest = self.config.get_entry(ConfigConstants.CONFIG_KEY_ARTIFACT_MANIFEST)
+        if manifest:
+            manifest.remove_stale(output_path)
+            manifest.save()
 
     def _clean_folder_structure(self, path):
         """
@@ -681,9 +714,7 @@ class HanaGeneratorHelper(object):
         path : str
             Physical location to clean
         """
-        if os.path.exists(path):
-            self.directory_handler.delete_directory_content(path)
-            os.rmdir(path)
+        self.config.get_entry(ConfigConstants.CONFIG_KEY_OUTPUT_BACKEND).delete_directory(path)
 
     
     def _build_procedure_signature(self, input_tables, output_tables):
@@ -1,4 +1,14 @@
 from .prerequisites_check import PrerequisitesValidator
 from .string_parsing import StringUtils
+from .string_parsing import MultiReplacer
 from .fs_handler import FileHandler
-from .fs_handler import DirectoryHandler
\ No newline at end of file
+from .fs_handler import DirectoryHandler
+from .fs_handler import BatchFileWriter
+from .output_backend import OutputBackend
+from .output_backend import FileSystemBackend
+from .output_backend import MemoryBackend
+from .output_backend import ZipBackend
+from .manifest import ArtifactManifest
+from .package_version import PackageVersion
+from .template_materializer import TemplateMaterializer
+from .profiler import Profiler
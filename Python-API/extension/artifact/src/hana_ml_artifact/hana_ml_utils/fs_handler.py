@@ -1,9 +1,13 @@
 """
 This module provides file system helper functionality.
 """
+import collections
+import concurrent.futures
 import os
+import threading
 import zipfile
 import fileinput
+import filecmp
 import shutil
 
 class FileHandler(object):
@@ -16,7 +20,7 @@ class FileHandler(object):
         """
         self.folder_handler = DirectoryHandler()
 
-    def write_text_file(self, path, file_name, content):
+    def write_text_file(self, path, file_name, content, atomic=False):
         """
         Write content to a text file
 
@@ -28,14 +32,122 @@ class FileHandler(object):
             The file name
         content : str
             The content of the file
+        atomic : boolean
+            Write to a temporary file in the same folder first and rename it afterwards so
+            the file is never left half written
         """
         if self.folder_handler.validate_path(path):
             file_location = os.path.join(path, file_name)
+            if atomic:
+                # Unique per process and thread. Opened like the target to respect the umask
+                temp_location = os.path.join(path, '.{}.{}.{}.tmp'.format(
+                    file_name, os.getpid(), threading.get_ident()))
+                try:
+                    with open(temp_location, 'w') as file:
+                        file.write(str(content))
+                    os.replace(temp_location, file_location)
+                except BaseException:
+                    if os.path.exists(temp_location):
+                        os.unlink(temp_location)
+                    raise
+                return True
             file = open(file_location, 'w+')
             file.write(str(content))
             file.close()
             return True
         return False
+
+
+class BatchFileWriter(object):
+    """
+    This class collects text files and writes them in one go using a bounded pool of threads.
+    Each file is written atomically.
+    """
+    DEFAULT_MAX_WORKERS = 8
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, file_handler=None, profiler=None):
+        """
+        Collects text files and writes them in one go.
+
+        Parameters
+        ----------
+        max_workers : int
+            Maximum number of threads writing files
+        file_handler : object
+            The object writing the files, ie an output backend. Defaults to a FileHandler.
+            Files are written one after the other if it sets PARALLEL_WRITES to False.
+        profiler : Profiler
+            When provided each flush is recorded as file_io span and the written files
+            are counted
+        """
+        self.max_workers = max_workers
+        self.file_handler = file_handler or FileHandler()
+        self.profiler = profiler
+        self._pending = collections.OrderedDict()
+
+    def add(self, path, file_name, content):
+        """
+        Add a file to be written on flush. A file added twice is written with the content
+        added last.
+
+        Parameters
+        ----------
+        path : str
+            Path of where the file needs to be written
+        file_name : str
+            The file name
+        content : str
+            The content of the file
+        """
+        self._pending[os.path.join(path, file_name)] = (path, file_name, content)
+
+    def flush(self):
+        """
+        Write all collected files. All files are attempted before the first error is raised.
+
+        Returns
+        -------
+        count : int
+            The number of files written
+        """
+        pending = list(self._pending.values())
+        self._pending.clear()
+        if not pending:
+            return 0
+        if self.profiler is None:
+            return self._write_pending(pending)
+        with self.profiler.span('file_io', files=len(pending)):
+            count = self._write_pending(pending)
+        self.profiler.increment(self.profiler.COUNTER_FILES_WRITTEN, count)
+        return count
+
+    def _write_pending(self, pending):
+        """
+        Write the collected files.
+
+        Parameters
+        ----------
+        pending : list
+            Tuples of path, file name and content
+
+        Returns
+        -------
+        count : int
+            The number of files written
+        """
+        if len(pending) == 1 or self.max_workers <= 1 or \
+                not getattr(self.file_handler, 'PARALLEL_WRITES', True):
+            for path, file_name, content in pending:
+                self.file_handler.write_text_file(path, file_name, content, atomic=True)
+            return len(pending)
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(self.max_workers, len(pending))) as executor:
+            futures = [executor.submit(self.file_handler.write_text_file, path, file_name,
+                                       content, True)
+                       for path, file_name, content in pending]
+        for future in futures:
+            future.result()
+        return len(pending)
        
 
 class DirectoryHandler(object):
@@ -55,6 +167,29 @@ class DirectoryHandler(object):
         """
         shutil.copytree(from_path, to_path)
 
+    def sync_directory(self, from_path, to_path):
+        """
+        Copy the files of a directory recursively which are missing or differ in the
+        target location. Other files in the target location are left untouched.
+
+        Parameters
+        ----------
+        from_path : str
+            Source location
+        to_path : str
+            Target location
+        """
+        for root, dirs, files in os.walk(from_path):
+            target_root = os.path.join(to_path, os.path.relpath(root, from_path))
+            if not os.path.exists(target_root):
+                os.makedirs(target_root)
+            for file in files:
+                source_file = os.path.join(root, file)
+                target_file = os.path.join(target_root, file)
+                if not os.path.isfile(target_file) or \
+                        not filecmp.cmp(source_file, target_file, shallow=False):
+                    shutil.copy2(source_file, target_file)
+
     def create_directory(self, path):
         """
         Create deep directory structure
@@ -0,0 +1,156 @@
+"""
+This module provides a content hash manifest of generated files. It allows to only re-render
+and rewrite the files of which the inputs changed since the previous generation run.
+"""
+import hashlib
+import json
+import os
+
+
+class ArtifactManifest(object):
+    """
+    This class keeps track of the digest of the inputs of each generated file. The manifest is
+    stored as json in the root of the output path.
+    """
+    FILE_NAME = '.artifact_manifest.json'
+    VERSION = 1
+    KEY_VERSION = 'version'
+    KEY_ENTRIES = 'entries'
+
+    def __init__(self, path):
+        """
+        Load the manifest of the output path if present.
+
+        Parameters
+        ----------
+        path : str
+            Root output path the manifest belongs to
+        """
+        self.path = path
+        self.file_location = os.path.join(path, self.FILE_NAME)
+        self.entries = {}
+        self._seen = set()
+        self.load()
+
+    @staticmethod
+    def digest(*inputs):
+        """
+        Build the digest of the inputs of a generated file.
+
+        Parameters
+        ----------
+        inputs : object
+            Json serializable inputs from which the file content is rendered
+
+        Returns
+        -------
+        digest : str
+            Hex digest of the inputs
+        """
+        data = json.dumps(inputs, sort_keys=True, default=str)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def load(self):
+        """
+        Load the manifest from the output path. A missing or outdated manifest results in an
+        empty manifest which regenerates all files.
+        """
+        self.entries = {}
+        if os.path.isfile(self.file_location):
+            try:
+                with open(self.file_location, 'r') as manifest_file:
+                    data = json.load(manifest_file)
+            except ValueError:
+                return
+            if data.get(self.KEY_VERSION) == self.VERSION:
+                self.entries = data.get(self.KEY_ENTRIES, {})
+
+    def save(self):
+        """
+        Store the manifest in the output path. The manifest is written to a temporary file
+        first so an interrupted run does not leave a corrupt manifest behind.
+        """
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        temp_location = self.file_location + '.tmp'
+        with open(temp_location, 'w') as manifest_file:
+            json.dump({self.KEY_VERSION: self.VERSION, self.KEY_ENTRIES: self.entries},
+                      manifest_file, indent=1, sort_keys=True)
+        os.replace(temp_location, self.file_location)
+
+    def is_current(self, file_location, digest):
+        """
+        Check whether the file was generated from the same inputs and is still present.
+
+        Parameters
+        ----------
+        file_location : str
+            Location of the generated file
+        digest : str
+            Digest of the current inputs of the file
+
+        Returns
+        -------
+        current : boolean
+            Whether the file can be kept as is
+        """
+        key = self._get_key(file_location)
+        self._seen.add(key)
+        return self.entries.get(key) == digest and os.path.isfile(file_location)
+
+    def update(self, file_location, digest):
+        """
+        Record the digest of the inputs of a (re)generated file.
+
+        Parameters
+        ----------
+        file_location : str
+            Location of the generated file
+        digest : str
+            Digest of the inputs of the file
+        """
+        key = self._get_key(file_location)
+        self._seen.add(key)
+        self.entries[key] = digest
+
+    def remove_stale(self, path):
+        """
+        Remove the files below the path which are in the manifest but have not been generated
+        since the previous call for this path. These belong to elements which no longer exist.
+
+        Parameters
+        ----------
+        path : str
+            Location below which stale files are removed
+
+        Returns
+        -------
+        removed : list
+            The keys of the removed files
+        """
+        prefix = self._get_key(path) + '/'
+        removed = [key for key in self.entries
+                   if key.startswith(prefix) and not key in self._seen]
+        for key in removed:
+            file_location = os.path.join(self.path, *key.split('/'))
+            if os.path.isfile(file_location):
+                os.unlink(file_location)
+            del self.entries[key]
+        self._seen = set(key for key in self._seen if not key.startswith(prefix))
+        return removed
+
+    def _get_key(self, file_location):
+        """
+        Build the manifest key of a location which is relative to the output path.
+
+        Parameters
+        ----------
+        file_location : str
+            Location of the generated file
+
+        Returns
+        -------
+        key : str
+            Relative location with forward slashes
+        """
+        return os.path.relpath(file_location, self.path).replace(os.sep, '/')
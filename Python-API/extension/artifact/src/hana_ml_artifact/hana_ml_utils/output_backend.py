@@ -0,0 +1,493 @@
+"""
+This module provides the backends the generated artifacts are written to. Next to the file
+system the artifacts can be kept in memory or written into a zip archive.
+"""
+import collections
+import os
+import threading
+import zipfile
+
+from .fs_handler import DirectoryHandler
+from .fs_handler import FileHandler
+from .template_materializer import TemplateMaterializer
+
+
+class OutputBackend(object):
+    """
+    This is the base class of the output backends. Locations are file system style paths
+    below the output dir of the generator.
+    """
+    # Whether files may be written concurrently without changing the result
+    PARALLEL_WRITES = False
+
+    def write_text_file(self, path, file_name, content, atomic=False):
+        """
+        Write content to a text file
+
+        Parameters
+        ----------
+        path : str
+            Path of where the file needs to be written
+        file_name : str
+            The file name
+        content : str
+            The content of the file
+        atomic : boolean
+            Whether the file must never be visible half written
+        """
+        raise NotImplementedError
+
+    def copy_directory(self, from_path, to_path, sync=False):
+        """
+        Copy a directory of the file system recursively into the output
+
+        Parameters
+        ----------
+        from_path : str
+            Source location on the file system
+        to_path : str
+            Target location
+        sync : boolean
+            Only copy files which are missing or differ and keep the other files
+        """
+        raise NotImplementedError
+
+    def materialize_template(self, from_path, to_path, clean_path=None, manifest_path=None):
+        """
+        Materialize a template directory of the file system into the output
+
+        Parameters
+        ----------
+        from_path : str
+            Source template location on the file system
+        to_path : str
+            Target location
+        clean_path : str
+            Location which is deleted before the template is copied. If not provided only
+            files which are missing or differ are copied and other files are kept.
+        manifest_path : str
+            Location of the template manifest for backends which materialize incrementally
+        """
+        if clean_path:
+            self.delete_directory(clean_path)
+            self.copy_directory(from_path, to_path)
+        else:
+            self.copy_directory(from_path, to_path, sync=True)
+
+    def create_directory(self, path):
+        """
+        Create a directory in the output
+
+        Parameters
+        ----------
+        path : str
+            Target location
+        """
+        raise NotImplementedError
+
+    def delete_directory(self, path):
+        """
+        Delete a directory including its content from the output if it exists
+
+        Parameters
+        ----------
+        path : str
+            Target location
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Finish writing. Nothing can be written afterwards.
+        """
+
+
+class FileSystemBackend(OutputBackend):
+    """
+    Writes the artifacts to the file system.
+    """
+    PARALLEL_WRITES = True
+
+    def __init__(self, template_link_mode=None):
+        """
+        Writes the artifacts to the file system.
+
+        Parameters
+        ----------
+        template_link_mode : str
+            How static template files are materialized: copy, reflink or hardlink. The
+            template files are then only rewritten if they changed instead of deleting and
+            copying the template structure on every generation. Hard linked files share
+            their content with the installed package and must not be edited in place.
+            Defaults to copying the complete template structure.
+        """
+        if template_link_mode is not None and \
+                template_link_mode not in TemplateMaterializer.MODES:
+            raise ValueError('Unknown template link mode {}. Supported are: {}'.format(
+                template_link_mode, ', '.join(TemplateMaterializer.MODES)))
+        self.template_link_mode = template_link_mode
+        self.file_handler = FileHandler()
+        self.directory_handler = DirectoryHandler()
+
+    def write_text_file(self, path, file_name, content, atomic=False):
+        """
+        Write content to a text file
+
+        Parameters
+        ----------
+        path : str
+            Path of where the file needs to be written
+        file_name : str
+            The file name
+        content : str
+            The content of the file
+        atomic : boolean
+            Write to a temporary file first and rename it afterwards
+        """
+        return self.file_handler.write_text_file(path, file_name, content, atomic)
+
+    def copy_directory(self, from_path, to_path, sync=False):
+        """
+        Copy a directory recursively
+
+        Parameters
+        ----------
+        from_path : str
+            Source location
+        to_path : str
+            Target location
+        sync : boolean
+            Only copy files which are missing or differ and keep the other files
+        """
+        if sync:
+            self.directory_handler.sync_directory(from_path, to_path)
+        else:
+            self.directory_handler.copy_directory(from_path, to_path)
+
+    def materialize_template(self, from_path, to_path, clean_path=None, manifest_path=None):
+        """
+        Materialize a template directory. With a template link mode the files are linked
+        and only rewritten if they changed.
+
+        Parameters
+        ----------
+        from_path : str
+            Source template location
+        to_path : str
+            Target location
+        clean_path : str
+            Location which is cleaned before. If not provided only files which are missing
+            or differ are copied and other files are kept.
+        manifest_path : str
+            Location of the template manifest
+        """
+        if self.template_link_mode is None or manifest_path is None:
+            super(FileSystemBackend, self).materialize_template(from_path, to_path,
+                                                                clean_path, manifest_path)
+            return
+        TemplateMaterializer(manifest_path, self.template_link_mode).materialize(
+            from_path, to_path, clean_path)
+
+    def create_directory(self, path):
+        """
+        Create deep directory structure
+
+        Parameters
+        ----------
+        path : str
+            Target location
+        """
+        if not os.path.exists(path):
+            self.directory_handler.create_directory(path)
+
+    def delete_directory(self, path):
+        """
+        Delete a directory including its content if it exists
+
+        Parameters
+        ----------
+        path : str
+            Target location
+        """
+        if os.path.exists(path):
+            self.directory_handler.delete_directory_content(path)
+            os.rmdir(path)
+
+
+class MemoryBackend(OutputBackend):
+    """
+    Keeps the artifacts in memory as a virtual file tree.
+    """
+    def __init__(self):
+        """
+        Keeps the artifacts in memory as a virtual file tree.
+        """
+        self.files = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def write_text_file(self, path, file_name, content, atomic=False):
+        """
+        Store content as a text file
+
+        Parameters
+        ----------
+        path : str
+            Path of where the file needs to be written
+        file_name : str
+            The file name
+        content : str
+            The content of the file
+        atomic : boolean
+            Writes are always atomic in memory
+        """
+        with self._lock:
+            self.files[self._normalize(os.path.join(path, file_name))] = str(content)
+        return True
+
+    def copy_directory(self, from_path, to_path, sync=False):
+        """
+        Copy a directory of the file system recursively into memory
+
+        Parameters
+        ----------
+        from_path : str
+            Source location on the file system
+        to_path : str
+            Target location
+        sync : boolean
+            Existing files are replaced either way
+        """
+        for root, dirs, files in _walk_sorted(from_path):
+            for file in files:
+                with open(os.path.join(root, file), 'r') as source_file:
+                    content = source_file.read()
+                target = os.path.join(to_path, os.path.relpath(root, from_path), file)
+                with self._lock:
+                    self.files[self._normalize(target)] = content
+
+    def create_directory(self, path):
+        """
+        Directories are implicit in memory
+
+        Parameters
+        ----------
+        path : str
+            Target location
+        """
+
+    def delete_directory(self, path):
+        """
+        Delete all files below a location
+
+        Parameters
+        ----------
+        path : str
+            Target location
+        """
+        prefix = self._normalize(path) + '/'
+        with self._lock:
+            for location in [loc for loc in self.files if loc.startswith(prefix)]:
+                del self.files[location]
+
+    def get_file(self, location):
+        """
+        Get the content of a file
+
+        Parameters
+        ----------
+        location : str
+            Location of the file
+
+        Returns
+        -------
+        content : str
+            The content of the file
+        """
+        return self.files[self._normalize(location)]
+
+    def write_zip(self, zip_location, root):
+        """
+        Write the files below a root location to a zip archive
+
+        Parameters
+        ----------
+        zip_location : str
+            Location of the zip archive
+        root : str
+            Root location. Archive entries are relative to it.
+        """
+        prefix = self._normalize(root) + '/'
+        with zipfile.ZipFile(zip_location, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            for location, content in self.files.items():
+                if location.startswith(prefix):
+                    zip_file.writestr(location[len(prefix):], content)
+
+    @staticmethod
+    def _normalize(location):
+        """
+        Normalize a location to be used as key of the virtual file tree
+
+        Parameters
+        ----------
+        location : str
+            Location
+
+        Returns
+        -------
+        location : str
+            Normalized location with forward slashes
+        """
+        return os.path.normpath(location).replace(os.sep, '/')
+
+
+class ZipBackend(OutputBackend):
+    """
+    Writes the artifacts into a zip archive. As entries cannot be replaced or removed from a
+    zip archive they are collected and the archive is written when the backend is closed. A
+    file written more than once keeps its last content as on the file system. Files copied
+    from the file system are only read when the archive is written.
+    """
+    def __init__(self, zip_location, root=None):
+        """
+        Writes the artifacts into a zip archive.
+
+        Parameters
+        ----------
+        zip_location : str
+            Location of the zip archive
+        root : str
+            Root location. Archive entries are relative to it, ie the hana output path
+            for an archive which can be imported into WebIDE. Defaults to the project
+            output path of the generator.
+        """
+        self.zip_location = zip_location
+        self.root = root
+        # Entry name to a tuple of the text content or the source file location
+        self._entries = collections.OrderedDict()
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def write_text_file(self, path, file_name, content, atomic=False):
+        """
+        Add content as a text file to the archive
+
+        Parameters
+        ----------
+        path : str
+            Path of where the file needs to be written
+        file_name : str
+            The file name
+        content : str
+            The content of the file
+        atomic : boolean
+            The archive is only complete once closed
+        """
+        self._add_entry(os.path.join(path, file_name), str(content), None)
+        return True
+
+    def copy_directory(self, from_path, to_path, sync=False):
+        """
+        Add a directory of the file system recursively to the archive
+
+        Parameters
+        ----------
+        from_path : str
+            Source location on the file system
+        to_path : str
+            Target location
+        sync : boolean
+            Existing entries are replaced either way
+        """
+        for root, dirs, files in _walk_sorted(from_path):
+            for file in files:
+                target = os.path.join(to_path, os.path.relpath(root, from_path), file)
+                self._add_entry(target, None, os.path.join(root, file))
+
+    def create_directory(self, path):
+        """
+        Directories are implicit in the archive
+
+        Parameters
+        ----------
+        path : str
+            Target location
+        """
+
+    def delete_directory(self, path):
+        """
+        Remove the entries below a location from the archive
+
+        Parameters
+        ----------
+        path : str
+            Target location
+        """
+        if self.root is None:
+            return
+        prefix = os.path.relpath(path, self.root).replace(os.sep, '/') + '/'
+        if prefix == './':
+            prefix = ''
+        with self._lock:
+            for entry in [entry for entry in self._entries if entry.startswith(prefix)]:
+                del self._entries[entry]
+
+    def close(self):
+        """
+        Write the archive.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            with zipfile.ZipFile(self.zip_location, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+                for entry, (content, source) in self._entries.items():
+                    if source is None:
+                        zip_file.writestr(entry, content)
+                    else:
+                        zip_file.write(source, entry)
+            self._entries.clear()
+            self._closed = True
+
+    def _add_entry(self, location, content, source):
+        """
+        Add or replace an archive entry.
+
+        Parameters
+        ----------
+        location : str
+            Location of the file
+        content : str
+            Text content of the entry
+        source : str
+            Location of the file system file of the entry if no content is provided
+        """
+        if self.root is None:
+            raise ValueError('No root location set for zip archive {}'.format(
+                self.zip_location))
+        entry = os.path.relpath(location, self.root).replace(os.sep, '/')
+        if entry == '..' or entry.startswith('../') or entry == '.':
+            raise ValueError('{} is outside of the root {} of zip archive {}'.format(
+                location, self.root, self.zip_location))
+        with self._lock:
+            if self._closed:
+                raise ValueError('Zip archive {} has already been closed'.format(
+                    self.zip_location))
+            self._entries[entry] = (content, source)
+
+
+def _walk_sorted(path):
+    """
+    Walk a directory in a stable order.
+
+    Parameters
+    ----------
+    path : str
+        Location to walk
+
+    Returns
+    -------
+    walk : generator
+        Tuples of root, directories and files as os.walk
+    """
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        yield root, dirs, sorted(files)
@@ -0,0 +1,70 @@
+"""
+This module provides helper functionality for resolving the version of installed packages
+without importing them up front.
+"""
+import importlib
+
+from functools import lru_cache
+
+
+class PackageVersion(object):
+    """
+    This class resolves package versions lazily. A version is only resolved when it is first
+    requested and is cached afterwards. The package metadata is used where available so the
+    package itself does not need to be imported.
+    """
+    HANA_ML = 'hana_ml'
+
+    @staticmethod
+    def get_version(package_name):
+        """
+        Get the version of an installed package
+
+        Parameters
+        ----------
+        package_name : str
+            Name of the package
+
+        Returns
+        -------
+        version : str
+            The version or None if the package is not installed
+        """
+        return _resolve_version(package_name)
+
+    @staticmethod
+    def cache_clear():
+        """
+        Clear the resolved versions, ie after installing another version of a package
+        """
+        _resolve_version.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def _resolve_version(package_name):
+    """
+    Resolve the version of an installed package first from its metadata and otherwise by
+    importing it.
+
+    Parameters
+    ----------
+    package_name : str
+        Name of the package
+
+    Returns
+    -------
+    version : str
+        The version or None if the package is not installed
+    """
+    try:
+        from importlib import metadata
+        return metadata.version(package_name)
+    except Exception:  # pylint: disable=broad-except
+        # Metadata is not available in older python versions or for packages which are not
+        # installed as a distribution
+        pass
+    try:
+        module = importlib.import_module(package_name)
+    except ImportError:
+        return None
+    return getattr(module, '__version__', None)
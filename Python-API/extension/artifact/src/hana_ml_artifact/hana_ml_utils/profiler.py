@@ -0,0 +1,286 @@
+"""
+This module provides timing instrumentation for the generation pipeline. Stages are recorded
+as nestable spans with wall and cpu time and counters keep track of the amount of processed
+elements. The result can be exported to json or to the Chrome trace event format which can be
+loaded in chrome://tracing or Perfetto.
+"""
+import collections
+import json
+import os
+import threading
+import time
+
+# CPU time of the current thread where available as spans of parallel workers would otherwise
+# include the cpu time of each other
+_cpu_time = getattr(time, 'thread_time', time.process_time)  # pylint: disable=invalid-name
+
+
+class _NullSpan(object):
+    """
+    Span of a disabled profiler which does not record anything.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span(object):
+    """
+    Context manager recording a single span.
+    """
+    def __init__(self, profiler, name, args):
+        self._profiler = profiler
+        self._name = name
+        self._args = args
+        self._record = None
+
+    def __enter__(self):
+        self._record = self._profiler._start(self._name, self._args)  # pylint: disable=protected-access
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._profiler._stop(self._record, exc_type)  # pylint: disable=protected-access
+        return False
+
+
+class Profiler(object):
+    """
+    This class records the timing of the generation stages. A disabled profiler hands out a
+    shared no-op span so instrumented code does not need to check whether profiling is
+    active.
+
+    Spans are nested per thread. Spans of process pool workers are not recorded as the
+    profiler is copied into the worker processes.
+    """
+    CHROME_TRACE_CATEGORY = 'hana_ml_artifact'
+
+    # Counter names used across the pipeline
+    COUNTER_STATEMENTS = 'statements'
+    COUNTER_TABLES = 'tables'
+    COUNTER_SYNONYMS = 'synonyms'
+    COUNTER_FILES_WRITTEN = 'files_written'
+    COUNTER_FILES_SKIPPED = 'files_skipped'
+
+    def __init__(self, enabled=True):
+        """
+        This class records the timing of the generation stages.
+
+        Parameters
+        ----------
+        enabled : boolean
+            Whether spans and counters are recorded
+        """
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        """
+        Remove all recorded spans and counters.
+        """
+        with self._lock:
+            self.spans = []
+            self.counters = collections.OrderedDict()
+            self._origin = time.perf_counter()
+
+    def span(self, name, **args):
+        """
+        Record the execution of a block as a span.
+
+        Parameters
+        ----------
+        name : str
+            Name of the stage
+        args : object
+            Json serializable attributes of the span, ie the algo and function
+
+        Returns
+        -------
+        span : object
+            Context manager recording the span
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def increment(self, name, value=1):
+        """
+        Increment a counter.
+
+        Parameters
+        ----------
+        name : str
+            Name of the counter
+        value : int
+            Value to add
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def get_summary(self):
+        """
+        Aggregate the spans by name.
+
+        Returns
+        -------
+        summary : dict
+            Number of calls, total wall and cpu time in seconds by span name in order of
+            first occurrence
+        """
+        summary = collections.OrderedDict()
+        for record in self._get_completed_spans():
+            entry = summary.setdefault(record['name'], {'count': 0, 'wall': 0.0, 'cpu': 0.0})
+            entry['count'] += 1
+            entry['wall'] += record['wall']
+            entry['cpu'] += record['cpu']
+        return summary
+
+    def to_dict(self):
+        """
+        Build a json serializable representation of the recorded data.
+
+        Returns
+        -------
+        data : dict
+            Spans, counters and the summary by span name. Times are in seconds relative to
+            the creation or last reset of the profiler.
+        """
+        return {
+            'spans': [dict(record) for record in self._get_completed_spans()],
+            'counters': dict(self.counters),
+            'summary': self.get_summary()
+        }
+
+    def export_json(self, file_location):
+        """
+        Write the recorded data as json.
+
+        Parameters
+        ----------
+        file_location : str
+            Location of the json file
+        """
+        with open(file_location, 'w') as json_file:
+            json.dump(self.to_dict(), json_file, indent=1)
+
+    def export_chrome_trace(self, file_location):
+        """
+        Write the recorded data in the Chrome trace event format.
+
+        Parameters
+        ----------
+        file_location : str
+            Location of the trace file
+        """
+        pid = os.getpid()
+        events = []
+        end = 0.0
+        for record in self._get_completed_spans():
+            args = dict(record['args'])
+            args['cpu_ms'] = record['cpu'] * 1000
+            events.append({
+                'name': record['name'],
+                'cat': self.CHROME_TRACE_CATEGORY,
+                'ph': 'X',
+                'ts': record['start'] * 1e6,
+                'dur': record['wall'] * 1e6,
+                'pid': pid,
+                'tid': record['thread'],
+                'args': args
+            })
+            end = max(end, record['start'] + record['wall'])
+        for name, value in self.counters.items():
+            events.append({'name': name, 'cat': self.CHROME_TRACE_CATEGORY, 'ph': 'C',
+                           'ts': end * 1e6, 'pid': pid, 'args': {name: value}})
+        with open(file_location, 'w') as trace_file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, trace_file)
+
+    def _get_completed_spans(self):
+        """
+        Get the spans which have been completed.
+
+        Returns
+        -------
+        spans : list
+            The completed span records
+        """
+        with self._lock:
+            return [record for record in self.spans if 'wall' in record]
+
+    def _start(self, name, args):
+        """
+        Start a span on the stack of the current thread.
+
+        Parameters
+        ----------
+        name : str
+            Name of the stage
+        args : dict
+            Attributes of the span
+
+        Returns
+        -------
+        record : dict
+            The span record which is completed on stop
+        """
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        record = {
+            'name': name,
+            'parent': stack[-1]['id'] if stack else None,
+            'depth': len(stack),
+            'thread': threading.current_thread().ident,
+            'args': args,
+            '_wall_start': time.perf_counter(),
+            '_cpu_start': _cpu_time()
+        }
+        with self._lock:
+            record['id'] = len(self.spans)
+            self.spans.append(record)
+        stack.append(record)
+        return record
+
+    def _stop(self, record, exc_type=None):
+        """
+        Complete a span and remove it from the stack of the current thread.
+
+        Parameters
+        ----------
+        record : dict
+            The span record
+        exc_type : type
+            Type of the exception which ended the span if any
+        """
+        wall = time.perf_counter() - record['_wall_start']
+        cpu = _cpu_time() - record['_cpu_start']
+        with self._lock:
+            record['start'] = record.pop('_wall_start') - self._origin
+            record['cpu'] = cpu
+            del record['_cpu_start']
+            if exc_type is not None:
+                record['error'] = exc_type.__name__
+            # Set last as it marks the span as completed
+            record['wall'] = wall
+        stack = self._local.stack
+        if stack and stack[-1] is record:
+            stack.pop()
+        elif record in stack:
+            stack.remove(record)
+
+    def __getstate__(self):
+        """
+        Profilers are copied into process pool workers disabled and without the recorded data.
+        """
+        return {'enabled': False}
+
+    def __setstate__(self, state):
+        self.__init__(state['enabled'])
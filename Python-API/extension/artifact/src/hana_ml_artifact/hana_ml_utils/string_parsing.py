@@ -5,6 +5,8 @@ import logging
 import pickle
 import re
 
+from functools import lru_cache
+
 logger = logging.getLogger(__name__) #pylint: disable=invalid-name
 
 class StringUtils(object):
@@ -66,7 +68,8 @@ class StringUtils(object):
     @staticmethod
     def multi_replace(string, replacements, ignore_case=False):
         """
-        Replace multiple entries in a string at once
+        Replace multiple entries in a string at once. The compiled pattern of the replacement
+        keys is cached so repeated calls with the same keys do not recompile it.
 
         Parameters
         ----------
@@ -82,12 +85,7 @@ class StringUtils(object):
         altered_string : str
             The altered string based on the replacements
         """
-        if ignore_case:
-            replacements = dict((pair[0].lower(), pair[1]) for pair in sorted(replacements.iteritems()))
-        rep_sorted = sorted(replacements, key=lambda s: (len(s), s), reverse=True)
-        rep_escaped = [re.escape(replacement) for replacement in rep_sorted]
-        pattern = re.compile("|".join(rep_escaped), re.I if ignore_case else 0)
-        return pattern.sub(lambda match: replacements[match.group(0)], string)
+        return MultiReplacer(replacements, ignore_case).replace(string)
 
     @staticmethod
     def count_words(input_string, word):
@@ -145,3 +143,92 @@ class StringUtils(object):
             The cleansed string
         """
         return ''.join(e for e in input_string if e.isalnum())
+
+
+class MultiReplacer(object):
+    """
+    This class replaces multiple entries in a string at once. The regular expression matching the
+    replacement keys is compiled once per distinct set of keys and kept in a least recently used
+    cache, so replacers for the same keys (ie template placeholders or synonyms) share it.
+    """
+    CACHE_SIZE = 256
+
+    def __init__(self, replacements, ignore_case=False):
+        """
+        Replacer for the provided replacements.
+
+        Parameters
+        ----------
+        replacements : dict
+            The replacements
+        ignore_case : boolean
+            Should we care about case in the keys of the replacement dictionary
+        """
+        if ignore_case:
+            replacements = dict((key.lower(), value) for key, value in replacements.items())
+        self.replacements = replacements
+        self.ignore_case = ignore_case
+        self.pattern = None
+        if replacements:
+            self.pattern = _compile_replacement_pattern(frozenset(replacements), ignore_case)
+
+    def replace(self, string):
+        """
+        Apply the replacements on the string
+
+        Parameters
+        ----------
+        string : str
+            The string to adjust
+
+        Returns
+        -------
+        altered_string : str
+            The altered string based on the replacements
+        """
+        if not self.pattern:
+            return string
+        if self.ignore_case:
+            return self.pattern.sub(lambda match: self.replacements[match.group(0).lower()], string)
+        return self.pattern.sub(lambda match: self.replacements[match.group(0)], string)
+
+    @staticmethod
+    def cache_info():
+        """
+        Statistics of the compiled pattern cache
+
+        Returns
+        -------
+        cache_info : namedtuple
+            hits, misses, maxsize and currsize of the cache
+        """
+        return _compile_replacement_pattern.cache_info()
+
+    @staticmethod
+    def cache_clear():
+        """
+        Clear the compiled pattern cache
+        """
+        _compile_replacement_pattern.cache_clear()
+
+
+@lru_cache(maxsize=MultiReplacer.CACHE_SIZE)
+def _compile_replacement_pattern(keys, ignore_case):
+    """
+    Compile the pattern matching any of the keys. Longer keys take precedence over shorter ones.
+
+    Parameters
+    ----------
+    keys : frozenset
+        The replacement keys
+    ignore_case : boolean
+        Should we care about case in the keys
+
+    Returns
+    -------
+    pattern : re.Pattern
+        The compiled pattern
+    """
+    rep_sorted = sorted(keys, key=lambda s: (len(s), s), reverse=True)
+    rep_escaped = [re.escape(replacement) for replacement in rep_sorted]
+    return re.compile("|".join(rep_escaped), re.I if ignore_case else 0)
@@ -0,0 +1,308 @@
+"""
+This module provides the materialization of static template files into the output. Instead
+of copying the template structure on every generation the files are linked and files which
+are already identical are skipped based on a file level digest manifest.
+"""
+import errno
+import hashlib
+import json
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class TemplateMaterializer(object):
+    """
+    This class materializes template directories into the output. The digest of each
+    materialized template file together with the size and modification time of the target
+    file is kept in a manifest, so unchanged files are neither hashed against the target nor
+    rewritten on subsequent runs.
+
+    Three modes are supported:
+
+    - copy: Copy the files.
+    - reflink: Clone the files copy-on-write where the file system supports it (ie btrfs,
+      xfs) and copy them otherwise.
+    - hardlink: Hard link the files where source and target are on the same file system and
+      copy them otherwise. The output files share their content with the template files of
+      the installed package, so they must never be modified in place.
+    """
+    FILE_NAME = '.template_manifest.json'
+    VERSION = 1
+    KEY_VERSION = 'version'
+    KEY_ENTRIES = 'entries'
+    KEY_DIGEST = 'digest'
+    KEY_SIZE = 'size'
+    KEY_MTIME = 'mtime'
+
+    MODE_COPY = 'copy'
+    MODE_REFLINK = 'reflink'
+    MODE_HARDLINK = 'hardlink'
+    MODES = [MODE_COPY, MODE_REFLINK, MODE_HARDLINK]
+
+    # Linux ioctl request to clone a file (FICLONE)
+    FICLONE = 0x40049409
+    # Digests of the template files by location, size and modification time
+    _digests = {}
+
+    def __init__(self, path, mode=MODE_REFLINK):
+        """
+        This class materializes template directories into the output.
+
+        Parameters
+        ----------
+        path : str
+            Location of the directory the manifest is stored in. Manifest keys are relative
+            to it.
+        mode : str
+            One of copy, reflink or hardlink
+        """
+        if mode not in self.MODES:
+            raise ValueError('Unknown template link mode {}. Supported are: {}'.format(
+                mode, ', '.join(self.MODES)))
+        self.path = path
+        self.mode = mode
+        self.file_location = os.path.join(path, self.FILE_NAME)
+        self.entries = {}
+
+    def materialize(self, from_path, to_path, clean_path=None):
+        """
+        Materialize the files of a template directory recursively.
+
+        Parameters
+        ----------
+        from_path : str
+            Source template location
+        to_path : str
+            Target location
+        clean_path : str
+            Location which is cleaned like a fresh copy would be. All files below it other
+            than the materialized template files are removed. If not provided other files are
+            kept.
+
+        Returns
+        -------
+        written : list
+            The target locations which were (re)materialized
+        """
+        self.load()
+        targets = {}
+        for root, dirs, files in os.walk(from_path):
+            target_root = os.path.join(to_path, os.path.relpath(root, from_path))
+            for file in files:
+                targets[os.path.normpath(os.path.join(target_root, file))] = \
+                    os.path.join(root, file)
+        if clean_path:
+            self._clean(clean_path, targets)
+        written = []
+        for target_file in sorted(targets):
+            source_file = targets[target_file]
+            digest = self.digest(source_file)
+            key = self._get_key(target_file)
+            if self._is_current(target_file, self.entries.get(key), digest):
+                continue
+            target_root = os.path.dirname(target_file)
+            if not os.path.isdir(target_root):
+                os.makedirs(target_root)
+            self._link(source_file, target_file)
+            target_stat = os.stat(target_file)
+            self.entries[key] = {self.KEY_DIGEST: digest,
+                                 self.KEY_SIZE: target_stat.st_size,
+                                 self.KEY_MTIME: target_stat.st_mtime_ns}
+            written.append(target_file)
+        prefix = self._get_key(to_path) + '/'
+        managed = set(self._get_key(target_file) for target_file in targets)
+        for key in [key for key in self.entries
+                    if key.startswith(prefix) and key not in managed]:
+            # The file has been removed from the template
+            file_location = os.path.join(self.path, *key.split('/'))
+            if os.path.isfile(file_location):
+                os.unlink(file_location)
+            del self.entries[key]
+        self.save()
+        return written
+
+    @classmethod
+    def digest(cls, file_location):
+        """
+        Build the digest of the content of a template file. Digests are cached for as long
+        as the size and modification time of the file do not change.
+
+        Parameters
+        ----------
+        file_location : str
+            Location of the template file
+
+        Returns
+        -------
+        digest : str
+            Hex digest of the file content
+        """
+        stat = os.stat(file_location)
+        cache_key = (file_location, stat.st_size, stat.st_mtime_ns)
+        digest = cls._digests.get(cache_key)
+        if digest is None:
+            with open(file_location, 'rb') as template_file:
+                digest = hashlib.sha256(template_file.read()).hexdigest()
+            cls._digests[cache_key] = digest
+        return digest
+
+    def load(self):
+        """
+        Load the manifest. A missing or outdated manifest results in an empty manifest which
+        materializes all files again.
+        """
+        self.entries = {}
+        if os.path.isfile(self.file_location):
+            try:
+                with open(self.file_location, 'r') as manifest_file:
+                    data = json.load(manifest_file)
+            except ValueError:
+                return
+            if data.get(self.KEY_VERSION) == self.VERSION:
+                self.entries = data.get(self.KEY_ENTRIES, {})
+
+    def save(self):
+        """
+        Store the manifest. The manifest is written to a temporary file first so an
+        interrupted run does not leave a corrupt manifest behind.
+        """
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        temp_location = self.file_location + '.tmp'
+        with open(temp_location, 'w') as manifest_file:
+            json.dump({self.KEY_VERSION: self.VERSION, self.KEY_ENTRIES: self.entries},
+                      manifest_file, indent=1, sort_keys=True)
+        os.replace(temp_location, self.file_location)
+
+    def _is_current(self, target_file, entry, digest):
+        """
+        Check whether the target file has been materialized from the same template content
+        and has not been touched since.
+
+        Parameters
+        ----------
+        target_file : str
+            Location of the target file
+        entry : dict
+            Manifest entry of the target file
+        digest : str
+            Digest of the current template file
+
+        Returns
+        -------
+        current : boolean
+            Whether the target file can be kept as is
+        """
+        if not entry or entry.get(self.KEY_DIGEST) != digest:
+            return False
+        try:
+            stat = os.stat(target_file)
+        except OSError:
+            return False
+        return stat.st_size == entry.get(self.KEY_SIZE) and \
+            stat.st_mtime_ns == entry.get(self.KEY_MTIME)
+
+    def _link(self, source_file, target_file):
+        """
+        Materialize a single file according to the mode. An existing target file is
+        unlinked first so a hard linked template file is never written through.
+
+        Parameters
+        ----------
+        source_file : str
+            Location of the template file
+        target_file : str
+            Target location
+        """
+        if os.path.lexists(target_file):
+            os.unlink(target_file)
+        if self.mode == self.MODE_HARDLINK:
+            try:
+                os.link(source_file, target_file)
+                return
+            except OSError:
+                # ie different file systems or links not supported
+                pass
+        elif self.mode == self.MODE_REFLINK and self._reflink(source_file, target_file):
+            return
+        shutil.copy2(source_file, target_file)
+
+    def _reflink(self, source_file, target_file):
+        """
+        Clone a file copy-on-write.
+
+        Parameters
+        ----------
+        source_file : str
+            Location of the template file
+        target_file : str
+            Target location
+
+        Returns
+        -------
+        cloned : boolean
+            Whether the file could be cloned
+        """
+        if fcntl is None:
+            return False
+        try:
+            with open(source_file, 'rb') as source, open(target_file, 'wb') as target:
+                fcntl.ioctl(target.fileno(), self.FICLONE, source.fileno())
+        except (OSError, IOError) as error:
+            if os.path.lexists(target_file):
+                os.unlink(target_file)
+            if error.errno in (errno.EBADF, errno.EINVAL, errno.ENOTTY, errno.EXDEV,
+                               errno.EOPNOTSUPP, errno.ENOSYS, errno.EPERM):
+                return False
+            raise
+        shutil.copystat(source_file, target_file)
+        return True
+
+    def _clean(self, clean_path, targets):
+        """
+        Remove all files below the path other than the template targets and the manifest
+        and remove directories which are empty afterwards.
+
+        Parameters
+        ----------
+        clean_path : str
+            Location to clean
+        targets : dict
+            Template files by target location
+        """
+        if not os.path.isdir(clean_path):
+            return
+        keep = set(os.path.abspath(target_file) for target_file in targets)
+        keep.add(os.path.abspath(self.file_location))
+        for root, dirs, files in os.walk(clean_path, topdown=False):
+            for file in files:
+                file_location = os.path.join(root, file)
+                if os.path.abspath(file_location) not in keep:
+                    os.unlink(file_location)
+            for directory in dirs:
+                dir_location = os.path.join(root, directory)
+                if os.path.islink(dir_location):
+                    os.unlink(dir_location)
+                elif not os.listdir(dir_location):
+                    os.rmdir(dir_location)
+
+    def _get_key(self, file_location):
+        """
+        Build the manifest key of a location which is relative to the manifest path.
+
+        Parameters
+        ----------
+        file_location : str
+            Location of the target file
+
+        Returns
+        -------
+        key : str
+            Relative location with forward slashes
+        """
+        return os.path.relpath(file_location, self.path).replace(os.sep, '/')
@@ -0,0 +1,127 @@
+"""
+This module persists the processed sql trace. The processed base and consumption layer are
+stored together with the generation settings in a compact versioned file. This allows to
+generate the different targets later on without tracing or processing again and without a
+connection to HANA.
+"""
+import gzip
+import hashlib
+import json
+import os
+
+
+class ProcessedCache(object):
+    """
+    This class reads and writes the processed sql trace file. The file is gzip compressed
+    json and holds a format version and a cache key which covers the sql trace and the
+    generation settings it was processed with.
+    """
+    FORMAT_VERSION = 1
+    KEY_FORMAT_VERSION = 'format_version'
+    KEY_CACHE_KEY = 'cache_key'
+    KEY_SETTINGS = 'settings'
+    KEY_DATA_SOURCE_MAPPING = 'data_source_mapping'
+    KEY_SQL_PROCESSED = 'sql_processed'
+    # Settings which only determine where artifacts are written do not invalidate the cache
+    SETTINGS_EXCLUDED_FROM_KEY = ['outputdir']
+
+    def __init__(self, path):
+        """
+        Processed sql trace file.
+
+        Parameters
+        ----------
+        path : str
+            Location of the file
+        """
+        self.path = path
+
+    @classmethod
+    def build_key(cls, sql_trace, settings):
+        """
+        Build the cache key of a sql trace processed with the provided settings.
+
+        Parameters
+        ----------
+        sql_trace : dict
+            raw sql trace structure generated in the hana ml package
+        settings : dict
+            The generation settings
+
+        Returns
+        -------
+        cache_key : str
+            Hex digest of the trace, the settings and the format version
+        """
+        key_settings = dict((key, value) for key, value in settings.items()
+                            if not key in cls.SETTINGS_EXCLUDED_FROM_KEY)
+        data = json.dumps([cls.FORMAT_VERSION, key_settings, sql_trace], sort_keys=True,
+                          default=str)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def exists(self):
+        """
+        Whether the file exists.
+
+        Returns
+        -------
+        exists : boolean
+            Whether the file exists
+        """
+        return os.path.isfile(self.path)
+
+    def save(self, cache_key, settings, data_source_mapping, sql_processed):
+        """
+        Write the processed sql trace. The file is written to a temporary file first so
+        concurrent readers never see a partially written file.
+
+        Parameters
+        ----------
+        cache_key : str
+            The cache key of the processed sql trace
+        settings : dict
+            The generation settings
+        data_source_mapping : dict
+            The data source mapping
+        sql_processed : dict
+            The processed base and consumption layer
+        """
+        content = {
+            self.KEY_FORMAT_VERSION: self.FORMAT_VERSION,
+            self.KEY_CACHE_KEY: cache_key,
+            self.KEY_SETTINGS: settings,
+            self.KEY_DATA_SOURCE_MAPPING: data_source_mapping,
+            self.KEY_SQL_PROCESSED: sql_processed
+        }
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        temp_path = self.path + '.tmp'
+        with gzip.open(temp_path, 'wb') as cache_file:
+            cache_file.write(json.dumps(content, separators=(',', ':')).encode('utf-8'))
+        os.replace(temp_path, self.path)
+
+    def load(self, cache_key=None):
+        """
+        Read the processed sql trace.
+
+        Parameters
+        ----------
+        cache_key : str
+            When provided the content is only returned if it was stored under this key
+
+        Returns
+        -------
+        content : dict
+            The stored content or None if the cache key does not match
+        """
+        with gzip.open(self.path, 'rb') as cache_file:
+            content = json.loads(cache_file.read().decode('utf-8'))
+        if content.get(self.KEY_FORMAT_VERSION) != self.FORMAT_VERSION:
+            raise ValueError('Processed sql trace {} has format version {} but {} is '
+                             'required'.format(self.path,
+                                               content.get(self.KEY_FORMAT_VERSION),
+                                               self.FORMAT_VERSION))
+        if cache_key and content.get(self.KEY_CACHE_KEY) != cache_key:
+            return None
+        return content
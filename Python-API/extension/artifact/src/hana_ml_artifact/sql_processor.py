@@ -3,14 +3,18 @@ This module handles the processing of the sql trace into base layer and if requi
 consumption layer objects. It also implements the merging and grouping of elements
 in the sql trace.
 """
+import concurrent.futures
 import copy
 import logging
+import re
 import uuid
 
-import hana_ml as hanaml  # Only here for version validation.
-
 from .config import ConfigConstants
 from .hana_ml_utils import StringUtils
+from .hana_ml_utils import MultiReplacer
+from .hana_ml_utils import PackageVersion
+from .sql_trace_dumper import SqlTraceDumper
+from .trace_source import TraceSource
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
@@ -230,30 +234,6 @@ class SqlProcessorBase(object):
         """
         return path.split('/')
 
-    def _get_raw_sql(self, sql_trace):
-        """
-        Split a dictionary path into its parts.
-
-        Parameters
-        ----------
-        sql_trace : dictionary
-            raw sql trace structure generated in the hana ml package
-
-        Returns
-        -------
-        sqls : list
-            list of all sql entries.
-
-        """
-        sqls = ''
-        for algo in sql_trace:
-            for function in sql_trace[algo]:
-                sqls += '------START Algo {} and Function {} ------'.format(algo, function)
-                for sql_entry in sql_trace[algo][function][self.TRACE_KEY_SQL]:
-                    sqls += sql_entry.replace('\n', '') + ';' + '\n'
-                sqls += '------END Algo {} and Function {} ------'.format(algo, function)
-        return sqls
-
     def _generate_db_object_name(self, parts, hdbtable=False):
         """
         Generate a db object name generically
@@ -328,20 +308,16 @@ class SqlProcessorBase(object):
         """
         return uuid.uuid4().hex
 
-    def _get_last_index(self, items, str_to_check):
+    def _get_profiler(self):
         """
-        Get the last index of a string in a list.
+        Get the profiler recording the generation.
 
         Returns
         -------
-        last_index : int
-            last index of the string to check
+        profiler : Profiler
+            The profiler
         """
-        last_index = -1
-        for idx, value in enumerate(items):
-            if str_to_check in value:
-                last_index = idx
-        return last_index
+        return self.config.get_entry(ConfigConstants.CONFIG_KEY_PROFILER)
 
 
 class SqlProcessor(SqlProcessorBase):
@@ -354,8 +330,14 @@ class SqlProcessor(SqlProcessorBase):
     more abstract as different solution specific implementation of the consumption
     layer have different requirements.
     """
+    # Config entries process pool workers do not need. The output backend and artifact
+    # manifest hold locks and open files which cannot be pickled.
+    WORKER_EXCLUDED_CONFIG_KEYS = [ConfigConstants.CONFIG_KEY_OUTPUT_BACKEND,
+                                   ConfigConstants.CONFIG_KEY_ARTIFACT_MANIFEST,
+                                   ConfigConstants.CONFIG_KEY_SQL_PROCESSED]
 
-    def __init__(self, config, raise_on_error=False, log_raw_sql=False):
+    def __init__(self, config, raise_on_error=False, log_raw_sql=False, max_workers=None,
+                 use_processes=False, raw_sql_path=None, raw_sql_max_size=None):
         """
         Sql processing class for artifact generation.
 
@@ -369,11 +351,27 @@ class SqlProcessor(SqlProcessorBase):
             object or silently logged only.
         log_raw_sql: boolean
             Whether to log the raw sql provided by sql trace for easy debugging and validation
-            of artifacts.
+            of artifacts. The raw sql is only dumped when the logger is enabled for DEBUG.
+        max_workers: int
+            Number of workers used to generate the base layer of the algo/function
+            combinations in parallel. None or 1 processes them sequentially.
+        use_processes: boolean
+            Whether the parallel workers are processes rather than threads. Processes avoid
+            the global interpreter lock for large traces at the cost of pickling the trace.
+        raw_sql_path: str
+            When logging the raw sql, write it into one file per algo/function combination in
+            this directory instead of the logger.
+        raw_sql_max_size: int
+            Maximum number of characters of the raw sql dump. For the file dump this applies
+            to each file.
         """
         super(SqlProcessor, self).__init__(config)
         self._raise_on_error = raise_on_error
         self._log_raw_sql = log_raw_sql
+        self._raw_sql_path = raw_sql_path
+        self._raw_sql_max_size = raw_sql_max_size
+        self._max_workers = max_workers
+        self._use_processes = use_processes
         self._base_layer_generator = SqlProcessorBaseLayer(config)
         self._consumption_layer_generator = SqlProcessorConsumptionLayer(config)
 
@@ -384,11 +382,25 @@ class SqlProcessor(SqlProcessorBase):
         Parameters
         ----------
         connection_context : object
-            The HANA ML connection object which holds the sql trace object
+            The HANA ML connection object which holds the sql trace object or any other
+            source accepted by TraceSource.create such as a recorded trace file
+        """
+        with self._get_profiler().span('parse_trace'):
+            sql_trace = TraceSource.create(connection_context).get_sql_trace()
+        self.process_sql_trace(sql_trace)
+
+    def process_sql_trace(self, sql_trace):
+        """
+        Process a sql trace which has already been retrieved from the connection.
+
+        Parameters
+        ----------
+        sql_trace : dict
+            raw sql trace structure generated in the hana ml package
         """
-        sql_trace = connection_context.sql_tracer.get_sql_trace()
         if sql_trace:
-            self._process_sql(sql_trace)
+            with self._get_profiler().span('process_sql'):
+                self._process_sql(sql_trace)
         else:
             raise ValueError('No sql trace found. '
                              + 'Please assure you enable the trace before performing any'
@@ -406,26 +418,22 @@ class SqlProcessor(SqlProcessorBase):
         """
         sql_processed = self.config.get_entry(ConfigConstants.CONFIG_KEY_SQL_PROCESSED)
         if sql_trace:
-            if self._log_raw_sql:
-                logger.debug(self._get_raw_sql(sql_trace))
+            if self._log_raw_sql and logger.isEnabledFor(logging.DEBUG):
+                dumper = SqlTraceDumper(sql_trace, max_size=self._raw_sql_max_size)
+                if self._raw_sql_path:
+                    dumper.dump_to_directory(self._raw_sql_path)
+                else:
+                    dumper.dump_to_logger(logger)
 
             # Process / Transform sql
+            trace_elements = []
             for algo in sql_trace:
                 if algo and any(supported_algo.lower() in algo.lower() for supported_algo in
                                 self.SUPPORTED_ALGOS):  # Check for None values
                     for function in sql_trace[algo]:
                         if sql_trace[algo][function]:  # Check for None values
                             if self.TRACE_KEY_SQL in sql_trace[algo][function]:
-                                sql_functions, sql_entries, input_tables, output_tables, \
-                                    output_vars = self._preprocess_sql(sql_trace[algo][function])
-                                self._base_layer_generator.generate_base_layer(algo,
-                                                                               function,
-                                                                               sql_processed,
-                                                                               sql_entries,
-                                                                               sql_functions,
-                                                                               input_tables,
-                                                                               output_tables,
-                                                                               output_vars)
+                                trace_elements.append((algo, function, sql_trace[algo][function]))
                             else:
                                 error_msg = 'No sql entries found for algorithm: {} ' \
                                             + 'and function {}'.format(algo, function)
@@ -435,9 +443,113 @@ class SqlProcessor(SqlProcessorBase):
                                     logger.error(error_msg)
                                     continue
 
+            if self._max_workers and self._max_workers > 1 and len(trace_elements) > 1:
+                self._generate_base_layer_parallel(sql_processed, trace_elements)
+            else:
+                for algo, function, trace_object in trace_elements:
+                    self._generate_base_layer(sql_processed, algo, function, trace_object)
+                    self._count_base_layer_element(
+                        sql_processed[self.TRACE_KEY_BASE_LAYER][algo][function])
+
             # Build generic consumption layer
-            sql_processed[self.TRACE_KEY_CONSUMPTION_LAYER] = \
-                self._consumption_layer_generator.generate_consumption_layer(sql_processed)
+            with self._get_profiler().span('consumption_layer'):
+                sql_processed[self.TRACE_KEY_CONSUMPTION_LAYER] = \
+                    self._consumption_layer_generator.generate_consumption_layer(sql_processed)
+
+    def _generate_base_layer(self, sql_processed, algo, function, trace_object):
+        """
+        Preprocess the traced object and generate its base layer element.
+
+        Parameters
+        ----------
+        sql_processed : dict
+            The object the conversion from sql trace
+        algo : str
+            Algorithm of the sql entries. ie RandomForestClassifier
+        function : str
+            Function of the sql entries. ie Fit
+        trace_object : dict
+            One individual traced object in the sql trace from HANA ML
+        """
+        profiler = self._get_profiler()
+        with profiler.span('preprocess_sql', algo=algo, function=function):
+            sql_functions, sql_entries, input_tables, output_tables, \
+                output_vars = self._preprocess_sql(trace_object)
+        with profiler.span('base_layer', algo=algo, function=function):
+            self._base_layer_generator.generate_base_layer(algo,
+                                                           function,
+                                                           sql_processed,
+                                                           sql_entries,
+                                                           sql_functions,
+                                                           input_tables,
+                                                           output_tables,
+                                                           output_vars)
+
+    def _generate_base_layer_parallel(self, sql_processed, trace_elements):
+        """
+        Generate the base layer elements in a pool of workers. Each worker generates into its
+        own structure as each algo/function combination only fills its own base layer element.
+        The elements are merged in trace order so the result does not depend on scheduling.
+
+        Parameters
+        ----------
+        sql_processed : dict
+            The object the conversion from sql trace
+        trace_elements : list
+            Tuples of algo, function and the traced object
+        """
+        if self._use_processes:
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=self._max_workers)
+            sql_processor = self._get_worker_processor()
+        else:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=self._max_workers)
+            sql_processor = self
+        with executor:
+            futures = [executor.submit(_generate_base_layer_element, sql_processor, algo,
+                                       function, trace_object)
+                       for algo, function, trace_object in trace_elements]
+            for (algo, function, __), future in zip(trace_elements, futures):
+                element = future.result()
+                if not self.TRACE_KEY_BASE_LAYER in sql_processed:
+                    sql_processed[self.TRACE_KEY_BASE_LAYER] = {}
+                if not algo in sql_processed[self.TRACE_KEY_BASE_LAYER]:
+                    sql_processed[self.TRACE_KEY_BASE_LAYER][algo] = {}
+                sql_processed[self.TRACE_KEY_BASE_LAYER][algo][function] = element
+                # Counted on merge as the profiler is not shared with worker processes
+                self._count_base_layer_element(element)
+
+    def _get_worker_processor(self):
+        """
+        Get a sql processor which is sent to process pool workers. It only holds the config
+        entries required to generate the base layer.
+
+        Returns
+        -------
+        sql_processor : SqlProcessor
+            The sql processor of the workers
+        """
+        config = self.config.copy(exclude_keys=self.WORKER_EXCLUDED_CONFIG_KEYS)
+        config.add_entry(ConfigConstants.CONFIG_KEY_SQL_PROCESSED, {})
+        return SqlProcessor(config, raise_on_error=self._raise_on_error)
+
+    def _count_base_layer_element(self, element):
+        """
+        Add the statements, tables and synonyms of a base layer element to the profiler
+        counters.
+
+        Parameters
+        ----------
+        element : dict
+            The generated base layer element
+        """
+        profiler = self._get_profiler()
+        profiler.increment(profiler.COUNTER_STATEMENTS,
+                           len(element[self.TRACE_KEY_SQL_PROCESSED]))
+        profiler.increment(profiler.COUNTER_TABLES,
+                           len(element[self.TRACE_KEY_TABLES_INPUT_PROCESSED]) +
+                           len(element[self.TRACE_KEY_TABLES_OUTPUT_PROCESSED]))
+        profiler.increment(profiler.COUNTER_SYNONYMS,
+                           len(element[self.TRACE_KEY_SYNONYMS_PROCESSED]))
 
     def _preprocess_sql(self, trace_object):
         """
@@ -494,7 +606,7 @@ class SqlProcessor(SqlProcessorBase):
             # > 1.0.7
             sql_entry = StringUtils.flatten_string_array(sql_entries)
             # = 1.0.7
-            if hanaml.__version__ == '1.0.7':
+            if PackageVersion.get_version(PackageVersion.HANA_ML) == '1.0.7':
                 sql_entry = sql_entries[0]
             # Sanity check
             if sql_entry:
@@ -574,6 +686,32 @@ class SqlProcessor(SqlProcessorBase):
         return sql_functions, sql_entries, input_tables, output_tables, output_vars
 
 
+def _generate_base_layer_element(sql_processor, algo, function, trace_object):
+    """
+    Worker function generating the base layer element of one algo/function combination. This is
+    a module level function so it can be used by a process pool.
+
+    Parameters
+    ----------
+    sql_processor : SqlProcessor
+        The sql processor
+    algo : str
+        Algorithm of the sql entries. ie RandomForestClassifier
+    function : str
+        Function of the sql entries. ie Fit
+    trace_object : dict
+        One individual traced object in the sql trace from HANA ML
+
+    Returns
+    -------
+    element : dict
+        The generated base layer element
+    """
+    sql_processed = {}
+    sql_processor._generate_base_layer(sql_processed, algo, function, trace_object)  # pylint: disable=protected-access
+    return sql_processed[SqlProcessorBase.TRACE_KEY_BASE_LAYER][algo][function]
+
+
 class SqlProcessorBaseLayer(SqlProcessorBase):
     """
     This class deals with generating the base layer objects. This is completely catered
@@ -618,14 +756,15 @@ class SqlProcessorBaseLayer(SqlProcessorBase):
 
         # Build synonyms
         synonyms = self._build_synonyms(sql_functions, input_tables)
-        sql_entries = self._filter_sql(sql_entries, input_tables)
-        sql_entries = self._filter_sql(sql_entries, output_tables)
-        sql_entries = self._filter_sql(sql_entries, output_vars)
-        sql_entries = self._add_input_table_statements(sql_entries, input_tables)
-        sql_entries = self._add_output_table_statements(sql_entries, output_tables)
-        sql_entries = self._add_output_var_statements(sql_entries, output_vars)
-        sql_entries = self._order_sql(sql_entries)
-        sql_entries = self._transform_sql(sql_entries, synonyms)
+        # Classify the statements once. The filter, order and transform stages work on the
+        # classified statements rather than rescanning the sql strings.
+        statements = [SqlStatement(sql_entry) for sql_entry in sql_entries]
+        statements = self._filter_sql(statements, input_tables + output_tables + output_vars)
+        statements = self._add_input_table_statements(statements, input_tables)
+        statements = self._add_output_table_statements(statements, output_tables)
+        statements = self._add_output_var_statements(statements, output_vars)
+        statements = self._order_sql(statements)
+        sql_entries = self._transform_sql(statements, synonyms)
 
         # Store processed structures
         if not self.TRACE_KEY_BASE_LAYER in sql_processed:
@@ -904,47 +1043,51 @@ class SqlProcessorBaseLayer(SqlProcessorBase):
         if name and schema:
             return name, schema, clean_schema + '::' + clean_name
 
-    def _add_input_table_statements(self, sql_entries, tables):
+    def _add_input_table_statements(self, statements, tables):
         """
         Generate the input table sql statements
 
         Parameters
         ----------
-        sql_entries : list
-            the sql entries generated by the hana ml package
+        statements : list
+            the classified sql entries generated by the hana ml package
         tables : list
             the input tables that need to be included in the sql entries.
 
         Returns
         -------
-        sql_entries : list
-            Processed sql entries.
-        """
+        statements : list
+            Processed classified sql entries.
+        """
+        # Check on which index we need to insert the statements as this needs to be
+        # under the 'DECLARE' statements. This is due to the autonomous sql
+        insert_index = -1
+        for idx, statement in enumerate(statements):
+            if 'DECLARE' in statement.keywords:
+                insert_index = idx
+        insert_index += 1
         for table in tables:
             sql_entry = table[self.TRACE_KEY_TABLES_ATTRIB_TRNAME] + \
                 ' = SELECT * FROM ' + ':' + table[self.TRACE_KEY_TABLES_ATTRIB_INT_NAME]
-            # Check on which index we need to insert the statement as this needs to be
-            # under the 'DECLARE' statements. This is due to the autonomous sql
-            insert_index = self._get_last_index(sql_entries, 'DECLARE') + 1
             if sql_entry:
-                sql_entries.insert(insert_index, sql_entry)
-        return sql_entries
+                statements.insert(insert_index, SqlStatement(sql_entry))
+        return statements
 
-    def _add_output_table_statements(self, sql_entries, tables):
+    def _add_output_table_statements(self, statements, tables):
         """
         Generate the output table sql statements
 
         Parameters
         ----------
-        sql_entries : list
-            the sql entries generated by the hana ml package
+        statements : list
+            the classified sql entries generated by the hana ml package
         tables : list
             the output tables that need to be included in the sql entries.
 
         Returns
         -------
-        sql_entries : list
-            Processed sql entries.
+        statements : list
+            Processed classified sql entries.
         """
         for table in tables:
             sql_entry = None
@@ -955,103 +1098,115 @@ class SqlProcessorBaseLayer(SqlProcessorBase):
                 sql_entry = table[self.TRACE_KEY_TABLES_ATTRIB_INT_NAME] + \
                     ' = ' + table[self.TRACE_KEY_TABLES_ATTRIB_SELECT]
             if sql_entry:
-                sql_entries.append(sql_entry)
-        return sql_entries
+                statements.append(SqlStatement(sql_entry))
+        return statements
 
-    def _add_output_var_statements(self, sql_entries, variables):
+    def _add_output_var_statements(self, statements, variables):
         """
         Generate the output table sql statements
 
         Parameters
         ----------
-        sql_entries : list
-            the sql entries generated by the hana ml package
+        statements : list
+            the classified sql entries generated by the hana ml package
         variables : list
             the output variables that need to be included in the sql entries.
 
         Returns
         -------
-        sql_entries : list
-            Processed sql entries.
+        statements : list
+            Processed classified sql entries.
         """
         for variable in variables:
             sql_entry = None
             sql_entry = 'SELECT ( ' + variable[self.TRACE_KEY_VARS_ATTRIB_SELECT] + \
                 ' ) INTO ' + variable[self.TRACE_KEY_VARS_ATTRIB_INT_NAME] + ' FROM DUMMY'
             if sql_entry:
-                sql_entries.append(sql_entry)
-        return sql_entries
+                statements.append(SqlStatement(sql_entry))
+        return statements
 
-    def _filter_sql(self, sql_entries, items):
+    def _filter_sql(self, statements, items):
         """
         Filter any unnecessary sql entries. For example create statements of input
         tables which is generated as part of the procedue signature.
 
         Parameters
         ----------
-        sql_entries : list
-            the sql entries generated by the hana ml package
+        statements : list
+            the classified sql entries generated by the hana ml package
         items : list
             the items to be filtered
 
         Returns
         -------
-        filtered_entries : list
-            filtered sql entries.
-        """
-        filtered_entries = []
-        for sql_entry in sql_entries:
-            if 'DROP' in sql_entry:
+        filtered_statements : list
+            filtered classified sql entries.
+        """
+        # Item names which are plain identifiers are matched against the identifiers the
+        # statement references. Others fall back to a substring check.
+        item_identifiers = set()
+        item_names = []
+        item_selects = []
+        for item in items:
+            name = item[self.TRACE_KEY_ATTRIB_NAME]
+            if SqlStatement.is_identifier(name):
+                item_identifiers.add(name)
+            else:
+                item_names.append(name)
+            item_selects.append(item[self.TRACE_KEY_ATTRIB_SELECT])
+
+        filtered_statements = []
+        for statement in statements:
+            if 'DROP' in statement.keywords:
                 continue
-            if 'CREATE' in sql_entry:
+            if 'CREATE' in statement.keywords:
                 # Excluding input tables if available as these will be part of the procedure
                 # interface
-                if items and any(item[self.TRACE_KEY_ATTRIB_NAME] in
-                                 sql_entry for item in items):
+                if not item_identifiers.isdisjoint(statement.identifiers) or \
+                        any(name in statement.sql for name in item_names):
                     continue
-            if sql_entry.startswith('SELECT'):
+            if statement.kind == SqlStatement.KIND_SELECT:
                 # Exclude plain select statements generally for output vars as these will
                 # be populated as part of the proc interface
-                if items and any(item[self.TRACE_KEY_ATTRIB_SELECT] in
-                                 sql_entry for item in items):
+                if any(select in statement.sql for select in item_selects):
                     continue
-            filtered_entries.append(sql_entry)
-        return filtered_entries
+            filtered_statements.append(statement)
+        return filtered_statements
 
-    def _order_sql(self, sql_entries):
+    def _order_sql(self, statements):
         """
         Reorder the sql entries to assure proper syntax for procedures.
         ie DECLARE statemetns at the top of the procedure.
 
         Parameters
         ----------
-        sql_entries : list
-            the sql entries generated by the hana ml package
+        statements : list
+            the classified sql entries generated by the hana ml package
 
         Returns
         -------
-        reordered_entries : list
-            ordered sql entries.
-        """
-        reordered_entries = []
-        other_entries = []
-        for sql_entry in sql_entries:
-            if 'CREATE' in sql_entry:
-                reordered_entries.append(sql_entry)
+        reordered_statements : list
+            ordered classified sql entries.
+        """
+        reordered_statements = []
+        other_statements = []
+        for statement in statements:
+            if 'CREATE' in statement.keywords:
+                reordered_statements.append(statement)
             else:
-                other_entries.append(sql_entry)
-        reordered_entries.extend(other_entries)
-        return reordered_entries
+                other_statements.append(statement)
+        reordered_statements.extend(other_statements)
+        return reordered_statements
 
-    def _transform_sql(self, sql_entries, synonyms):
+    def _transform_sql(self, statements, synonyms):
         """
         Transform the sql entries to assure proper syntax for procedures.
         ie table variables and <table_var>.INSERT to add data to parameter table.
 
         Parameters
         ----------
-        sql_entries : list
-            the sql entries generated by the hana ml package
+        statements : list
+            the classified sql entries generated by the hana ml package
         synonyms : list
             synonyms to replace the direct usage of schema/table/function to synonym usage.
 
@@ -1063,17 +1218,23 @@ class SqlProcessorBaseLayer(SqlProcessorBase):
         transformed_entries = []
         # Build synonym replacements
         synonym_replacements = self._build_synonym_replacements(synonyms)
-        for sql_entry in sql_entries:
+        # Replacers per statement type combination as to compile the patterns only once
+        replacers = {}
+        for statement in statements:
+            # Ignore anonymous block statement
+            if statement.kind == SqlStatement.KIND_BLOCK:
+                continue
+
             replacements = {}
 
-            if 'CREATE' in sql_entry:
+            if 'CREATE' in statement.keywords:
                 replacements.update({
                     'CREATE LOCAL TEMPORARY COLUMN TABLE': 'DECLARE',
                     '" (': ' TABLE (',
                     '"#': ''
                 })
 
-            if 'INSERT' in sql_entry:
+            if 'INSERT' in statement.keywords:
                 replacements.update({
                     'INSERT INTO ': '',
                     ' VALUES ': '.INSERT(',
@@ -1082,30 +1243,28 @@ class SqlProcessorBaseLayer(SqlProcessorBase):
                     '#': ':'
                 })
 
-            if 'CALL' in sql_entry:
+            if 'CALL' in statement.keywords:
                 replacements.update({
                     ' WITH OVERVIEW': '',
                     '"': '',
                     '#': ':'
                 })
 
-            if 'SELECT' in sql_entry:
+            if 'SELECT' in statement.keywords:
                 replacements.update({
                     '#': ':'
                 })
 
-            # Ignore anonymous block statement
-            if sql_entry.startswith('DO') or sql_entry.startswith('BEGIN') or \
-                    sql_entry.startswith('END'):
-                continue
-
-            # Merge dicts in the 'classical' way. Not using the option (merged_replacements
-            # = {**replacements, **synonym_replacements}) of >3.5 on purpose for backwards
-            # compatibility
-            merged_replacements = replacements.copy()
-            merged_replacements.update(synonym_replacements)
+            replacer_key = frozenset(replacements)
+            if not replacer_key in replacers:
+                # Merge dicts in the 'classical' way. Not using the option (merged_replacements
+                # = {**replacements, **synonym_replacements}) of >3.5 on purpose for backwards
+                # compatibility
+                merged_replacements = replacements.copy()
+                merged_replacements.update(synonym_replacements)
+                replacers[replacer_key] = MultiReplacer(merged_replacements)
 
-            sql_entry = StringUtils.multi_replace(sql_entry, merged_replacements)
+            sql_entry = replacers[replacer_key].replace(statement.sql)
 
             if not sql_entry == '':
                 # Add sqlscript end statement identfier
@@ -1157,6 +1316,259 @@ class SqlProcessorBaseLayer(SqlProcessorBase):
         return replacements
 
 
+class SqlStatement(object):
+    """
+    A sql statement classified once by tokenizing it. The statement is tagged with its kind based
+    on the leading keyword, the keywords it uses and the identifiers it references. Quoted
+    identifiers and string literals are not seen as keywords, so a table name containing ie
+    CREATE does not make the statement a create statement.
+    """
+    KIND_DDL = 'DDL'
+    KIND_DML = 'DML'
+    KIND_CALL = 'CALL'
+    KIND_SELECT = 'SELECT'
+    KIND_DECLARE = 'DECLARE'
+    KIND_BLOCK = 'BLOCK'
+    KIND_OTHER = 'OTHER'
+    COMMAND_KINDS = {
+        'CREATE': KIND_DDL,
+        'DROP': KIND_DDL,
+        'ALTER': KIND_DDL,
+        'TRUNCATE': KIND_DDL,
+        'INSERT': KIND_DML,
+        'UPDATE': KIND_DML,
+        'UPSERT': KIND_DML,
+        'DELETE': KIND_DML,
+        'MERGE': KIND_DML,
+        'CALL': KIND_CALL,
+        'SELECT': KIND_SELECT,
+        'DECLARE': KIND_DECLARE,
+        'DO': KIND_BLOCK,
+        'BEGIN': KIND_BLOCK,
+        'END': KIND_BLOCK
+    }
+    KEYWORDS = frozenset(list(COMMAND_KINDS) + [
+        'LOCAL', 'TEMPORARY', 'COLUMN', 'TABLE', 'AS', 'INTO', 'VALUES', 'FROM', 'WHERE', 'WITH',
+        'OVERVIEW', 'DUMMY', 'NULL', 'AND', 'OR', 'NOT', 'IN', 'ARRAY', 'UNNEST'])
+    # String literal, quoted identifier or (optionally colon prefixed) bare word
+    TOKEN_PATTERN = re.compile(r"'(?:[^']|'')*'|\"([^\"]*)\"|:?([A-Za-z_#$][A-Za-z0-9_#$]*)")
+    IDENTIFIER_PATTERN = re.compile(r'[A-Za-z_#$][A-Za-z0-9_#$]*$')
+
+    __slots__ = ['sql', 'command', 'kind', 'keywords', 'identifiers']
+
+    def __init__(self, sql):
+        """
+        Classify the sql statement.
+
+        Parameters
+        ----------
+        sql : str
+            The sql statement
+        """
+        self.sql = sql
+        self.command = None
+        keywords = set()
+        identifiers = set()
+        for match in self.TOKEN_PATTERN.finditer(sql):
+            quoted, word = match.group(1), match.group(2)
+            if self.command is None and (quoted is not None or word is not None):
+                # Leading token decides the kind. Only a bare word can be a command.
+                self.command = word if word in self.COMMAND_KINDS and \
+                    not match.group(0).startswith(':') else ''
+            if quoted is not None:
+                identifiers.add(quoted)
+            elif word is not None:
+                if word in self.KEYWORDS:
+                    keywords.add(word)
+                else:
+                    identifiers.add(word)
+        self.kind = self.COMMAND_KINDS.get(self.command, self.KIND_OTHER)
+        self.keywords = frozenset(keywords)
+        self.identifiers = frozenset(identifiers)
+
+    @classmethod
+    def is_identifier(cls, name):
+        """
+        Check whether the name is a single identifier as found by the tokenizer.
+
+        Parameters
+        ----------
+        name : str
+            The name to check
+
+        Returns
+        -------
+        is_identifier : boolean
+            Whether the name can be matched against the identifiers of a statement
+        """
+        return bool(cls.IDENTIFIER_PATTERN.match(name))
+
+    def __repr__(self):
+        return 'SqlStatement({}, {!r})'.format(self.kind, self.sql)
+
+
+class SelectIndex(object):
+    """
+    Index of select statements to quickly find the selects that are contained in another
+    select. Selects are keyed on their longest quoted identifier (ie the temp table name) so a
+    lookup only has to verify the few selects that share an identifier rather than all of them.
+    Selects without a quoted identifier are always verified.
+    """
+    IDENTIFIER_PATTERN = re.compile(r'"[^"]+"')
+
+    def __init__(self):
+        """
+        Index of select statements.
+        """
+        self._keyed = {}
+        self._unkeyed = []
+
+    def add(self, select, value):
+        """
+        Add a select to the index.
+
+        Parameters
+        ----------
+        select : str
+            The select statement as provided by the hana ml api
+        value : object
+            The value that is returned when the select is found
+        """
+        identifiers = self.IDENTIFIER_PATTERN.findall(select)
+        if identifiers:
+            key = max(identifiers, key=len)
+            self._keyed.setdefault(key, []).append((select, value))
+        else:
+            self._unkeyed.append((select, value))
+
+    def lookup(self, check_select):
+        """
+        Retrieve the values of all indexed selects which are contained in the check select.
+
+        Parameters
+        ----------
+        check_select : str
+            The select statement to check
+
+        Returns
+        -------
+        values : list
+            Values of the indexed selects that are part of the check select
+        """
+        values = []
+        for identifier in set(self.IDENTIFIER_PATTERN.findall(check_select)):
+            for select, value in self._keyed.get(identifier, []):
+                if select in check_select:
+                    values.append(value)
+        for select, value in self._unkeyed:
+            if select in check_select:
+                values.append(value)
+        return values
+
+
+class RelationGraph(object):
+    """
+    Adjacency maps of the relationship context. This allows parent and child relations of a base
+    layer element to be looked up directly instead of scanning all relations.
+    """
+
+    def __init__(self, relations):
+        """
+        Build the adjacency maps of the relationship context.
+
+        Parameters
+        ----------
+        relations : list
+            A list with relations as built by the relationship context
+        """
+        self.relations = relations
+        self._children = {}
+        self._parents = {}
+        self._children_by_interface = {}
+        self._parents_by_interface = {}
+        for relation in relations:
+            from_path = relation['from_path']
+            to_path = relation['to_path']
+            self._children.setdefault(from_path, []).append(relation)
+            self._parents.setdefault(to_path, []).append(relation)
+            from_key = (from_path,
+                        relation['from_object'][SqlProcessorBase.TRACE_KEY_TABLES_ATTRIB_INT_NAME])
+            to_key = (to_path,
+                      relation['to_object'][SqlProcessorBase.TRACE_KEY_TABLES_ATTRIB_INT_NAME])
+            self._children_by_interface.setdefault(from_key, []).append(relation)
+            self._parents_by_interface.setdefault(to_key, []).append(relation)
+
+    def get_children(self, path):
+        """
+        Get the relations where the element of the path is the source.
+
+        Parameters
+        ----------
+        path : str
+            Path of the base layer element
+
+        Returns
+        -------
+        relations : list
+            Relations to the child elements
+        """
+        return self._children.get(path, [])
+
+    def get_parents(self, path):
+        """
+        Get the relations where the element of the path is the target.
+
+        Parameters
+        ----------
+        path : str
+            Path of the base layer element
+
+        Returns
+        -------
+        relations : list
+            Relations to the parent elements
+        """
+        return self._parents.get(path, [])
+
+    def get_children_by_interface(self, path, interface_name):
+        """
+        Get the relations where the output table with the interface name of the element of the
+        path is the source.
+
+        Parameters
+        ----------
+        path : str
+            Path of the base layer element
+        interface_name : str
+            The internal variable name of the output table
+
+        Returns
+        -------
+        relations : list
+            Relations to the child elements
+        """
+        return self._children_by_interface.get((path, interface_name), [])
+
+    def get_parents_by_interface(self, path, interface_name):
+        """
+        Get the relations where the input table with the interface name of the element of the
+        path is the target.
+
+        Parameters
+        ----------
+        path : str
+            Path of the base layer element
+        interface_name : str
+            The internal variable name of the input table
+
+        Returns
+        -------
+        relations : list
+            Relations to the parent elements
+        """
+        return self._parents_by_interface.get((path, interface_name), [])
+
+
 class SqlProcessorConsumptionLayer(SqlProcessorBase):
     """
     This class deals with generating the consumption layer objects. This is generic as it needs
@@ -1167,6 +1579,19 @@ class SqlProcessorConsumptionLayer(SqlProcessorBase):
     Also merging and grouping is implemented here.
     """
 
+    def __init__(self, config):
+        """
+        Sql processing class for the consumption layer.
+
+        Parameters
+        ----------
+        config : dict
+            The config object holds the different configuration options required for
+            generation.
+        """
+        super(SqlProcessorConsumptionLayer, self).__init__(config)
+        self._relation_graph = None
+
     def generate_consumption_layer(self, sql_processed):
         """
         Start the generation of the consumption layer objects based on the base layer generated.
@@ -1182,20 +1607,27 @@ class SqlProcessorConsumptionLayer(SqlProcessorBase):
             Generated consumption layer
         """
         consumption_layer = []
+        profiler = self._get_profiler()
         # We need to understand the relation between base_layer objects. So build up t
         # his context first and save for reference:
-        sql_processed[self.TRACE_KEY_RELATION_CONTEXT] = \
-            self._build_relation_context(sql_processed)
+        with profiler.span('relation_context'):
+            sql_processed[self.TRACE_KEY_RELATION_CONTEXT] = \
+                self._build_relation_context(sql_processed)
+            # Parent / child lookups during grouping and merging go through the relation graph
+            self._relation_graph = RelationGraph(sql_processed[self.TRACE_KEY_RELATION_CONTEXT])
         # Based on grouping type grouping is set on the base_objects and passed tot he
         # consumption layer as the grouping implementation is on consumption layer level
-        self._set_grouping(sql_processed)
+        with profiler.span('grouping'):
+            self._set_grouping(sql_processed)
         sql_proc_base_layer = sql_processed[self.TRACE_KEY_BASE_LAYER]
-        for algo in sql_proc_base_layer:
-            for function in sql_proc_base_layer[algo]:
-                consumption_elements = self._build_consumption_layer_structure(
-                    sql_processed, algo, function, self.TRACE_KEY_TABLES_ATTRIB_DBOBJECT_NAME)
-                if consumption_elements:
-                    consumption_layer.extend(consumption_elements)
+        with profiler.span('consumption_layer_structure'):
+            for algo in sql_proc_base_layer:
+                for function in sql_proc_base_layer[algo]:
+                    consumption_elements = self._build_consumption_layer_structure(
+                        sql_processed, algo, function,
+                        self.TRACE_KEY_TABLES_ATTRIB_DBOBJECT_NAME)
+                    if consumption_elements:
+                        consumption_layer.extend(consumption_elements)
         return consumption_layer
 
     def _build_relation_context(self, sql_processed):
@@ -1217,45 +1649,51 @@ class SqlProcessorConsumptionLayer(SqlProcessorBase):
         relations : list
             A list with relations
         """
-        relations = []
         sql_proc_base_layer = sql_processed[self.TRACE_KEY_BASE_LAYER]
+        select_index = SelectIndex()
+        producers = []
         for algo in sql_proc_base_layer:
             for function in sql_proc_base_layer[algo]:
                 if self.TRACE_KEY_TABLES_OUTPUT_PROCESSED in sql_proc_base_layer[algo][function]:
-                    # For each input table check wether the select of the output table is being
-                    # used which indicates a relationship
                     for table in sql_proc_base_layer[algo][function][
                             self.TRACE_KEY_TABLES_OUTPUT_PROCESSED]:
-                        select = table[self.TRACE_KEY_TABLES_ATTRIB_SELECT]
-                        # check input structures
-                        for check_algo in sql_proc_base_layer:
-                            for check_function in sql_proc_base_layer[check_algo]:
-                                if self.TRACE_KEY_TABLES_INPUT_PROCESSED in \
-                                        sql_proc_base_layer[check_algo][check_function]:
-                                    for check_table in sql_proc_base_layer[check_algo][
-                                            check_function][
-                                                self.TRACE_KEY_TABLES_INPUT_PROCESSED]:
-                                        if select in  \
-                                                check_table[self.TRACE_KEY_TABLES_ATTRIB_SELECT]:
-                                            from_path = self.TRACE_KEY_BASE_LAYER + '/' \
-                                                + algo + '/' + function
-                                            from_metadata = sql_processed[
-                                                self.TRACE_KEY_BASE_LAYER][algo][function][
-                                                    self.TRACE_KEY_METADATA_PROCESSED]
-                                            to_path = self.TRACE_KEY_BASE_LAYER + '/'  \
-                                                + check_algo + '/' + check_function
-                                            to_metadata = sql_processed[self.TRACE_KEY_BASE_LAYER][
-                                                check_algo][check_function][self.
-                                                                            TRACE_KEY_METADATA_PROCESSED]
-                                            relation = {
-                                                'from_path': from_path,
-                                                'from_object': table,
-                                                'from_metadata': from_metadata,
-                                                'to_path': to_path,
-                                                'to_object': check_table,
-                                                'to_metadata': to_metadata
-                                            }
-                                            relations.append(relation)
+                        producer = (len(producers), algo, function, table)
+                        producers.append(producer)
+                        select_index.add(table[self.TRACE_KEY_TABLES_ATTRIB_SELECT], producer)
+
+        # For each input table look up the output tables whose select is being used which
+        # indicates a relationship. The ordinals keep the relations in the same order as a
+        # full scan of output tables against input tables would produce.
+        matches = []
+        consumer_idx = 0
+        for check_algo in sql_proc_base_layer:
+            for check_function in sql_proc_base_layer[check_algo]:
+                if self.TRACE_KEY_TABLES_INPUT_PROCESSED in \
+                        sql_proc_base_layer[check_algo][check_function]:
+                    for check_table in sql_proc_base_layer[check_algo][check_function][
+                            self.TRACE_KEY_TABLES_INPUT_PROCESSED]:
+                        check_select = check_table[self.TRACE_KEY_TABLES_ATTRIB_SELECT]
+                        for producer in select_index.lookup(check_select):
+                            matches.append((producer[0], consumer_idx, producer,
+                                            (check_algo, check_function, check_table)))
+                        consumer_idx += 1
+        matches.sort(key=lambda match: (match[0], match[1]))
+
+        relations = []
+        for __, __, producer, consumer in matches:
+            __, algo, function, table = producer
+            check_algo, check_function, check_table = consumer
+            relation = {
+                'from_path': self.TRACE_KEY_BASE_LAYER + '/' + algo + '/' + function,
+                'from_object': table,
+                'from_metadata': sql_proc_base_layer[algo][function][
+                    self.TRACE_KEY_METADATA_PROCESSED],
+                'to_path': self.TRACE_KEY_BASE_LAYER + '/' + check_algo + '/' + check_function,
+                'to_object': check_table,
+                'to_metadata': sql_proc_base_layer[check_algo][check_function][
+                    self.TRACE_KEY_METADATA_PROCESSED]
+            }
+            relations.append(relation)
         return relations
 
     def _set_grouping(self, sql_processed):
@@ -1801,22 +2239,21 @@ class SqlProcessorConsumptionLayer(SqlProcessorBase):
         """
         path = self.TRACE_KEY_BASE_LAYER + '/' + algo + '/' + function
         rel_objects = []
-        if self.TRACE_KEY_RELATION_CONTEXT in sql_processed:
-            for relation in sql_processed[self.TRACE_KEY_RELATION_CONTEXT]:
-                if relation['from_path'] == path and relation['from_object'][
-                        self.TRACE_KEY_TABLES_ATTRIB_INT_NAME] == interface_name:
-                    rel_object = {
-                        'path': relation['to_path'],
-                        'groups': self._get_attribute_from_path(sql_processed, relation['to_path'],
-                                                                'groups'),
-                        'direction': 'out',
-                        'name': relation['to_metadata']['procedure_name'],
-                        # consumption name as per the naming standard
-                        'cons_name': 'cons_' + relation['to_metadata']['procedure_name'],
-                        'interface_name': relation['to_object']['interface_name'],
-                        'dbobject_name': relation['to_object']['dbobject_name']
-                    }
-                    rel_objects.append(rel_object)
+        relation_graph = self._get_relation_graph(sql_processed)
+        if relation_graph:
+            for relation in relation_graph.get_children_by_interface(path, interface_name):
+                rel_object = {
+                    'path': relation['to_path'],
+                    'groups': self._get_attribute_from_path(sql_processed, relation['to_path'],
+                                                            'groups'),
+                    'direction': 'out',
+                    'name': relation['to_metadata']['procedure_name'],
+                    # consumption name as per the naming standard
+                    'cons_name': 'cons_' + relation['to_metadata']['procedure_name'],
+                    'interface_name': relation['to_object']['interface_name'],
+                    'dbobject_name': relation['to_object']['dbobject_name']
+                }
+                rel_objects.append(rel_object)
         return rel_objects
 
     def _get_child_objects(self, sql_processed, algo, function):
@@ -1839,19 +2276,18 @@ class SqlProcessorConsumptionLayer(SqlProcessorBase):
         """
         path = self.TRACE_KEY_BASE_LAYER + '/' + algo + '/' + function
         rel_objects = []
-        if self.TRACE_KEY_RELATION_CONTEXT in sql_processed:
-            for relation in sql_processed[self.TRACE_KEY_RELATION_CONTEXT]:
-                if 'from_path' in relation and 'from_object' in relation:
-                    if relation['from_path'] == path:
-                        rel_object = {
-                            'path': relation['to_path'],
-                            'groups': self._get_attribute_from_path(
-                                sql_processed, relation['to_path'],
-                                'groups'),
-                            'direction': 'out', 'name': relation['to_metadata']['procedure_name'],
-                            'interface_name': relation['to_object']['interface_name'],
-                            'dbobject_name': relation['to_object']['dbobject_name']}
-                        rel_objects.append(rel_object)
+        relation_graph = self._get_relation_graph(sql_processed)
+        if relation_graph:
+            for relation in relation_graph.get_children(path):
+                rel_object = {
+                    'path': relation['to_path'],
+                    'groups': self._get_attribute_from_path(
+                        sql_processed, relation['to_path'],
+                        'groups'),
+                    'direction': 'out', 'name': relation['to_metadata']['procedure_name'],
+                    'interface_name': relation['to_object']['interface_name'],
+                    'dbobject_name': relation['to_object']['dbobject_name']}
+                rel_objects.append(rel_object)
         return rel_objects
 
     def _get_parent_objects_by_interface(self, sql_processed, algo, function, interface_name):
@@ -1878,22 +2314,21 @@ class SqlProcessorConsumptionLayer(SqlProcessorBase):
         """
         path = self.TRACE_KEY_BASE_LAYER + '/' + algo + '/' + function
         rel_objects = []
-        if self.TRACE_KEY_RELATION_CONTEXT in sql_processed:
-            for relation in sql_processed[self.TRACE_KEY_RELATION_CONTEXT]:
-                if relation['to_path'] == path and relation['to_object'][
-                        self.TRACE_KEY_TABLES_ATTRIB_INT_NAME] == interface_name:
-                    rel_object = {
-                        'path': relation['from_path'],
-                        'groups': self._get_attribute_from_path(sql_processed, relation['from_path'],
-                                                                'groups'),
-                        'direction': 'in',
-                        'name': relation['from_metadata']['procedure_name'],
-                        # consumption name as per the naming standard
-                        'cons_name': 'cons_' + relation['from_metadata']['procedure_name'],
-                        'interface_name': relation['from_object']['interface_name'],
-                        'dbobject_name': relation['from_object']['dbobject_name']
-                    }
-                    rel_objects.append(rel_object)
+        relation_graph = self._get_relation_graph(sql_processed)
+        if relation_graph:
+            for relation in relation_graph.get_parents_by_interface(path, interface_name):
+                rel_object = {
+                    'path': relation['from_path'],
+                    'groups': self._get_attribute_from_path(sql_processed, relation['from_path'],
+                                                            'groups'),
+                    'direction': 'in',
+                    'name': relation['from_metadata']['procedure_name'],
+                    # consumption name as per the naming standard
+                    'cons_name': 'cons_' + relation['from_metadata']['procedure_name'],
+                    'interface_name': relation['from_object']['interface_name'],
+                    'dbobject_name': relation['from_object']['dbobject_name']
+                }
+                rel_objects.append(rel_object)
         return rel_objects
 
     def _get_parent_objects(self, sql_processed, algo, function):
@@ -1916,22 +2351,43 @@ class SqlProcessorConsumptionLayer(SqlProcessorBase):
         """
         path = self.TRACE_KEY_BASE_LAYER + '/' + algo + '/' + function
         rel_objects = []
-        if self.TRACE_KEY_RELATION_CONTEXT in sql_processed:
-            for relation in sql_processed[self.TRACE_KEY_RELATION_CONTEXT]:
-                if 'to_path' in relation and 'to_object' in relation:
-                    if relation['to_path'] == path:
-                        rel_object = {
-                            'path': relation['from_path'],
-                            'groups': self._get_attribute_from_path(
-                                sql_processed, relation['from_path'],
-                                'groups'),
-                            'direction': 'in',
-                            'name': relation['from_metadata']['procedure_name'],
-                            'interface_name': relation['from_object']['interface_name'],
-                            'dbobject_name': relation['from_object']['dbobject_name']}
-                        rel_objects.append(rel_object)
+        relation_graph = self._get_relation_graph(sql_processed)
+        if relation_graph:
+            for relation in relation_graph.get_parents(path):
+                rel_object = {
+                    'path': relation['from_path'],
+                    'groups': self._get_attribute_from_path(
+                        sql_processed, relation['from_path'],
+                        'groups'),
+                    'direction': 'in',
+                    'name': relation['from_metadata']['procedure_name'],
+                    'interface_name': relation['from_object']['interface_name'],
+                    'dbobject_name': relation['from_object']['dbobject_name']}
+                rel_objects.append(rel_object)
         return rel_objects
 
+    def _get_relation_graph(self, sql_processed):
+        """
+        Get the relation graph of the relationship context. The graph is built once per
+        relationship context and reused for all subsequent lookups.
+
+        Parameters
+        ----------
+        sql_processed : dict
+            The object the conversion from sql trace
+
+        Returns
+        -------
+        relation_graph : RelationGraph
+            The relation graph or None if no relationship context is available
+        """
+        if not self.TRACE_KEY_RELATION_CONTEXT in sql_processed:
+            return None
+        relations = sql_processed[self.TRACE_KEY_RELATION_CONTEXT]
+        if not self._relation_graph or not self._relation_graph.relations is relations:
+            self._relation_graph = RelationGraph(relations)
+        return self._relation_graph
+
     def _build_cds_entity_datatype(self, hana_table_type):
         # TODO: look at moving this to hana generation
         """
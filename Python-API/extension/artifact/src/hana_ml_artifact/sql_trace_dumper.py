@@ -0,0 +1,168 @@
+"""
+This module dumps the raw sql of the sql trace for debugging and validation of the generated
+artifacts. The sql is streamed line by line to a logger, a file handle or per function files so
+the complete dump never has to be held in memory.
+"""
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+class SqlTraceDumper(object):
+    """
+    Streams the raw sql entries of a sql trace.
+    """
+    TRACE_KEY_SQL = 'sql'
+    TRUNCATION_MARKER = '------TRUNCATED after {} characters------'
+    SHARD_FILE_EXTENSION = '.sql'
+    SHARD_NAME_PATTERN = re.compile(r'[^A-Za-z0-9_.-]')
+
+    def __init__(self, sql_trace, max_size=None):
+        """
+        Streams the raw sql entries of a sql trace.
+
+        Parameters
+        ----------
+        sql_trace : dict
+            raw sql trace structure generated in the hana ml package
+        max_size : int
+            Maximum number of characters written per dump. Once reached the dump is cut off
+            with a truncation marker. None does not limit the dump.
+        """
+        self.sql_trace = sql_trace
+        self.max_size = max_size
+
+    def iter_lines(self, algo=None, function=None):
+        """
+        Generate the lines of the dump. Lines are not terminated by a new line.
+
+        Parameters
+        ----------
+        algo : str
+            Only dump this algorithm. None dumps all algorithms.
+        function : str
+            Only dump this function. None dumps all functions.
+
+        Returns
+        -------
+        lines : generator
+            The lines of the dump
+        """
+        size = 0
+        for line in self._iter_trace_lines(algo, function):
+            size += len(line) + 1
+            if self.max_size is not None and size > self.max_size:
+                yield self.TRUNCATION_MARKER.format(self.max_size)
+                return
+            yield line
+
+    def dump_to_logger(self, target_logger=None, level=logging.DEBUG):
+        """
+        Write the dump line by line to a logger. Nothing is generated when the logger is not
+        enabled for the level.
+
+        Parameters
+        ----------
+        target_logger : logging.Logger
+            The logger to write to. Defaults to the logger of this module.
+        level : int
+            The log level
+        """
+        target_logger = target_logger or logger
+        if not target_logger.isEnabledFor(level):
+            return
+        for line in self.iter_lines():
+            target_logger.log(level, line)
+
+    def dump_to_file(self, file_handle, algo=None, function=None):
+        """
+        Write the dump line by line to an open file handle.
+
+        Parameters
+        ----------
+        file_handle : file
+            The text file handle to write to
+        algo : str
+            Only dump this algorithm. None dumps all algorithms.
+        function : str
+            Only dump this function. None dumps all functions.
+        """
+        for line in self.iter_lines(algo, function):
+            file_handle.write(line + '\n')
+
+    def dump_to_directory(self, path):
+        """
+        Write the dump sharded per algo/function combination into separate files. The size cap
+        applies to each file.
+
+        Parameters
+        ----------
+        path : str
+            The directory the files are written to. It is created when missing.
+
+        Returns
+        -------
+        file_names : list
+            The paths of the written files
+        """
+        if not os.path.exists(path):
+            os.makedirs(path)
+        file_names = []
+        for algo in self.sql_trace:
+            for function in self.sql_trace[algo] or {}:
+                file_name = os.path.join(path, self._get_shard_name(algo, function))
+                with open(file_name, 'w') as file_handle:
+                    self.dump_to_file(file_handle, algo, function)
+                file_names.append(file_name)
+        return file_names
+
+    def _iter_trace_lines(self, algo=None, function=None):
+        """
+        Generate the uncapped lines of the dump.
+
+        Parameters
+        ----------
+        algo : str
+            Only dump this algorithm. None dumps all algorithms.
+        function : str
+            Only dump this function. None dumps all functions.
+
+        Returns
+        -------
+        lines : generator
+            The lines of the dump
+        """
+        for trace_algo in self.sql_trace:
+            if algo is not None and trace_algo != algo:
+                continue
+            for trace_function in self.sql_trace[trace_algo] or {}:
+                if function is not None and trace_function != function:
+                    continue
+                trace_object = self.sql_trace[trace_algo][trace_function] or {}
+                yield '------START Algo {} and Function {} ------'.format(trace_algo,
+                                                                        trace_function)
+                for sql_entry in trace_object.get(self.TRACE_KEY_SQL, []):
+                    yield sql_entry.replace('\n', '') + ';'
+                yield '------END Algo {} and Function {} ------'.format(trace_algo,
+                                                                      trace_function)
+
+    def _get_shard_name(self, algo, function):
+        """
+        Build a file name safe shard name for an algo/function combination.
+
+        Parameters
+        ----------
+        algo : str
+            Algorithm of the sql entries. ie RandomForestClassifier
+        function : str
+            Function of the sql entries. ie Fit
+
+        Returns
+        -------
+        shard_name : str
+            The file name of the shard
+        """
+        return self.SHARD_NAME_PATTERN.sub('_', '{}_{}'.format(algo, function)) \
+            + self.SHARD_FILE_EXTENSION
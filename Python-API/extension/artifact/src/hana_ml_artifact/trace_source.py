@@ -0,0 +1,219 @@
+"""
+This module provides the sources of the sql trace from which the artifacts are generated.
+Next to the HANA ML connection context the sql trace can be recorded to and replayed from
+a json or json lines file. This allows generation without database access.
+"""
+import collections
+import json
+import os
+
+# Path like objects are supported from python 3.6 on
+_PATH_TYPES = (str, os.PathLike) if hasattr(os, 'PathLike') else (str,)
+
+
+class TraceSource(object):
+    """
+    This is the base class of the sources which provide the sql trace.
+    """
+    FORMAT_VERSION = 1
+    KEY_FORMAT_VERSION = 'format_version'
+
+    def get_sql_trace(self):
+        """
+        Get the sql trace.
+
+        Returns
+        -------
+        sql_trace : dict
+            raw sql trace structure generated in the hana ml package
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def create(source):
+        """
+        Create the trace source for the provided object.
+
+        Parameters
+        ----------
+        source : object
+            A trace source, the location of a recorded trace file or a HANA ML connection
+            context which holds the sql trace object
+
+        Returns
+        -------
+        trace_source : TraceSource
+            The trace source
+        """
+        if isinstance(source, TraceSource):
+            return source
+        if isinstance(source, _PATH_TYPES):
+            return FileTraceSource(source)
+        return ConnectionTraceSource(source)
+
+
+class ConnectionTraceSource(TraceSource):
+    """
+    Provides the sql trace of a HANA ML connection context.
+    """
+    def __init__(self, connection_context):
+        """
+        Provides the sql trace of a HANA ML connection context.
+
+        Parameters
+        ----------
+        connection_context : object
+            The HANA ML connection object which holds the sql trace object
+        """
+        self.connection_context = connection_context
+
+    def get_sql_trace(self):
+        """
+        Get the sql trace from the sql tracer of the connection context.
+
+        Returns
+        -------
+        sql_trace : dict
+            raw sql trace structure generated in the hana ml package
+        """
+        return self.connection_context.sql_tracer.get_sql_trace()
+
+
+class FileTraceSource(TraceSource):
+    """
+    Records and replays the sql trace using a file. Files ending with .jsonl are written as
+    json lines with a header line followed by one line per algo/function combination. All
+    other files are written as a single json document.
+    """
+    JSON_LINES_EXTENSION = '.jsonl'
+    KEY_SQL_TRACE = 'sql_trace'
+    KEY_ALGO = 'algo'
+    KEY_FUNCTION = 'function'
+    KEY_TRACE_OBJECT = 'trace'
+
+    def __init__(self, path):
+        """
+        Replays the sql trace recorded in a file.
+
+        Parameters
+        ----------
+        path : str or os.PathLike
+            Location of the recorded trace file
+        """
+        self.path = os.fspath(path) if hasattr(os, 'fspath') else path
+
+    def get_sql_trace(self):
+        """
+        Read the recorded sql trace. The file is read on each call so every call returns
+        its own copy of the trace.
+
+        Returns
+        -------
+        sql_trace : dict
+            raw sql trace structure generated in the hana ml package
+        """
+        if not os.path.isfile(self.path):
+            raise IOError('Recorded sql trace {} does not exist'.format(self.path))
+        with open(self.path, 'r') as trace_file:
+            if self._is_json_lines():
+                return self._read_json_lines(trace_file)
+            content = json.load(trace_file, object_pairs_hook=collections.OrderedDict)
+        self._validate_version(content)
+        return content[self.KEY_SQL_TRACE]
+
+    def record(self, source):
+        """
+        Record the sql trace of a source to the file.
+
+        Parameters
+        ----------
+        source : object
+            A trace source or a HANA ML connection context which holds the sql trace object
+        """
+        sql_trace = TraceSource.create(source).get_sql_trace()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(self.path, 'w') as trace_file:
+            if self._is_json_lines():
+                self._write_json_lines(trace_file, sql_trace)
+            else:
+                json.dump({self.KEY_FORMAT_VERSION: self.FORMAT_VERSION,
+                           self.KEY_SQL_TRACE: sql_trace}, trace_file, indent=1)
+
+    def _is_json_lines(self):
+        """
+        Whether the file is a json lines file.
+
+        Returns
+        -------
+        json_lines : boolean
+            Whether the file is a json lines file
+        """
+        return self.path.lower().endswith(self.JSON_LINES_EXTENSION)
+
+    def _write_json_lines(self, trace_file, sql_trace):
+        """
+        Write the sql trace as json lines.
+
+        Parameters
+        ----------
+        trace_file : file
+            The file to write to
+        sql_trace : dict
+            raw sql trace structure generated in the hana ml package
+        """
+        trace_file.write(json.dumps({self.KEY_FORMAT_VERSION: self.FORMAT_VERSION}) + '\n')
+        for algo in sql_trace:
+            for function in sql_trace[algo]:
+                trace_file.write(json.dumps({self.KEY_ALGO: algo,
+                                             self.KEY_FUNCTION: function,
+                                             self.KEY_TRACE_OBJECT: sql_trace[algo][function]})
+                                 + '\n')
+
+    def _read_json_lines(self, trace_file):
+        """
+        Read the sql trace from json lines.
+
+        Parameters
+        ----------
+        trace_file : file
+            The file to read from
+
+        Returns
+        -------
+        sql_trace : dict
+            raw sql trace structure generated in the hana ml package
+        """
+        sql_trace = collections.OrderedDict()
+        header = None
+        for line in trace_file:
+            if not line.strip():
+                continue
+            entry = json.loads(line, object_pairs_hook=collections.OrderedDict)
+            if header is None:
+                header = entry
+                self._validate_version(header)
+                continue
+            if not entry[self.KEY_ALGO] in sql_trace:
+                sql_trace[entry[self.KEY_ALGO]] = collections.OrderedDict()
+            sql_trace[entry[self.KEY_ALGO]][entry[self.KEY_FUNCTION]] = \
+                entry[self.KEY_TRACE_OBJECT]
+        if header is None:
+            raise ValueError('Recorded sql trace {} is empty'.format(self.path))
+        return sql_trace
+
+    def _validate_version(self, content):
+        """
+        Validate the format version of the recorded sql trace.
+
+        Parameters
+        ----------
+        content : dict
+            The content or header of the recorded sql trace
+        """
+        if content.get(self.KEY_FORMAT_VERSION) != self.FORMAT_VERSION:
+            raise ValueError('Recorded sql trace {} has format version {} but {} is '
+                             'required'.format(self.path,
+                                               content.get(self.KEY_FORMAT_VERSION),
+                                               self.FORMAT_VERSION))
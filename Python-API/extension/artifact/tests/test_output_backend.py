@@ -0,0 +1,84 @@
+"""
+Tests of the output backends.
+"""
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from hana_ml_artifact.benchmarks.synthetic_trace import SyntheticTraceSource
+from hana_ml_artifact.benchmarks.synthetic_trace import build_sql_trace
+from hana_ml_artifact.generator import Generator
+from hana_ml_artifact.hana_ml_utils import FileSystemBackend
+from hana_ml_artifact.hana_ml_utils import ZipBackend
+
+TARGETS = ['generate_hana', 'generate_hana_sda', 'generate_datahub', 'generate_amdp',
+           'generate_sapdi', 'generate_cf']
+
+
+def _read_directory(path):
+    """
+    Read the files below a location keyed by their relative path.
+    """
+    files = {}
+    for root, __, file_names in os.walk(path):
+        for file_name in file_names:
+            location = os.path.join(root, file_name)
+            with open(location, 'rb') as file:
+                files[os.path.relpath(location, path).replace(os.sep, '/')] = file.read()
+    return files
+
+
+def _read_zip(zip_location):
+    """
+    Read the entries of a zip archive keyed by their name.
+    """
+    with zipfile.ZipFile(zip_location) as zip_file:
+        return {name: zip_file.read(name) for name in zip_file.namelist()}
+
+
+class TestZipBackend(unittest.TestCase):
+    """
+    The zip backend is a drop-in replacement for the file system backend.
+    """
+    def setUp(self):
+        logging.disable(logging.INFO)
+        self.outputdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        shutil.rmtree(self.outputdir, ignore_errors=True)
+
+    def _generate(self, target, outputdir, output_backend):
+        # Three functions per algorithm so each algorithm has more than one predict
+        generator = Generator('test', '1.0', 'test_grant_service',
+                              SyntheticTraceSource(build_sql_trace(function_count=3)), outputdir,
+                              output_backend=output_backend)
+        getattr(generator, target)()
+        output_backend.close()
+
+    def test_zip_matches_file_system(self):
+        for target in TARGETS:
+            with self.subTest(target=target):
+                file_system_dir = os.path.join(self.outputdir, target, 'fs')
+                zip_location = os.path.join(self.outputdir, target, 'test.zip')
+                os.makedirs(file_system_dir)
+                self._generate(target, file_system_dir, FileSystemBackend())
+                self._generate(target, os.path.join(self.outputdir, target, 'zip'),
+                               ZipBackend(zip_location))
+                self.assertEqual(_read_directory(os.path.join(file_system_dir, 'test')),
+                                 _read_zip(zip_location))
+
+    def test_last_write_wins(self):
+        zip_location = os.path.join(self.outputdir, 'test.zip')
+        backend = ZipBackend(zip_location, root=self.outputdir)
+        backend.write_text_file(os.path.join(self.outputdir, 'abap'), 'APPLY.txt', 'first')
+        backend.write_text_file(os.path.join(self.outputdir, 'abap'), 'APPLY.txt', 'second')
+        backend.write_text_file(os.path.join(self.outputdir, 'removed'), 'file.txt', 'removed')
+        backend.delete_directory(os.path.join(self.outputdir, 'removed'))
+        backend.close()
+        self.assertEqual(_read_zip(zip_location), {'abap/APPLY.txt': b'second'})
+        with self.assertRaises(ValueError):
+            backend.write_text_file(self.outputdir, 'late.txt', 'late')
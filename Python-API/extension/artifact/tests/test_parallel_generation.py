@@ -0,0 +1,51 @@
+"""
+Tests of the parallel base layer generation.
+"""
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from hana_ml_artifact.benchmarks.synthetic_trace import SyntheticTraceSource
+from hana_ml_artifact.benchmarks.synthetic_trace import build_sql_trace
+from hana_ml_artifact.generator import Generator
+from hana_ml_artifact.hana_ml_utils import MemoryBackend
+from hana_ml_artifact.hana_ml_utils import ZipBackend
+
+
+class TestParallelGeneration(unittest.TestCase):
+    """
+    Generating the base layer in a worker pool gives the same artifacts as sequentially.
+    """
+    def setUp(self):
+        logging.disable(logging.INFO)
+        self.outputdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        shutil.rmtree(self.outputdir, ignore_errors=True)
+
+    def _generate_hana(self, output_backend, **kwargs):
+        generator = Generator('test', '1.0', 'test_grant_service',
+                              SyntheticTraceSource(build_sql_trace(algo_count=3)), self.outputdir,
+                              output_backend=output_backend, **kwargs)
+        generator.generate_hana()
+        output_backend.close()
+
+    def test_processes_memory_backend(self):
+        sequential = MemoryBackend()
+        self._generate_hana(sequential)
+        for use_processes in (False, True):
+            parallel = MemoryBackend()
+            self._generate_hana(parallel, max_workers=4, use_processes=use_processes)
+            self.assertEqual(sequential.files, parallel.files)
+
+    def test_processes_zip_backend(self):
+        sequential = MemoryBackend()
+        self._generate_hana(sequential)
+        zip_location = os.path.join(self.outputdir, 'test.zip')
+        self._generate_hana(ZipBackend(zip_location), max_workers=4, use_processes=True)
+        with zipfile.ZipFile(zip_location) as zip_file:
+            self.assertEqual(len(zip_file.namelist()), len(sequential.files))
@@ -0,0 +1,54 @@
+"""
+Tests of the compiled file templates.
+"""
+import logging
+import shutil
+import tempfile
+import unittest
+
+from hana_ml_artifact.benchmarks.synthetic_trace import SyntheticTraceSource
+from hana_ml_artifact.benchmarks.synthetic_trace import build_sql_trace
+from hana_ml_artifact.generator import Generator
+from hana_ml_artifact.generators.filewriter.template_registry import CompiledTemplate
+from hana_ml_artifact.hana_ml_utils import MemoryBackend
+from hana_ml_artifact.hana_ml_utils import StringUtils
+
+
+class TestCompiledTemplate(unittest.TestCase):
+    """
+    Rendering a compiled template matches the generic replacement.
+    """
+    CONTENT = 'GRANT <<GRANT_SERVICE>> TO <<SDA_GRANT_SERVICE>>;\n<<UNUSED>>'
+
+    def test_render_matches_multi_replace(self):
+        replacements = {'<<GRANT_SERVICE>>': 'gs', '<<SDA_GRANT_SERVICE>>': 'sda'}
+        self.assertEqual(CompiledTemplate(self.CONTENT).render(replacements),
+                         StringUtils.multi_replace(self.CONTENT, replacements))
+
+    def test_render_none_as_empty_string(self):
+        replacements = {'<<GRANT_SERVICE>>': 'gs', '<<SDA_GRANT_SERVICE>>': None}
+        self.assertEqual(CompiledTemplate(self.CONTENT).render(replacements),
+                         'GRANT gs TO ;\n<<UNUSED>>')
+        self.assertEqual(CompiledTemplate(self.CONTENT).render(replacements),
+                         StringUtils.multi_replace(self.CONTENT, replacements))
+
+
+class TestGenerateSda(unittest.TestCase):
+    """
+    The sda generation with the default arguments.
+    """
+    def setUp(self):
+        logging.disable(logging.INFO)
+        self.outputdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        shutil.rmtree(self.outputdir, ignore_errors=True)
+
+    def test_default_sda_grant_service(self):
+        backend = MemoryBackend()
+        generator = Generator('test', '1.0', 'test_grant_service',
+                              SyntheticTraceSource(build_sql_trace()), self.outputdir,
+                              output_backend=backend)
+        generator.generate_hana_sda()
+        self.assertTrue(backend.files)
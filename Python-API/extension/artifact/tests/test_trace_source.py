@@ -0,0 +1,100 @@
+"""
+Tests of the trace sources on recorded sql traces.
+"""
+import json
+import logging
+import os
+import pathlib
+import shutil
+import tempfile
+import unittest
+
+from hana_ml_artifact.generator import Generator
+from hana_ml_artifact.hana_ml_utils import MemoryBackend
+from hana_ml_artifact.trace_source import FileTraceSource
+from hana_ml_artifact.trace_source import TraceSource
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+# The same sql trace with a classic and an autonomous algorithm recorded in both formats
+RECORDED_TRACES = [os.path.join(DATA_DIR, 'random_forest_trace.json'),
+                   os.path.join(DATA_DIR, 'random_forest_trace.jsonl')]
+
+
+class TestFileTraceSource(unittest.TestCase):
+    """
+    Recording and replaying sql traces.
+    """
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir, ignore_errors=True)
+
+    def test_replay_formats_match(self):
+        json_trace, json_lines_trace = [FileTraceSource(path).get_sql_trace()
+                                        for path in RECORDED_TRACES]
+        self.assertEqual(list(json_trace), ['RandomForestClassifier', 'RandomForestClassifier1'])
+        self.assertEqual(json_trace, json_lines_trace)
+
+    def test_record_replay_round_trip(self):
+        for path in RECORDED_TRACES:
+            for extension in ('.json', '.jsonl'):
+                with self.subTest(path=path, extension=extension):
+                    recorded = os.path.join(self.tempdir, 'trace' + extension)
+                    FileTraceSource(recorded).record(FileTraceSource(path))
+                    self.assertEqual(FileTraceSource(recorded).get_sql_trace(),
+                                     FileTraceSource(path).get_sql_trace())
+                    if path.endswith(extension):
+                        # The recording of a replayed trace reproduces the file
+                        with open(recorded) as recorded_file, open(path) as trace_file:
+                            self.assertEqual(recorded_file.read(), trace_file.read())
+
+    def test_create_from_path(self):
+        for path in (RECORDED_TRACES[0], pathlib.Path(RECORDED_TRACES[0])):
+            with self.subTest(path=path):
+                trace_source = TraceSource.create(path)
+                self.assertIsInstance(trace_source, FileTraceSource)
+                self.assertEqual(trace_source.path, RECORDED_TRACES[0])
+
+    def test_missing_file(self):
+        with self.assertRaises(IOError):
+            FileTraceSource(os.path.join(self.tempdir, 'missing.json')).get_sql_trace()
+
+    def test_unsupported_version(self):
+        path = os.path.join(self.tempdir, 'trace.json')
+        with open(path, 'w') as trace_file:
+            json.dump({TraceSource.KEY_FORMAT_VERSION: TraceSource.FORMAT_VERSION + 1,
+                       FileTraceSource.KEY_SQL_TRACE: {}}, trace_file)
+        with self.assertRaises(ValueError):
+            FileTraceSource(path).get_sql_trace()
+
+
+class TestGenerateFromRecordedTrace(unittest.TestCase):
+    """
+    Generating the artifacts from recorded sql traces.
+    """
+    def setUp(self):
+        logging.disable(logging.INFO)
+        self.outputdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        shutil.rmtree(self.outputdir, ignore_errors=True)
+
+    def _generate_hana(self, source):
+        backend = MemoryBackend()
+        generator = Generator('test', '1.0', 'test_grant_service', source, self.outputdir,
+                              output_backend=backend)
+        generator.generate_hana()
+        return backend.files
+
+    def test_generate_hana(self):
+        expected = self._generate_hana(FileTraceSource(RECORDED_TRACES[0]))
+        procedures = [location for location in expected if location.endswith('.hdbprocedure')]
+        # A fit and a predict procedure per algorithm
+        self.assertTrue(any('randomforestclassifier1' in location.lower()
+                            for location in procedures))
+        self.assertGreaterEqual(len(procedures), 4)
+        for source in (RECORDED_TRACES[1], pathlib.Path(RECORDED_TRACES[0])):
+            with self.subTest(source=source):
+                self.assertEqual(self._generate_hana(source), expected)
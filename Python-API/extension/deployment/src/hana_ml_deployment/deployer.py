@@ -53,7 +53,7 @@ class Deployer(object):
         mta_deployer.deploy_mta(path, mta_builder, api, org, space, user, password)
     
     def deploy_datahub(self, path, project, host, port, useSSL, user, password, 
-                       tenant='default', verify_ssl=False, vflow_local=False):
+                       tenant='default', verify_ssl=False, vflow_local=False, max_workers=8):
         """
         Deploy datahubb graphs through the datahub rest api.
 
@@ -80,10 +80,20 @@ class Deployer(object):
             Verify the ssl certifcate
         vflow_local : boolean
             Use a local vflow engine for development purposes
+        max_workers : int
+            Maximum number of graphs uploaded concurrently
+
+        Returns
+        -------
+        report : list
+            Status per graph
         """
         dh_deployer = DHDeployer(project, host, port, useSSL, user, password,
-                                 tenant, verify_ssl, vflow_local)
-        dh_deployer.deploy_graphs(path)
+                                 tenant, verify_ssl, vflow_local, max_workers)
+        try:
+            return dh_deployer.deploy_graphs(path)
+        finally:
+            dh_deployer.close()
     
     def generate_webide_package(self, source_path, target_path=None, file_name='WebIDE'):
         """
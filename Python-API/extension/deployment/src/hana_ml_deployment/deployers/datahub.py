@@ -1,10 +1,14 @@
 """
 This module provides DataHub related functionality.
 """
+import concurrent.futures
 import logging
 import os
 import json
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__) #pylint: disable=invalid-name
@@ -15,7 +19,8 @@ class DHDeployer(object):
 
     It allows for deploying DataHub graphs through the REST API
     """
-    def __init__(self, project,  host, port, useSSL, user, password, tenant='default', verify_ssl=False, vflow_local=False):
+    def __init__(self, project,  host, port, useSSL, user, password, tenant='default', verify_ssl=False, vflow_local=False,
+                 max_workers=8, retries=3, backoff_factor=0.5, timeout=60):
         """
         Initialize the DataHub Deployer.
 
@@ -40,29 +45,81 @@ class DHDeployer(object):
             Verify the ssl certifcate
         vflow_local : boolean
             Use a local vflow engine for development purposes
+        max_workers : int
+            Maximum number of graphs uploaded concurrently
+        retries : int
+            Number of retries of a failed request
+        backoff_factor : float
+            Backoff factor of the retries in seconds
+        timeout : float
+            Timeout of a request in seconds
         """
-        self.datahub_restapi = DHRestApi(project, host, port, useSSL, user, password, tenant, verify_ssl, vflow_local)
+        self.max_workers = max_workers
+        self.datahub_restapi = DHRestApi(project, host, port, useSSL, user, password, tenant, verify_ssl, vflow_local,
+                                         pool_size=max_workers, retries=retries, backoff_factor=backoff_factor,
+                                         timeout=timeout)
 
     def deploy_graphs(self, path):
         """
-        Deploy datahub graphs through the datahub rest api.
+        Deploy datahub graphs through the datahub rest api. The graphs are uploaded concurrently
+        over the pooled connections of the rest api session.
 
         Parameters
         ----------
         path : str
             Path to the graph jsons.
+
+        Returns
+        -------
+        report : list
+            Status per graph ordered by graph name, see DHRestApi.upload_graph
+        """
+        file_names = sorted(file for file in os.listdir(path) if file.endswith(".json"))
+        if not file_names:
+            logger.info('No graphs found in {}'.format(path))
+            return []
+        start = time.time()
+        max_workers = max(1, min(self.max_workers, len(file_names)))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self._deploy_graph, os.path.join(path, file)) for file in file_names]
+            report = [future.result() for future in futures]
+        failed = [status['graph'] for status in report if not status['success']]
+        logger.info('Deployed {} of {} graphs in {:.2f} seconds'.format(
+            len(report) - len(failed), len(report), time.time() - start))
+        if failed:
+            logger.error('Deployment failed for graphs: {}'.format(', '.join(failed)))
+        return report
+
+    def close(self):
+        """
+        Close the connections of the rest api session.
+        """
+        self.datahub_restapi.close()
+
+    def _deploy_graph(self, file_path):
+        """
+        Deploy one graph
+
+        Parameters
+        ----------
+        file_path : str
+            Path to the graph json.
+
+        Returns
+        -------
+        status : dict
+            Status of the graph upload
         """
-        for file in os.listdir(path):
-            if file.endswith(".json"):
-                file_path = os.path.join(path, file)
-                file_base = os.path.basename(file_path)
-                file_name = os.path.splitext(file_base)[0]
-                
-                # Get json
-                json_obj = self._get_graph_json_obj(file_path)
-            
-                # Create Graph    
-                self.datahub_restapi.graph_update(file_name, json_obj)
+        file_base = os.path.basename(file_path)
+        file_name = os.path.splitext(file_base)[0]
+        try:
+            # Get json
+            json_obj = self._get_graph_json_obj(file_path)
+        except ValueError as err:
+            logger.error('Graph {} is no valid json: {}'.format(file_name, err))
+            return {'graph': file_name, 'success': False, 'status_code': None, 'message': str(err), 'duration': 0.0}
+        # Create Graph
+        return self.datahub_restapi.upload_graph(file_name, json_obj)
 
     def _get_graph_json_obj(self, file_path):
         """
@@ -73,17 +130,22 @@ class DHDeployer(object):
         file_path : str
             Path to the graph json.
         """
-        graph_file = open(file_path, 'r')
-        file_content = graph_file.read()
+        with open(file_path, 'r') as graph_file:
+            file_content = graph_file.read()
         return json.loads(file_content)
 
 class DHRestApi(object):
     """
     This class represents the DataHub Rest API. 
+
+    The calls share one session, so the connections to the tenant are kept alive and pooled
+    instead of doing a new TCP and TLS handshake per call.
     """
     GRAPH_URI = '/v1/repository/graphs/'
     NAME_PREFIX = 'hanaml.'
-    def __init__(self, project, host, port, useSSL, user, password, tenant='default', verify_ssl=False, vflow_local=False):
+    RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+    def __init__(self, project, host, port, useSSL, user, password, tenant='default', verify_ssl=False, vflow_local=False,
+                 pool_size=8, retries=3, backoff_factor=0.5, timeout=60):
         """
         Initialize the DataHub Rest API
 
@@ -108,6 +170,16 @@ class DHRestApi(object):
             Verify the ssl certifcate
         vflow_local : boolean
             Use a local vflow engine for development purposes
+        pool_size : int
+            Maximum number of pooled connections to the tenant
+        retries : int
+            Number of retries of a request failing with a connection error or a
+            status code in RETRY_STATUS_CODES
+        backoff_factor : float
+            Backoff factor of the retries in seconds, the retries wait
+            backoff_factor * 2 ** (retry - 1) seconds
+        timeout : float
+            Timeout of a request in seconds
         """
         protocol = "https://"
         if not useSSL:
@@ -121,6 +193,8 @@ class DHRestApi(object):
         self.user = '{}\\{}'.format(tenant, user)
         self.password = password
         self.project = project
+        self.timeout = timeout
+        self.session = self._create_session(pool_size, retries, backoff_factor)
 
     def graph_update(self, name, json_object):
         """
@@ -138,17 +212,81 @@ class DHRestApi(object):
         success: boolean
             Whether the call was a success
         """
-        if json_object:
-            url = self._get_url(self.GRAPH_URI) + self.NAME_PREFIX + self.project + '.' + name
-            header_params = {}
-            header_params['Accept'] = 'application/json'
-            header_params['Content-Type'] = 'application/json'
-            response = requests.post(url, json=json_object, headers=header_params, auth=(self.user, self.password), verify=self.verify_ssl)
+        return self.upload_graph(name, json_object)['success']
+
+    def upload_graph(self, name, json_object):
+        """
+        Update the graph in DataHub and report the outcome
+
+        Parameters
+        ----------
+        name: str
+            The name of the graph
+        json_object : str
+            The graph json object
+
+        Returns
+        -------
+        status: dict
+            The graph name, whether the call was a success, the status code, the
+            error message and the duration of the call in seconds
+        """
+        status = {'graph': name, 'success': False, 'status_code': None, 'message': '', 'duration': 0.0}
+        if not json_object:
+            status['message'] = 'Empty graph'
+            return status
+        url = self._get_url(self.GRAPH_URI) + self.NAME_PREFIX + self.project + '.' + name
+        header_params = {}
+        header_params['Accept'] = 'application/json'
+        header_params['Content-Type'] = 'application/json'
+        start = time.time()
+        try:
+            response = self.session.post(url, json=json_object, headers=header_params, timeout=self.timeout)
+        except requests.exceptions.RequestException as err:
+            status['message'] = str(err)
+            logger.error('Graph creation of {} failed: {}'.format(name, err))
+        else:
+            status['status_code'] = response.status_code
             if response.status_code == 201 or response.status_code == 200:
-                logger.debug('Succesfully created graph')
+                status['success'] = True
+                logger.debug('Succesfully created graph {}'.format(name))
             else:
-                logger.error('Graph creation failed with status code {} and message {}'.format(response.status_code, response.text))
-        return False
+                status['message'] = response.text
+                logger.error('Graph creation of {} failed with status code {} and message {}'.format(
+                    name, response.status_code, response.text))
+        status['duration'] = time.time() - start
+        return status
+
+    def close(self):
+        """
+        Close the pooled connections of the session
+        """
+        self.session.close()
+
+    def _create_session(self, pool_size, retries, backoff_factor):
+        """
+        Create the session with pooled connections and retries
+
+        Returns
+        -------
+        session: requests.Session
+            The session
+        """
+        # Updating a graph by name is idempotent, so the POST can be retried safely
+        retry_args = {'total': retries, 'backoff_factor': backoff_factor, 'status_forcelist': self.RETRY_STATUS_CODES,
+                      'raise_on_status': False}
+        try:
+            retry = Retry(allowed_methods=frozenset(['GET', 'POST']), **retry_args)
+        except TypeError:
+            # urllib3 before 1.26
+            retry = Retry(method_whitelist=frozenset(['GET', 'POST']), **retry_args)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.auth = (self.user, self.password)
+        session.verify = self.verify_ssl
+        return session
 
     def _get_url(self, function_part):
         """
@@ -9,9 +9,20 @@ try:
 except ImportError:
     import ConfigParser as configparser
 import csv
+import hashlib
+import itertools
 import logging
 import random
 import math
+import os
+import re
+import shutil
+import threading
+import time
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 class Settings:
     settings = None
@@ -64,7 +75,396 @@ class Settings:
             Settings._set_log_level(logger, level.lower())  #logger.setLevel(logging.INFO)
         #logger.addHandler(logging.NullHandler())
 
+class ColumnarCsvReader:
+    """
+    Streams a csv file without header in fixed-size chunks of rows and converts each chunk
+    column by column into parameter tuples for cursor.executemany.
+
+    The columns are typed according to the table definition. pyarrow is used when it is
+    installed, otherwise pandas and as last resort the csv module, which converts each value
+    in Python. Empty values are loaded as NULL. A numeric column whose values of a chunk do
+    not convert to its type is passed on as strings and converted by HANA as before.
+    """
+    ENGINE_PYARROW = 'pyarrow'
+    ENGINE_PANDAS = 'pandas'
+    ENGINE_CSV = 'csv'
+    INT_TYPES = ('TINYINT', 'SMALLINT', 'INT', 'INTEGER', 'BIGINT')
+    FLOAT_TYPES = ('DOUBLE', 'REAL', 'FLOAT')
+
+    def __init__(self, filename, cols, inlist, chunk_size=10000, engine=None):
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.column_names = ColumnarCsvReader.parse_column_names(inlist)
+        self.column_types = ColumnarCsvReader.parse_column_types(cols, self.column_names)
+        self.engine = engine or ColumnarCsvReader.default_engine()
+        self.rows = 0
+
+    @staticmethod
+    def default_engine():
+        try:
+            import pyarrow.csv
+            return ColumnarCsvReader.ENGINE_PYARROW
+        except ImportError:
+            pass
+        try:
+            import pandas
+            return ColumnarCsvReader.ENGINE_PANDAS
+        except ImportError:
+            return ColumnarCsvReader.ENGINE_CSV
+
+    @staticmethod
+    def parse_column_names(inlist):
+        return re.findall(r'"([^"]+)"', re.split(r'\bVALUES\b', inlist, flags=re.IGNORECASE)[0])
+
+    @staticmethod
+    def split_column_definitions(cols):
+        # Split the column definitions on the commas which are not part of a type, ie DECIMAL(12,5)
+        definitions = []
+        depth = 0
+        current = ''
+        for char in cols.strip()[1:-1]:
+            if char == '(':
+                depth += 1
+            elif char == ')':
+                depth -= 1
+            if char == ',' and depth == 0:
+                definitions.append(current.strip())
+                current = ''
+            else:
+                current += char
+        definitions.append(current.strip())
+        return definitions
+
+    @staticmethod
+    def parse_column_types(cols, column_names):
+        types = {}
+        for definition in ColumnarCsvReader.split_column_definitions(cols):
+            tokens = definition.split()
+            if len(tokens) < 2:
+                continue
+            sql_type = re.match(r'[A-Za-z]*', tokens[1]).group(0).upper()
+            if sql_type in ColumnarCsvReader.INT_TYPES:
+                types[tokens[0].strip('"').upper()] = 'int'
+            elif sql_type in ColumnarCsvReader.FLOAT_TYPES:
+                types[tokens[0].strip('"').upper()] = 'float'
+        # Decimals and all other types are passed on as strings so no precision is lost
+        return [types.get(name.upper(), 'str') for name in column_names]
+
+    def __iter__(self):
+        if self.engine == ColumnarCsvReader.ENGINE_PYARROW:
+            chunks = self._iter_pyarrow()
+        elif self.engine == ColumnarCsvReader.ENGINE_PANDAS:
+            chunks = self._iter_pandas()
+        else:
+            chunks = self._iter_csv()
+        for chunk in chunks:
+            self.rows += len(chunk)
+            yield chunk
+
+    def _iter_pyarrow(self):
+        import pyarrow as pa
+        from pyarrow import csv as pa_csv
+        read_options = pa_csv.ReadOptions(column_names=self.column_names)
+        parse_options = pa_csv.ParseOptions(delimiter=',', newlines_in_values=True)
+        convert_options = pa_csv.ConvertOptions(
+            column_types=dict((name, pa.string()) for name in self.column_names),
+            strings_can_be_null=True, null_values=[''])
+        pending = []
+        pending_rows = 0
+        for batch in pa_csv.open_csv(self.filename, read_options=read_options,
+                                     parse_options=parse_options,
+                                     convert_options=convert_options):
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            # Re-slice the record batches, which are sized in bytes, into chunks of rows
+            while pending_rows >= self.chunk_size:
+                table = pa.Table.from_batches(pending)
+                yield self._arrow_to_rows(table.slice(0, self.chunk_size))
+                table = table.slice(self.chunk_size)
+                pending = table.to_batches()
+                pending_rows = table.num_rows
+        if pending_rows > 0:
+            yield self._arrow_to_rows(pa.Table.from_batches(pending))
+
+    def _arrow_to_rows(self, table):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        columns = []
+        for column, column_type in zip(table.columns, self.column_types):
+            if column_type != 'str':
+                try:
+                    column = pc.cast(column, pa.int64() if column_type == 'int' else pa.float64())
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                    pass
+            columns.append(column.to_pylist())
+        return list(zip(*columns))
+
+    def _iter_pandas(self):
+        import pandas as pd
+        for frame in pd.read_csv(self.filename, header=None, names=self.column_names,
+                                 dtype=str, keep_default_na=False, na_values=[''],
+                                 chunksize=self.chunk_size):
+            columns = []
+            for name, column_type in zip(self.column_names, self.column_types):
+                series = frame[name]
+                try:
+                    if column_type == 'int':
+                        series = pd.to_numeric(series).astype('Int64')
+                    elif column_type == 'float':
+                        # Parsed like float() as by the other engines, to_numeric may be off in the last bit
+                        series = series.astype(float)
+                except (ValueError, TypeError):
+                    pass
+                columns.append(series.astype(object).where(series.notna(), None).tolist())
+            yield list(zip(*columns))
+
+    def _iter_csv(self):
+        with open(self.filename, 'r') as my_file:
+            reader = csv.reader(my_file, delimiter=',')
+            while True:
+                chunk = [tuple(value or None for value in row)
+                         for row in itertools.islice(reader, self.chunk_size)]
+                if not chunk:
+                    break
+                yield chunk
+
+class StreamingSplitter:
+    """
+    Assigns rows to the train, validation and test split in a single pass without buffering
+    the file. Each row is placed by a seeded hash of its key, which is the value of the key
+    column or the position of the row in the file, so the split is reproducible no matter how
+    the file is chunked. The split sizes follow the percentages approximately.
+    """
+    def __init__(self, train_percentage, valid_percentage, test_percentage, seed=4, key_index=None):
+        self.percentages = [train_percentage, valid_percentage, test_percentage]
+        self.thresholds = [sum(self.percentages[:index + 1]) for index in range(len(self.percentages))]
+        # Rows beyond the last threshold due to rounding go to the last non-empty split
+        self.last_split = max(index for index, percentage in enumerate(self.percentages) if percentage > 0)
+        self.seed = seed
+        self.key_index = key_index
+        self.position = 0
+
+    def assign(self, row):
+        key = row[self.key_index] if self.key_index is not None else self.position
+        self.position += 1
+        digest = hashlib.md5('{0}:{1}'.format(self.seed, key).encode('utf-8')).hexdigest()
+        fraction = int(digest[:13], 16) / float(16 ** 13)
+        for index, threshold in enumerate(self.thresholds):
+            if self.percentages[index] > 0 and fraction < threshold:
+                return index
+        return self.last_split
+
+    def split(self, rows):
+        splits = [[] for _ in self.percentages]
+        for row in rows:
+            splits[self.assign(row)].append(row)
+        return splits
+
+class ConnectionPool:
+    """
+    Pool of hdbcli connections for the concurrent loading of tables. Connections are opened
+    on demand up to the pool size and replaced when they are no longer connected.
+    """
+    # Connection failures, lock wait timeout, deadlock and statement timeout
+    TRANSIENT_ERROR_CODES = (-10709, -10807, -10108, 131, 133, 613)
+
+    def __init__(self, connect, size=4):
+        self.connect = connect
+        self.size = size
+        self._idle = queue.Queue()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def from_config(config_file, size=4):
+        url, port, user, pwd = Settings.load_config(config_file)
+        def connect():
+            from hdbcli import dbapi
+            return dbapi.connect(address=url, port=port, user=user, password=pwd)
+        return ConnectionPool(connect, size)
+
+    def acquire(self):
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = len(self._connections) < self.size
+                if create:
+                    # Reserve the slot, the connection is opened outside of the lock
+                    self._connections.append(None)
+            if not create:
+                connection = self._idle.get()
+            else:
+                try:
+                    connection = self._open()
+                except:
+                    with self._lock:
+                        self._connections.remove(None)
+                    raise
+                with self._lock:
+                    self._connections[self._connections.index(None)] = connection
+                return connection
+        if not connection.isconnected():
+            self.discard(connection)
+            return self.acquire()
+        return connection
+
+    def release(self, connection):
+        self._idle.put(connection)
+
+    def discard(self, connection):
+        with self._lock:
+            if connection in self._connections:
+                self._connections.remove(connection)
+        try:
+            connection.close()
+        except:
+            pass
+
+    def close(self):
+        with self._lock:
+            connections = [con for con in self._connections if con is not None]
+            self._connections = []
+        self._idle = queue.Queue()
+        for connection in connections:
+            try:
+                connection.close()
+            except:
+                pass
+
+    @staticmethod
+    def is_transient(error):
+        return getattr(error, 'errorcode', None) in ConnectionPool.TRANSIENT_ERROR_CODES
+
+    def _open(self):
+        connection = self.connect()
+        # Rows are committed per commit batch by the loader
+        connection.setautocommit(False)
+        return connection
+
+class PooledLoader:
+    """
+    Inserts rows into several tables in parallel worker threads, one pooled connection per
+    worker. Rows are buffered per table and each commit batch of commit_size rows is inserted
+    in chunks of batch_size rows and committed as one transaction, which is rolled back and
+    retried on transient errors. The number of pending commit batches is bounded.
+    """
+    def __init__(self, pool, batch_size=10000, commit_size=100000, retries=3, backoff=1.0):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.commit_size = max(commit_size, batch_size)
+        self.retries = retries
+        self.backoff = backoff
+        self.rows = {}
+        self.error = None
+        self._buffers = {}
+        self._inlists = {}
+        self._tasks = queue.Queue(maxsize=pool.size * 2)
+        self._lock = threading.Lock()
+        self._workers = []
+        self._start = None
+
+    def start(self):
+        self._start = time.time()
+        for _ in range(self.pool.size):
+            worker = threading.Thread(target=self._work)
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+    def add(self, table_name, inlist, rows):
+        if self.error is not None:
+            raise self.error
+        self._inlists[table_name] = inlist
+        buffer = self._buffers.setdefault(table_name, [])
+        buffer.extend(rows)
+        if len(buffer) >= self.commit_size:
+            self._submit(table_name, inlist)
+
+    def finish(self):
+        for table_name in list(self._buffers):
+            if self._buffers[table_name]:
+                self._submit(table_name, self._inlists[table_name])
+        for _ in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+        for table_name, rows in self.rows.items():
+            DataSets._report_throughput(table_name, rows, self._start)
+        if self.error is not None:
+            raise self.error
+
+    def _submit(self, table_name, inlist):
+        rows = self._buffers.pop(table_name)
+        self._tasks.put((table_name, 'insert into ' + table_name + inlist, rows))
+
+    def _work(self):
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                return
+            if self.error is not None:
+                # Drain the queue after a failure so the producer is not blocked
+                continue
+            table_name, sql, rows = task
+            try:
+                self._insert(sql, rows)
+                with self._lock:
+                    self.rows[table_name] = self.rows.get(table_name, 0) + len(rows)
+            except Exception as error:
+                print('Loading {0} failed: {1}'.format(table_name, error))
+                self.error = error
+
+    def _insert(self, sql, rows):
+        attempt = 0
+        while True:
+            connection = self.pool.acquire()
+            try:
+                with connection.cursor() as cur:
+                    for chunk in range(0, len(rows), self.batch_size):
+                        cur.executemany(sql, rows[chunk:chunk + self.batch_size])
+                connection.commit()
+            except Exception as error:
+                try:
+                    connection.rollback()
+                except:
+                    pass
+                if not ConnectionPool.is_transient(error) or attempt >= self.retries:
+                    self.pool.release(connection)
+                    raise
+                # The connection may be broken, a new one is opened for the retry
+                self.pool.discard(connection)
+                attempt += 1
+                print('Retrying commit batch after error ({0}/{1}): {2}'.format(attempt, self.retries, error))
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+                continue
+            self.pool.release(connection)
+            return
+
 class DataSets:
+    # Connection pool used for concurrent loading when no pool is passed explicitly
+    connection_pool = None
+
+    # Load strategies: rows are inserted from the client, the csv is imported by the HANA server
+    # or the rows are staged in a temporary table in large batches and inserted server side
+    STRATEGY_AUTO = 'auto'
+    STRATEGY_INSERT = 'insert'
+    STRATEGY_IMPORT = 'import'
+    STRATEGY_STAGED = 'staged'
+    SPLIT_COLUMN = 'SPLIT_INDEX'
+    load_strategy = STRATEGY_AUTO
+    # Files below this size are inserted from the client with the auto strategy
+    bulk_load_min_bytes = 8 * 1024 * 1024
+    # Directory the csv files are staged in for the import and the same directory as seen by the HANA host
+    staging_dir = None
+    server_staging_dir = None
+    import_threads = 4
+    import_batch = 10000
+    staged_batch_size = 100000
+    # Rows, duration and strategy of each table loaded in this session
+    load_statistics = []
+
     @staticmethod
     def _table_exists(connection, schema, table):
         sql = "SELECT COUNT(*) from TABLES WHERE SCHEMA_NAME='{0}' AND TABLE_NAME='{1}'".format(schema, table)
@@ -104,31 +504,185 @@ class DataSets:
                 cur.execute(sql)
 
     @staticmethod
-    def _load_data(connection, table_descriptions, cols, inlist, batch_size=10000):
+    def _line_count(filename):
+        # Count the lines in binary blocks, a last line without line break counts as well
+        count = 0
+        last = b'\n'
+        with open(filename, 'rb') as my_file:
+            for block in iter(lambda: my_file.read(1 << 20), b''):
+                count += block.count(b'\n')
+                last = block[-1:]
+        if last != b'\n':
+            count += 1
+        return count
+
+    @staticmethod
+    def _report_throughput(table_name, rows, start, strategy=STRATEGY_INSERT):
+        duration = time.time() - start
+        DataSets.load_statistics.append({'table': table_name, 'rows': rows, 'seconds': duration, 'strategy': strategy})
+        print('Loaded {0} rows into {1} in {2:.2f}s ({3:.0f} rows/s) using {4}'.format(
+            rows, table_name, duration, rows / duration if duration > 0 else 0, strategy))
+
+    @staticmethod
+    def choose_load_strategy(filename):
+        if DataSets.load_strategy != DataSets.STRATEGY_AUTO:
+            return DataSets.load_strategy
+        if os.path.getsize(filename) < DataSets.bulk_load_min_bytes:
+            return DataSets.STRATEGY_INSERT
+        if DataSets.staging_dir is not None:
+            return DataSets.STRATEGY_IMPORT
+        return DataSets.STRATEGY_STAGED
+
+    @staticmethod
+    def _bulk_load(connection, table_descriptions, cols, inlist, filename, strategy, splitter=None, batch_size=10000, engine=None):
+        # The first table receives all rows, the others the rows of their split
+        start = time.time()
+        if strategy == DataSets.STRATEGY_IMPORT:
+            try:
+                DataSets._import_load(connection, table_descriptions, cols, inlist, filename, splitter)
+            except Exception as error:
+                print('Import of {0} failed, falling back to staged insert: {1}'.format(filename, error))
+                for table_name in table_descriptions:
+                    with connection.connection.cursor() as cur:
+                        cur.execute('TRUNCATE TABLE ' + table_name)
+                if splitter is not None:
+                    splitter.position = 0
+                strategy = DataSets.STRATEGY_STAGED
+                start = time.time()
+        if strategy == DataSets.STRATEGY_STAGED:
+            DataSets._staged_load(connection, table_descriptions, cols, inlist, filename, splitter, engine)
+        for table_name in table_descriptions:
+            DataSets._report_throughput(table_name, DataSets._count_rows(connection, table_name), start, strategy)
+
+    @staticmethod
+    def _import_load(connection, table_descriptions, cols, inlist, filename, splitter=None):
+        column_names = ColumnarCsvReader.parse_column_names(inlist)
+        if not os.path.isdir(DataSets.staging_dir):
+            os.makedirs(DataSets.staging_dir)
+        staged_name = os.path.basename(filename)
+        if splitter is not None or len(table_descriptions) > 1:
+            # The rows are staged with their split appended, under a name which never is the dataset file
+            staged_name = os.path.splitext(staged_name)[0] + '.split.csv'
+        staged_file = os.path.join(DataSets.staging_dir, staged_name)
+        server_file = (DataSets.server_staging_dir or DataSets.staging_dir).rstrip('/') + '/' + staged_name
+        staging_table = None
+        try:
+            if splitter is None and len(table_descriptions) == 1:
+                if os.path.abspath(staged_file) != os.path.abspath(filename):
+                    shutil.copyfile(filename, staged_file)
+                DataSets._import_file(connection, server_file, table_descriptions[0], column_names)
+                return
+            # Stage the csv with the split of each row appended and import it into a staging table
+            with open(staged_file, 'w') as staged:
+                writer = csv.writer(staged, delimiter=',', lineterminator='\n')
+                for data in ColumnarCsvReader(filename, cols, inlist, engine=ColumnarCsvReader.ENGINE_CSV):
+                    split = [0] * len(data) if splitter is None else [splitter.assign(row) for row in data]
+                    writer.writerows(['' if value is None else value for value in row] + [index]
+                                     for row, index in zip(data, split))
+            staging_table = table_descriptions[0] + '_STAGING'
+            DataSets._drop_and_create_table(connection, staging_table, DataSets._staging_cols(cols, column_names))
+            DataSets._import_file(connection, server_file, staging_table, column_names + [DataSets.SPLIT_COLUMN])
+            DataSets._distribute(connection, staging_table, table_descriptions, column_names)
+        finally:
+            if staging_table is not None:
+                DataSets.drop_table(connection, staging_table)
+            if os.path.abspath(staged_file) != os.path.abspath(filename) and os.path.exists(staged_file):
+                os.remove(staged_file)
+
+    @staticmethod
+    def _import_file(connection, server_file, table_name, column_names):
+        sql = ("IMPORT FROM CSV FILE '{0}' INTO {1} WITH RECORD DELIMITED BY '\\n' FIELD DELIMITED BY ',' "
+               "OPTIONALLY ENCLOSED BY '\"' COLUMN LIST ({2}) THREADS {3} BATCH {4} FAIL ON INVALID DATA").format(
+                   server_file.replace("'", "''"), table_name, ', '.join('"{0}"'.format(name) for name in column_names),
+                   DataSets.import_threads, DataSets.import_batch)
+        with connection.connection.cursor() as cur:
+            cur.execute(sql)
+
+    @staticmethod
+    def _staged_load(connection, table_descriptions, cols, inlist, filename, splitter=None, engine=None):
+        # Local temporary tables are only visible to this connection, the rows are inserted server side from it
+        column_names = ColumnarCsvReader.parse_column_names(inlist)
+        staging_table = '"#' + table_descriptions[0].split('.')[-1].strip('"') + '_STAGING"'
+        sql = 'insert into {0} ({1}) VALUES ({2})'.format(
+            staging_table, ', '.join('"{0}"'.format(name) for name in column_names + [DataSets.SPLIT_COLUMN]),
+            ', '.join(['?'] * (len(column_names) + 1)))
+        with connection.connection.cursor() as cur:
+            cur.execute('CREATE LOCAL TEMPORARY COLUMN TABLE ' + staging_table + DataSets._staging_cols(cols, column_names))
+        try:
+            for data in ColumnarCsvReader(filename, cols, inlist, chunk_size=DataSets.staged_batch_size, engine=engine):
+                split = [0] * len(data) if splitter is None else [splitter.assign(row) for row in data]
+                with connection.connection.cursor() as cur:
+                    cur.executemany(sql, [tuple(row) + (index,) for row, index in zip(data, split)])
+            DataSets._distribute(connection, staging_table, table_descriptions, column_names)
+        finally:
+            DataSets.drop_table(connection, staging_table)
+
+    @staticmethod
+    def _staging_cols(cols, column_names):
+        names = [name.upper() for name in column_names]
+        definitions = [definition for definition in ColumnarCsvReader.split_column_definitions(cols)
+                       if definition.split()[0].strip('"').upper() in names]
+        return '(' + ', '.join(definitions + ['"{0}" INTEGER'.format(DataSets.SPLIT_COLUMN)]) + ')'
+
+    @staticmethod
+    def _distribute(connection, staging_table, table_descriptions, column_names):
+        columns = ', '.join('"{0}"'.format(name) for name in column_names)
+        for i in range(len(table_descriptions)):
+            sql = 'INSERT INTO {0} ({1}) SELECT {1} FROM {2}'.format(table_descriptions[i], columns, staging_table)
+            if i > 0:
+                sql += ' WHERE "{0}" = {1}'.format(DataSets.SPLIT_COLUMN, i - 1)
+            with connection.connection.cursor() as cur:
+                cur.execute(sql)
+
+    @staticmethod
+    def _count_rows(connection, table_name):
+        with connection.connection.cursor() as cur:
+            cur.execute('SELECT COUNT(*) FROM ' + table_name)
+            return cur.fetchall()[0][0]
+
+    @staticmethod
+    def _load_data(connection, table_descriptions, cols, inlist, batch_size=10000, engine=None, pool=None):
+        # Large files are bulk loaded, the others are inserted from the client
+        bulk_tables = [k for k,v in table_descriptions.items()
+                       if DataSets.choose_load_strategy(v[1]) != DataSets.STRATEGY_INSERT]
+        for k in bulk_tables:
+            v = table_descriptions[k]
+            DataSets._drop_and_create_table(connection, v[0], cols)
+            DataSets._bulk_load(connection, [v[0]], cols, inlist, v[1], DataSets.choose_load_strategy(v[1]),
+                                batch_size=batch_size, engine=engine)
+        table_descriptions = dict((k,v) for k,v in table_descriptions.items() if k not in bulk_tables)
+        pool = pool or DataSets.connection_pool
+        if pool is not None:
+            DataSets._load_data_pooled(connection, table_descriptions, cols, inlist, pool, batch_size, engine)
+            return
         for k,v in table_descriptions.items():
             DataSets._drop_and_create_table(connection, v[0], cols)
-            with open(v[1], 'r') as my_file:
-                reader = csv.reader(my_file, delimiter=',')
-                data = list(reader)
-                sql = 'insert into ' + v[0] + inlist
-                #print(sql)
-                print('Rows to load is {0}'.format(len(data)))
-                count = len(data)
-                # Chunk up the inserts
-                chunk_size = batch_size
-                chunks = int(count/chunk_size) + 2
-                for chunk in range(chunks+1):
-                    chunk_location = chunk*chunk_size
-                    data_chunk= data[chunk_location:chunk_location+chunk_size]
-                    #print(data_chunk)
-                    if len(data_chunk) > 0:
-                        with connection.connection.cursor() as cur:
-                            rows_inserted = cur.executemany(sql, data_chunk)
-                            print ("Rows inserted into %s in chunk %i: %s" % (v[0], chunk, len(rows_inserted)))
+            sql = 'insert into ' + v[0] + inlist
+            # Stream the file in chunks instead of reading it completely into memory
+            reader = ColumnarCsvReader(v[1], cols, inlist, chunk_size=batch_size, engine=engine)
+            start = time.time()
+            for chunk, data_chunk in enumerate(reader):
+                with connection.connection.cursor() as cur:
+                    rows_inserted = cur.executemany(sql, data_chunk)
+                    print ("Rows inserted into %s in chunk %i: %s" % (v[0], chunk, len(rows_inserted)))
+            DataSets._report_throughput(v[0], reader.rows, start)
                 #with connection.connection.cursor() as cur:
                 #    rows_inserted = cur.executemany(sql, data)
                 #    print ("Rows inserted into %s: %s" % (v[0], len(rows_inserted)))
 
+    @staticmethod
+    def _load_data_pooled(connection, table_descriptions, cols, inlist, pool, batch_size=10000, engine=None):
+        # The tables are created on the given connection, the rows are inserted in parallel on the pool
+        loader = PooledLoader(pool, batch_size=batch_size)
+        loader.start()
+        try:
+            for k,v in table_descriptions.items():
+                DataSets._drop_and_create_table(connection, v[0], cols)
+                for data_chunk in ColumnarCsvReader(v[1], cols, inlist, chunk_size=batch_size, engine=engine):
+                    loader.add(v[0], inlist, data_chunk)
+        finally:
+            loader.finish()
+
     @staticmethod
     def _load(connection, schema, tables, table_descriptions, cols, inlist, batch_size=10000, force=False):
         existing_ones = [tbl for tbl in tables if DataSets._table_exists(connection, schema, tbl)]
@@ -496,27 +1050,26 @@ class DataSets:
         return tuple(tables)
 
     @staticmethod
-    def load_data_auto(connection, table_descriptions, cols, inlist,filename,train_percentage=.50,valid_percentage=.40,test_percentage=.10, batch_size=10000,force=False):
-        file_count = 0
+    def load_data_auto(connection, table_descriptions, cols, inlist,filename,train_percentage=.50,valid_percentage=.40,test_percentage=.10, batch_size=10000,force=False,key_column=None,seed=4):
         total_percentage = train_percentage + valid_percentage + test_percentage
         if total_percentage == 1:
-            for line in open(filename): file_count += 1
             try:
                 schema = table_descriptions[0].split('.')[0]
                 tablename = table_descriptions[0].split('.')[1]
                 full_set = connection.table(tablename)
                 count = full_set.count()
-                if count == file_count and force == False:
+                # The file is only counted to check an existing table, loading reads it once
+                if force == False and count > 0 and count == DataSets._line_count(filename):
                     print("Table {} exists and data exists".format(tablename))
                     return
                 else:
                     for i in range(len(table_descriptions)):DataSets._drop_and_create_table(connection,table_descriptions[i],cols)
-                    DataSets.file_load(connection,table_descriptions,cols,inlist,filename,file_count,train_percentage,valid_percentage,test_percentage,batch_size)
+                    DataSets.file_load(connection,table_descriptions,cols,inlist,filename,None,train_percentage,valid_percentage,test_percentage,batch_size,key_column=key_column,seed=seed)
             except:
                 print("Table {} doesn't exist in schema {}".format(tablename,schema))
                 print("Creating table {} in schema {} ....".format(tablename,schema))
                 for i in range(len(table_descriptions)):DataSets._drop_and_create_table(connection,table_descriptions[i],cols)
-                DataSets.file_load(connection,table_descriptions,cols,inlist,filename,file_count,train_percentage,valid_percentage,test_percentage,batch_size)
+                DataSets.file_load(connection,table_descriptions,cols,inlist,filename,None,train_percentage,valid_percentage,test_percentage,batch_size,key_column=key_column,seed=seed)
         else:
             print("Invalid Value Error: Sum of train_percentage({}), valid_percentage({}), test_percentage({}) not equal to 1".format(train_percentage,valid_percentage,test_percentage))
             return
@@ -528,23 +1081,46 @@ class DataSets:
                 with connection.connection.cursor() as cur:
                     rows_inserted = cur.executemany(sql, data)
     @staticmethod
-    def file_load(connection,table_descriptions,cols, inlist, filename,file_count,train_percentage,valid_percentage,test_percentage,batch_size):
-        with open(filename, 'r') as my_file:
-            reader = csv.reader(my_file, delimiter=',')
-            data = list()
-            data_list = list()
-            load_count = 0
-            for row in reader:
-                remain_count = file_count - load_count
-                if remain_count < batch_size:
-                    batch_size = remain_count
-                if len(data) <= batch_size:
-                    data.append(list(row))
-                    if len(data) == batch_size:
-                        DataSets.split_data_into_tables(connection,data,table_descriptions,train_percentage,valid_percentage,test_percentage, cols, inlist, batch_size, file_count)
-                        load_count += len(data)
-                        data = list()
-                        print("Data Loaded:{}%".format(math.floor(load_count/file_count*100)))                     
+    def file_load(connection,table_descriptions,cols, inlist, filename,file_count,train_percentage,valid_percentage,test_percentage,batch_size,engine=None,key_column=None,seed=4,pool=None):
+        # The reader hands out chunks of batch_size rows with empty values already converted to None
+        reader = ColumnarCsvReader(filename, cols, inlist, chunk_size=batch_size, engine=engine)
+        key_index = None
+        if key_column is not None:
+            key_index = [name.upper() for name in reader.column_names].index(key_column.upper())
+        splitter = StreamingSplitter(train_percentage, valid_percentage, test_percentage, seed=seed, key_index=key_index)
+        strategy = DataSets.choose_load_strategy(filename)
+        if strategy != DataSets.STRATEGY_INSERT:
+            DataSets._bulk_load(connection, table_descriptions, cols, inlist, filename, strategy,
+                                splitter=splitter, batch_size=batch_size, engine=engine)
+            return
+        pool = pool or DataSets.connection_pool
+        loader = None
+        if pool is not None:
+            # The split tables are loaded in parallel on the pool
+            loader = PooledLoader(pool, batch_size=batch_size)
+            loader.start()
+        load_count = 0
+        start = time.time()
+        try:
+            for data in reader:
+                # Each chunk goes to the full table and its rows to their split tables, so only one chunk is held in memory
+                data_list = [data] + splitter.split(data)
+                for i in range(len(table_descriptions)):
+                    if loader is not None:
+                        if data_list[i]:
+                            loader.add(table_descriptions[i], inlist, data_list[i])
+                    else:
+                        DataSets.insert_data(connection,table_descriptions[i],cols,inlist,data_list[i],batch_size)
+                load_count += len(data)
+                if file_count:
+                    print("Data Loaded:{}%".format(math.floor(load_count/file_count*100)))
+                else:
+                    print("Data Loaded:{} rows".format(load_count))
+        finally:
+            if loader is not None:
+                loader.finish()
+        if loader is None:
+            DataSets._report_throughput(table_descriptions[0], load_count, start)
     @staticmethod
     def drop_table(connection,tablename,schema=None,):
         if schema is None:
@@ -562,7 +1138,7 @@ class DataSets:
     @staticmethod
     def split_data_into_tables(connection, data,table_descriptions, train_percentage,valid_percentage,test_percentage, cols, inlist, batch_size, file_count):
         data_list = list()
-        data = [[element or None for element in sublist] for sublist in data]
+        data = list(data)
         random.seed(4)
         random.shuffle(data)
         data_list.append(data)
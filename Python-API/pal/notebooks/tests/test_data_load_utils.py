@@ -0,0 +1,74 @@
+"""
+Tests of the csv readers of the data load utilities.
+"""
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+
+NOTEBOOKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULE_LOCATIONS = [os.path.join(NOTEBOOKS_DIR, 'data_load_utils.py'),
+                    os.path.join(NOTEBOOKS_DIR, 'e2e_senarios', 'data_load_utils.py')]
+
+COLS = '("ID" INTEGER, "X" DOUBLE, "Y" DOUBLE, "PRICE" DECIMAL(12,5), "NAME" NVARCHAR(20))'
+INLIST = '("ID", "X", "Y", "PRICE", "NAME") VALUES (?, ?, ?, ?, ?)'
+ROWS = ['1,0.49543508709194095,1e-300,12.34567,a',
+        '2,0.1,2.2250738585072014e-308,0.00001,"b,c"',
+        '3,,-3.141592653589793,,',
+        '4,123456789.12345678,5,1,d']
+
+
+def _load_module(location):
+    spec = importlib.util.spec_from_file_location('data_load_utils', location)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _installed(name):
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        return False
+    return True
+
+
+class TestColumnarCsvReader(unittest.TestCase):
+    """
+    Tests that every engine loads the same values.
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'data.csv')
+        with open(self.filename, 'w') as csv_file:
+            csv_file.write('\n'.join(ROWS) + '\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _read(self, module, engine):
+        reader = module.ColumnarCsvReader(self.filename, COLS, INLIST, chunk_size=3, engine=engine)
+        return [row for chunk in reader for row in chunk]
+
+    def test_engines_load_same_values(self):
+        engines = [engine for engine in ('pyarrow', 'pandas') if _installed(engine)]
+        if not engines:
+            self.skipTest('Neither pyarrow nor pandas is installed')
+        for location in MODULE_LOCATIONS:
+            module = _load_module(location)
+            # The csv engine passes the strings on, HANA parses them like float()
+            expected = [(None if row[0] is None else int(row[0]),
+                         None if row[1] is None else float(row[1]),
+                         None if row[2] is None else float(row[2]),
+                         row[3], row[4]) for row in self._read(module, 'csv')]
+            for engine in engines:
+                with self.subTest(module=location, engine=engine):
+                    rows = self._read(module, engine)
+                    self.assertEqual(rows, expected)
+                    self.assertEqual([[type(value) for value in row[1:3] if value is not None] for row in rows],
+                                     [[float, float], [float, float], [float], [float, float]])
+
+
+if __name__ == '__main__':
+    unittest.main()